@@ -0,0 +1,56 @@
+"""Benchmarks for describing scans (as done when broadcasting the scan metadata at the
+start of each experiment), including the serialisation to JSON."""
+
+import json
+import pytest
+from ndscan.fragment import ExpFragment
+from ndscan.parameters import FloatParam, IntParam
+from ndscan.result_channels import FloatChannel, IntChannel
+from ndscan.scan_generator import LinearGenerator, ScanOptions
+from ndscan.scan_runner import ScanAxis, ScanSpec, describe_scan
+from ndscan.utils import shorten_to_unambiguous_suffixes
+from helpers import make_managers
+
+
+class Leaf(ExpFragment):
+    def build_fragment(self):
+        for i in range(5):
+            self.setattr_param("float_{}".format(i), FloatParam, "Float", 0.0)
+            self.setattr_param("int_{}".format(i), IntParam, "Int", 0)
+        self.setattr_result("counts", IntChannel)
+        self.setattr_result("value", FloatChannel)
+
+
+class Tree(ExpFragment):
+    def build_fragment(self, num_children):
+        for i in range(num_children):
+            self.setattr_fragment("child_{}".format(i), Leaf)
+
+
+@pytest.mark.parametrize("num_children", [10, 100])
+def test_describe_scan(benchmark, num_children):
+    fragment = Tree(make_managers(), [], num_children)
+    fragment.init_params()
+
+    axes = []
+    for name in ["float_0", "int_0"]:
+        param, store = fragment.child_0.override_param(name)
+        axes.append(ScanAxis(param.describe(), "child_0", store))
+    spec = ScanSpec(axes, [LinearGenerator(0, 10, 11, False) for _ in axes],
+                    ScanOptions(seed=0))
+
+    channels = {}
+    fragment._collect_result_channels(channels)
+    short_names = shorten_to_unambiguous_suffixes(
+        channels.keys(), lambda fqn, n: "/".join(fqn.split("/")[-n:]))
+    short_result_names = {
+        channel: short_names[path].replace("/", "_")
+        for path, channel in channels.items()
+    }
+
+    def run():
+        desc = describe_scan(spec, fragment, short_result_names)
+        return {k: v if isinstance(v, (str, int)) else json.dumps(v)
+                for k, v in desc.items()}
+
+    benchmark(run)
@@ -0,0 +1,60 @@
+"""Benchmarks for generating the points of a scan."""
+
+import numpy as np
+import pytest
+from ndscan.scan_generator import (LinearGenerator, ScanOptions, ScanPointPlan,
+                                   generate_points)
+from chunk_prefetch import measure_dead_times
+from helpers import record_peak_memory, record_throughput
+
+SHAPES = [(1000, ), (100000, ), (100, 100), (300, 300), (20, 20, 20), (50, 50, 50)]
+
+
+def _shape_id(shape):
+    return "x".join(str(n) for n in shape)
+
+
+def _make_generators(shape):
+    return [LinearGenerator(0, 1, n, True) for n in shape]
+
+
+@pytest.mark.parametrize("shape", SHAPES, ids=_shape_id)
+def test_generate_points(benchmark, shape):
+    options = ScanOptions(num_repeats=1, randomise_order_globally=True, seed=0)
+
+    def run():
+        for _ in generate_points(_make_generators(shape), options):
+            pass
+
+    benchmark(run)
+    record_throughput(benchmark, int(np.prod(shape)))
+    record_peak_memory(benchmark, run)
+
+
+@pytest.mark.parametrize("shape", SHAPES, ids=_shape_id)
+def test_plan_chunks(benchmark, shape):
+    options = ScanOptions(num_repeats=1, randomise_order_globally=True, seed=0)
+
+    def run():
+        plan = ScanPointPlan(_make_generators(shape), options)
+        start = 0
+        while True:
+            coords = plan.points(start, start + 4096)
+            if len(coords[0]) == 0:
+                break
+            start += len(coords[0])
+
+    benchmark(run)
+    record_throughput(benchmark, int(np.prod(shape)))
+    record_peak_memory(benchmark, run)
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_chunk_dead_time(benchmark, prefetch):
+    # Mostly waiting for the simulated kernel, so only run once; the quantity of
+    # interest is the time spent waiting for chunks.
+    dead_times = benchmark.pedantic(
+        measure_dead_times, args=(prefetch, 2000, 10, 0.05), rounds=1, iterations=1)
+    # The first chunk can never be prefetched, so exclude it.
+    benchmark.extra_info["mean_dead_time"] = float(np.mean(dead_times[1:]))
+    benchmark.extra_info["max_dead_time"] = float(np.max(dead_times[1:]))
@@ -0,0 +1,90 @@
+"""Benchmarks for the overhead of executing scans, using trivial fragments on the host
+and on an emulated core device (see :mod:`ndscan.emulator`)."""
+
+from artiq.language import kernel
+import pytest
+from ndscan.emulator import EmulatedCore
+from ndscan.fragment import ExpFragment
+from ndscan.parameters import FloatParam
+from ndscan.result_channels import ArraySink, FloatChannel
+from ndscan.scan_generator import LinearGenerator, ScanOptions
+from ndscan.scan_runner import ScanAxis, ScanRunner, ScanSpec
+from helpers import make_managers, record_throughput
+
+NUM_POINTS = 10000
+
+
+class HostFragment(ExpFragment):
+    def build_fragment(self):
+        self.setattr_param("value", FloatParam, "Value", 0.0)
+        self.setattr_result("result", FloatChannel)
+
+    def run_once(self):
+        self.result.push(self.value.get())
+
+
+class KernelFragment(ExpFragment):
+    def build_fragment(self):
+        self.setattr_device("core")
+        self.setattr_param("value", FloatParam, "Value", 0.0)
+        self.setattr_result("result", FloatChannel)
+
+    @kernel
+    def device_setup(self):
+        pass
+
+    @kernel
+    def run_once(self):
+        self.result.push(self.value.get())
+
+
+def _make_scan(fragment_class, core=None, **options):
+    managers = make_managers(core)
+    fragment = fragment_class(managers, [])
+    fragment.init_params()
+    param, store = fragment.override_param("value")
+    axis = ScanAxis(param.describe(), "*", store)
+    result_sink = ArraySink()
+    fragment.result.set_sink(result_sink)
+
+    def run():
+        result_sink.clear()
+        spec = ScanSpec([axis], [LinearGenerator(0, 1, NUM_POINTS, False)],
+                        ScanOptions(**options))
+        ScanRunner(managers).run(fragment, spec, [ArraySink()])
+
+    return run
+
+
+@pytest.mark.parametrize("skip_unchanged_setup", [False, True])
+def test_host_scan(benchmark, skip_unchanged_setup):
+    benchmark(_make_scan(HostFragment, skip_unchanged_setup=skip_unchanged_setup))
+    record_throughput(benchmark, NUM_POINTS)
+
+
+KERNEL_SCAN_OPTIONS = {
+    "whole": {
+        "max_upload_points": NUM_POINTS
+    },
+    "chunked": {},
+    "whole_batched": {
+        "max_upload_points": NUM_POINTS,
+        "batch_results": True
+    },
+    "chunked_batched": {
+        "batch_results": True
+    }
+}
+
+
+@pytest.mark.parametrize("mode", KERNEL_SCAN_OPTIONS.keys())
+def test_emulated_kernel_scan(benchmark, mode):
+    # Typical latencies for a Kasli over a local network.
+    core = EmulatedCore(rpc_latency=100e-6, async_rpc_latency=5e-6)
+    rounds = 3
+    benchmark.pedantic(_make_scan(KernelFragment, core, **KERNEL_SCAN_OPTIONS[mode]),
+                       rounds=rounds)
+    record_throughput(benchmark, NUM_POINTS)
+    num_points = rounds * NUM_POINTS
+    benchmark.extra_info["rpcs_per_point"] = core.num_rpcs / num_points
+    benchmark.extra_info["async_rpcs_per_point"] = core.num_async_rpcs / num_points
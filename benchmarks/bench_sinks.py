@@ -0,0 +1,69 @@
+"""Benchmarks for pushing values to result sinks, with the dataset sinks backed by an
+in-memory dataset database (including the broadcast modifications)."""
+
+import pytest
+from ndscan.result_channels import AppendingDatasetSink, ArraySink, DatasetFlushGroup
+from helpers import make_managers, record_peak_memory, record_throughput
+
+
+@pytest.mark.parametrize("num_values", [1000, 10000])
+@pytest.mark.parametrize("broadcast", [False, True])
+def test_appending_dataset_push(benchmark, num_values, broadcast):
+    def run():
+        sink = AppendingDatasetSink(make_managers(), "values", broadcast)
+        for i in range(num_values):
+            sink.push(float(i))
+
+    benchmark.pedantic(run, rounds=3)
+    record_throughput(benchmark, num_values, "values")
+    record_peak_memory(benchmark, run)
+
+
+@pytest.mark.parametrize("max_pending", [16, 256])
+def test_coalesced_dataset_push(benchmark, max_pending):
+    num_values = 10000
+    num_channels = 20
+
+    def run():
+        managers = make_managers()
+        group = DatasetFlushGroup(max_pending=max_pending)
+        sinks = [
+            AppendingDatasetSink(managers, "values_{}".format(i), flush_group=group)
+            for i in range(num_channels)
+        ]
+        for i in range(num_values // num_channels):
+            for sink in sinks:
+                sink.push(float(i))
+            group.maybe_flush()
+        group.flush()
+
+    benchmark.pedantic(run, rounds=3)
+    record_throughput(benchmark, num_values, "values")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 100])
+def test_appending_dataset_push_many(benchmark, chunk_size):
+    num_values = 10000
+    chunk = [float(i) for i in range(chunk_size)]
+
+    def run():
+        sink = AppendingDatasetSink(make_managers(), "values")
+        for _ in range(num_values // chunk_size):
+            sink.push_many(chunk)
+
+    benchmark.pedantic(run, rounds=3)
+    record_throughput(benchmark, num_values, "values")
+
+
+def test_array_push(benchmark):
+    num_values = 100000
+
+    def run():
+        sink = ArraySink()
+        for i in range(num_values):
+            sink.push(float(i))
+        return sink.get_all()
+
+    benchmark(run)
+    record_throughput(benchmark, num_values, "values")
+    record_peak_memory(benchmark, run)
@@ -0,0 +1,39 @@
+"""Benchmarks for the overhead of subscans, i.e. of running a scan from within the
+``run_once()`` method of a fragment."""
+
+import pytest
+from ndscan.experiment import run_fragment_once
+from ndscan.fragment import ExpFragment
+from ndscan.parameters import FloatParam
+from ndscan.result_channels import FloatChannel
+from ndscan.scan_generator import LinearGenerator, ScanOptions
+from ndscan.subscan import setattr_subscan
+from helpers import make_managers, record_throughput
+
+
+class Child(ExpFragment):
+    def build_fragment(self):
+        self.setattr_param("value", FloatParam, "Value", 0.0)
+        self.setattr_result("result", FloatChannel)
+
+    def run_once(self):
+        self.result.push(self.value.get())
+
+
+class Parent(ExpFragment):
+    def build_fragment(self, num_points):
+        self.num_points = num_points
+        self.setattr_fragment("child", Child)
+        setattr_subscan(self, "scan", self.child, [(self.child, "value")])
+
+    def run_once(self):
+        generator = LinearGenerator(0, 1, self.num_points, False)
+        self.scan.run([(self.child.value, generator)], ScanOptions(seed=0))
+
+
+@pytest.mark.parametrize("num_points", [10, 100, 1000])
+def test_subscan(benchmark, num_points):
+    parent = Parent(make_managers(), [], num_points)
+    parent.init_params()
+    benchmark(run_fragment_once, parent)
+    record_throughput(benchmark, num_points)
@@ -0,0 +1,68 @@
+"""Benchmark for the dead time of the core device between chunks of scan points.
+
+While the kernel executes a chunk, the host is otherwise idle. With prefetching, the
+coordinates of the next chunk are computed during that time, so the chunk RPC returns
+immediately. This simulates the kernel by sleeping for a fixed amount of time per chunk
+and measures the time spent waiting for each chunk with and without prefetching.
+"""
+
+import argparse
+import numpy as np
+import time
+
+from ndscan.scan_generator import (ChunkPrefetcher, LinearGenerator,
+                                   RefiningGenerator, ScanOptions, ScanPointPlan)
+
+
+def get_argparser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Points per chunk")
+    parser.add_argument("--num-chunks", type=int, default=50, help="Chunks to fetch")
+    parser.add_argument(
+        "--kernel-time",
+        type=float,
+        default=0.05,
+        help="Simulated kernel execution time per chunk, in seconds")
+    return parser
+
+
+def measure_dead_times(prefetch: bool, chunk_size: int, num_chunks: int,
+                       kernel_time: float) -> np.ndarray:
+    """Return the time spent waiting for each chunk, in seconds."""
+    generators = [
+        LinearGenerator(0, 1, 101, True),
+        RefiningGenerator(0, 1, True),
+        LinearGenerator(0, 1, 11, True)
+    ]
+    plan = ScanPointPlan(
+        generators, ScanOptions(num_repeats=3, randomise_order_globally=True, seed=0))
+    prefetcher = ChunkPrefetcher(plan, enabled=prefetch)
+
+    dead_times = []
+    start = 0
+    try:
+        for _ in range(num_chunks):
+            t0 = time.monotonic()
+            prefetcher.wait()
+            coords = prefetcher.get(start, chunk_size)
+            dead_times.append(time.monotonic() - t0)
+            start += len(coords[0])
+            time.sleep(kernel_time)
+    finally:
+        prefetcher.close()
+    return np.array(dead_times)
+
+
+def main():
+    args = get_argparser().parse_args()
+    for prefetch in [False, True]:
+        # The first chunk can never be prefetched, so exclude it.
+        dead_times = measure_dead_times(prefetch, args.chunk_size, args.num_chunks,
+                                        args.kernel_time)[1:]
+        print("Prefetch {}: dead time per chunk: mean {:.3f} ms, max {:.3f} ms".format(
+            "on " if prefetch else "off", 1e3 * np.mean(dead_times),
+            1e3 * np.max(dead_times)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+import os
+
+_BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def pytest_configure(config):
+    # Only collect the benchmarks if explicitly asked to, not as part of the unit
+    # tests.
+    for arg in config.args:
+        path = os.path.abspath(arg.split("::")[0])
+        if os.path.commonpath([path, _BENCHMARKS_DIR]) == _BENCHMARKS_DIR:
+            config.addinivalue_line("python_files", "bench_*.py")
+            return
@@ -0,0 +1,77 @@
+"""Common code for the ``bench_*`` modules."""
+
+import copy
+import tracemalloc
+from typing import Any, Callable, Tuple
+from artiq.language.environment import ProcessArgumentManager
+from artiq.master.worker_db import DatasetManager, DeviceManager
+from artiq.protocols.sync_struct import process_mod
+
+
+class DatasetDB:
+    """In-memory dataset database, as used by the unit tests (see
+    ``test/mock_environment.py``)."""
+
+    def __init__(self):
+        self.data = dict()
+
+    def get(self, key):
+        return self.data[key][1]
+
+    def update(self, mod):
+        process_mod(self.data, copy.deepcopy(mod))
+
+    def delete(self, key):
+        del self.data[key]
+
+
+class _DeviceDB:
+    def get(self, key):
+        return {"type": "dummy"}
+
+    def get_device_db(self):
+        return {}
+
+
+class _Scheduler:
+    rid = 0
+
+    def check_pause(self):
+        return False
+
+    def pause(self):
+        pass
+
+
+def make_managers(core: Any = None) -> Tuple[DeviceManager, DatasetManager, Any]:
+    """Return a tuple of managers to pass as the parent of top-level
+    ``HasEnvironment`` instances, with an in-memory dataset database.
+
+    :param core: The device to use as ``core`` (e.g. an :class:`.EmulatedCore`).
+    """
+    virtual_devices = {"core": core, "scheduler": _Scheduler()}
+    device_mgr = DeviceManager(_DeviceDB(), virtual_devices=virtual_devices)
+    dataset_mgr = DatasetManager(DatasetDB())
+    return device_mgr, dataset_mgr, ProcessArgumentManager({})
+
+
+def record_throughput(benchmark, num_items: int, unit: str = "points") -> None:
+    """Record the number of items processed per second in the benchmark's extra info
+    (based on the mean execution time)."""
+    stats = getattr(benchmark, "stats", None)
+    if stats is None:
+        # Benchmarking disabled, function only executed once.
+        return
+    benchmark.extra_info[unit + "_per_second"] = num_items / stats.stats.mean
+
+
+def record_peak_memory(benchmark, fn: Callable[[], Any]) -> None:
+    """Execute ``fn`` once more while tracing memory allocations, and record the peak
+    memory usage in the benchmark's extra info."""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    benchmark.extra_info["peak_memory_bytes"] = peak
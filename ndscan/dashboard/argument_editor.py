@@ -192,6 +192,31 @@ class ArgumentEditor(QtWidgets.QTreeWidget):
             scan_options_group.addChild(randomise_globally_item)
             self.setItemWidget(randomise_globally_item, 1, randomise_globally_container)
 
+            #
+
+            resume_container = QtWidgets.QWidget()
+            resume_layout = QtWidgets.QHBoxLayout()
+            resume_container.setLayout(resume_layout)
+
+            resume_label = QtWidgets.QLabel("Resume from: ")
+            resume_layout.addWidget(resume_label)
+            resume_layout.setStretchFactor(resume_label, 0)
+
+            self.resume_box = QtWidgets.QLineEdit()
+            self.resume_box.setPlaceholderText("RID or path to HDF5 results file")
+            self.resume_box.setToolTip(
+                "Continue an interrupted scan with otherwise identical settings, "
+                "acquiring only the points not completed previously")
+            resume_from = ndscan_params["scan"].get("resume_from", None)
+            if resume_from is not None:
+                self.resume_box.setText(str(resume_from))
+            resume_layout.addWidget(self.resume_box)
+            resume_layout.setStretchFactor(self.resume_box, 1)
+
+            resume_item = QtWidgets.QTreeWidgetItem()
+            scan_options_group.addChild(resume_item)
+            self.setItemWidget(resume_item, 1, resume_container)
+
         buttons_item = QtWidgets.QTreeWidgetItem()
         self.addTopLevelItem(buttons_item)
         buttons_item.setFirstColumnSpanned(True)
@@ -238,6 +263,15 @@ class ArgumentEditor(QtWidgets.QTreeWidget):
     def about_to_submit(self):
         self._save_to_argument()
 
+        # Resuming is a one-off action; later submissions should not try to resume
+        # the same run again. The arguments are read synchronously on submission, so
+        # only clear the field once control has returned to the event loop.
+        QtCore.QTimer.singleShot(0, self._clear_resume_from)
+
+    def _clear_resume_from(self):
+        self.resume_box.clear()
+        self._save_to_argument()
+
     def about_to_close(self):
         self._save_to_argument()
 
@@ -556,6 +590,12 @@ class ArgumentEditor(QtWidgets.QTreeWidget):
         scan["num_repeats"] = self.num_repeats_box.value()
         scan["continuous_without_axes"] = self.cwa_box.isChecked()
         scan["randomise_order_globally"] = self.randomise_globally_box.isChecked()
+        resume_from = self.resume_box.text().strip()
+        if resume_from:
+            scan["resume_from"] = int(resume_from) if resume_from.isdigit() \
+                else resume_from
+        else:
+            scan.pop("resume_from", None)
 
         _update_ndscan_params(self._arguments, self._ndscan_params)
 
@@ -644,7 +684,10 @@ class FloatOverrideEntry(OverrideEntry):
             [("Fixed", (self._build_fixed_ui, self._write_override)),
              ("Refining", (self._build_refining_ui, self._write_refining_scan)),
              ("Linear", (self._build_linear_ui, self._write_linear_scan)),
-             ("List", (self._build_list_ui, self._write_list_scan))])
+             ("List", (self._build_list_ui, self._write_list_scan)),
+             ("Adaptive", (self._build_adaptive_ui, self._write_adaptive_scan)),
+             ("Low discrepancy", (self._build_low_discrepancy_ui,
+                                  self._write_low_discrepancy_scan))])
         self.current_scan_type = None
         self.scale = schema.get("spec", {}).get("scale", 1.0)
 
@@ -710,6 +753,33 @@ class FloatOverrideEntry(OverrideEntry):
         }
         params["scan"].setdefault("axes", []).append(spec)
 
+    def _write_adaptive_scan(self, params: dict) -> None:
+        spec = {
+            "fqn": self.schema["fqn"],
+            "path": self.path,
+            "type": "adaptive",
+            "range": {
+                "lower": self.box_adaptive_lower.value() * self.scale,
+                "upper": self.box_adaptive_upper.value() * self.scale,
+                "num_points": self.box_adaptive_points.value(),
+                "channel": self.box_adaptive_channel.text(),
+                "randomise_order": self.box_adaptive_randomise.isChecked(),
+            }
+        }
+        params["scan"].setdefault("axes", []).append(spec)
+
+    def _write_low_discrepancy_scan(self, params: dict) -> None:
+        spec = {
+            "fqn": self.schema["fqn"],
+            "path": self.path,
+            "type": "low_discrepancy",
+            "range": {
+                "lower": self.box_low_discrepancy_lower.value() * self.scale,
+                "upper": self.box_low_discrepancy_upper.value() * self.scale
+            }
+        }
+        params["scan"].setdefault("axes", []).append(spec)
+
     def _scan_type_names(self) -> List[str]:
         return list(self.scan_types.keys())
 
@@ -783,6 +853,50 @@ class FloatOverrideEntry(OverrideEntry):
         layout.addWidget(self.box_list_randomise)
         layout.setStretchFactor(self.box_list_randomise, 0)
 
+    def _build_adaptive_ui(self, layout: QtWidgets.QLayout) -> None:
+        self.box_adaptive_lower = self._make_spin_box()
+        layout.addWidget(self.box_adaptive_lower)
+        layout.setStretchFactor(self.box_adaptive_lower, 1)
+
+        layout.addWidget(self._make_divider())
+
+        self.box_adaptive_points = QtWidgets.QSpinBox()
+        self.box_adaptive_points.setMinimum(2)
+        self.box_adaptive_points.setMaximum(2**16)
+        self.box_adaptive_points.setValue(32)
+        self.box_adaptive_points.setSuffix(" pts")
+        layout.addWidget(self.box_adaptive_points)
+        layout.setStretchFactor(self.box_adaptive_points, 0)
+
+        self.box_adaptive_channel = QtWidgets.QLineEdit()
+        self.box_adaptive_channel.setPlaceholderText("result channel")
+        self.box_adaptive_channel.setToolTip(
+            "Name of the result channel to adaptively refine the scan for")
+        layout.addWidget(self.box_adaptive_channel)
+        layout.setStretchFactor(self.box_adaptive_channel, 1)
+
+        self.box_adaptive_randomise = self._make_randomise_box()
+        self.box_adaptive_randomise.setChecked(False)
+        layout.addWidget(self.box_adaptive_randomise)
+        layout.setStretchFactor(self.box_adaptive_randomise, 0)
+
+        layout.addWidget(self._make_divider())
+
+        self.box_adaptive_upper = self._make_spin_box()
+        layout.addWidget(self.box_adaptive_upper)
+        layout.setStretchFactor(self.box_adaptive_upper, 1)
+
+    def _build_low_discrepancy_ui(self, layout: QtWidgets.QLayout) -> None:
+        self.box_low_discrepancy_lower = self._make_spin_box()
+        layout.addWidget(self.box_low_discrepancy_lower)
+        layout.setStretchFactor(self.box_low_discrepancy_lower, 1)
+
+        layout.addWidget(self._make_divider())
+
+        self.box_low_discrepancy_upper = self._make_spin_box()
+        layout.addWidget(self.box_low_discrepancy_upper)
+        layout.setStretchFactor(self.box_low_discrepancy_upper, 1)
+
     def _make_spin_box(self):
         box = ScientificSpinBox()
         disable_scroll_wheel(box)
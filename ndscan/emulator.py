@@ -0,0 +1,358 @@
+"""
+Emulation of an ARTIQ core device on the host, to exercise the kernel code paths of
+ndscan (e.g. :meth:`.ScanRunner.run` for fragments with ``@kernel`` methods) in tests
+and benchmarks without any hardware.
+
+Kernels are simply executed as regular Python code. Calls from kernel code to host
+functions that are not marked as ``@kernel`` or ``@portable`` are treated as RPCs, and
+are charged a configurable latency to model the communication overhead
+(asynchronous RPCs, i.e. ``@rpc(flags={"async"})``, only incur the cost of sending the
+request). Typical usage in a unit test is to replace the ``core`` device::
+
+    core = EmulatedCore(rpc_latency=100e-6)
+    device_mgr = DeviceManager(device_db, virtual_devices={"core": core, ...})
+
+This is not a simulation of the actual hardware: device drivers (TTLs, DDSs, …)
+are not supported, values embedded into kernels are not frozen at compile time, and
+none of the restrictions of the ARTIQ compiler are enforced.
+"""
+
+from artiq.language.core import (TerminationRequested, kernel, portable,
+                                 set_time_manager)
+import inspect
+import sys
+import time
+from typing import Any, Callable, Tuple, Union
+
+#: The latency below which delays are busy-waited for rather than slept, as sleeping
+#: is not accurate enough on most operating systems.
+_SPIN_THRESHOLD = 1e-3
+
+
+def _wait(duration: float) -> None:
+    if duration <= 0:
+        return
+    if duration >= _SPIN_THRESHOLD:
+        time.sleep(duration)
+        return
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        pass
+
+
+class _SequentialTimeContext:
+    def __init__(self, current_time: int):
+        self.current_time = current_time
+        self.block_duration = 0
+
+    def take_time(self, amount: int) -> None:
+        self.current_time += amount
+        self.block_duration += amount
+
+
+class _ParallelTimeContext:
+    def __init__(self, current_time: int):
+        self.current_time = current_time
+        self.block_duration = 0
+
+    def take_time(self, amount: int) -> None:
+        if amount > self.block_duration:
+            self.block_duration = amount
+
+
+class _TimeManager:
+    """Keeps track of the RTIO timeline cursor (``now_mu()``) for kernels executed on
+    the host, including ``with parallel``/``with sequential`` blocks."""
+
+    def __init__(self, ref_period: float):
+        self.ref_period = ref_period
+        self.stack = [_SequentialTimeContext(0)]
+
+    def enter_sequential(self):
+        self.stack.append(_SequentialTimeContext(self.get_time_mu()))
+
+    def enter_parallel(self):
+        self.stack.append(_ParallelTimeContext(self.get_time_mu()))
+
+    def exit(self):
+        old_context = self.stack.pop()
+        self.take_time_mu(old_context.block_duration)
+
+    def take_time_mu(self, duration):
+        self.stack[-1].take_time(duration)
+
+    def take_time(self, duration):
+        self.take_time_mu(int(round(duration / self.ref_period)))
+
+    def get_time_mu(self):
+        return self.stack[-1].current_time
+
+    def set_time_mu(self, t):
+        self.take_time_mu(t - self.get_time_mu())
+
+
+class _EmulatedComm:
+    """Stands in for the core device communication interface used to load and run
+    kernels compiled using :meth:`EmulatedCore.compile` (e.g. by
+    :class:`.KernelCache`)."""
+
+    def __init__(self, core: "EmulatedCore"):
+        self._core = core
+        self._library = None
+
+    def check_system_info(self) -> None:
+        pass
+
+    def load(self, kernel_library) -> None:
+        _wait(self._core.load_time)
+        self._library = kernel_library
+
+    def run(self) -> None:
+        pass
+
+    def serve(self, embedding_map, symbolizer, demangler) -> None:
+        function, args, kwargs = self._library
+        self._core._run_kernel(function, args, kwargs)
+
+    def close(self) -> None:
+        pass
+
+
+class EmulatedCore:
+    """Drop-in replacement for ``artiq.coredevice.core.Core`` that executes kernels on
+    the host.
+
+    :param rpc_latency: The round-trip time for each synchronous RPC, in seconds.
+    :param async_rpc_latency: The time the kernel is blocked for when issuing an
+        asynchronous RPC, in seconds.
+    :param compile_time: The time each kernel compilation takes, in seconds.
+    :param load_time: The time loading each kernel onto the device takes, in seconds.
+    :param ref_period: The RTIO reference period, in seconds.
+    """
+
+    def __init__(self,
+                 rpc_latency: float = 0.0,
+                 async_rpc_latency: float = 0.0,
+                 compile_time: float = 0.0,
+                 load_time: float = 0.0,
+                 ref_period: float = 1e-9):
+        self.rpc_latency = rpc_latency
+        self.async_rpc_latency = async_rpc_latency
+        self.compile_time = compile_time
+        self.load_time = load_time
+        self.ref_period = ref_period
+        self.coarse_ref_period = ref_period
+        self.ref_multiplier = 1
+
+        # Referenced by the @kernel methods below, as for the actual core device.
+        self.core = self
+
+        self.comm = _EmulatedComm(self)
+        self.first_run = True
+
+        #: The number of kernels compiled.
+        self.num_compilations = 0
+        #: The number of (top-level) kernel invocations.
+        self.num_kernel_runs = 0
+        #: The number of synchronous RPCs made from kernels.
+        self.num_rpcs = 0
+        #: The number of asynchronous RPCs made from kernels.
+        self.num_async_rpcs = 0
+
+        self._time_manager = _TimeManager(ref_period)
+        self._start_time = time.perf_counter()
+        self._in_kernel = False
+
+        #: Whether the function executed for each code object is an RPC, as ``None``
+        #: (kernel code), ``"sync"`` or ``"async"``.
+        self._rpc_kinds = {}
+        self._current_rpc_frame = None
+
+    def compile(self, function, args, kwargs, set_result=None, attribute_writeback=True,
+                print_as_rpc=True) -> Tuple[Any, Any, Any, Any]:
+        """Return a "kernel library" (to be run using :attr:`comm`) for the given
+        ``@kernel`` function."""
+        self.num_compilations += 1
+        _wait(self.compile_time)
+        return None, (function, args, kwargs), None, None
+
+    def run(self, function, args, kwargs) -> Any:
+        """Execute the given ``@kernel`` function (called by the ``@kernel`` decorator
+        when kernels are invoked from the host or from other kernels)."""
+        if self._in_kernel:
+            return function.artiq_embedded.function(*args, **kwargs)
+        self.num_compilations += 1
+        _wait(self.compile_time)
+        _wait(self.load_time)
+        return self._run_kernel(function, args, kwargs)
+
+    @portable
+    def seconds_to_mu(self, seconds):
+        return int(seconds // self.ref_period)
+
+    @portable
+    def mu_to_seconds(self, mu):
+        return mu * self.ref_period
+
+    @kernel
+    def get_rtio_counter_mu(self):
+        return int((time.perf_counter() - self._start_time) / self.ref_period)
+
+    @kernel
+    def wait_until_mu(self, cursor_mu):
+        _wait((cursor_mu - self.get_rtio_counter_mu()) * self.ref_period)
+
+    @kernel
+    def reset(self):
+        self._time_manager.set_time_mu(self.get_rtio_counter_mu() + 125000)
+
+    @kernel
+    def break_realtime(self):
+        min_now = self.get_rtio_counter_mu() + 125000
+        if self._time_manager.get_time_mu() < min_now:
+            self._time_manager.set_time_mu(min_now)
+
+    def _run_kernel(self, function, args, kwargs) -> Any:
+        self.num_kernel_runs += 1
+        set_time_manager(self._time_manager)
+        previous_profile = sys.getprofile()
+        self._in_kernel = True
+        sys.setprofile(self._profile)
+        try:
+            return function.artiq_embedded.function(*args, **kwargs)
+        finally:
+            sys.setprofile(previous_profile)
+            self._in_kernel = False
+            self._current_rpc_frame = None
+
+    def _profile(self, frame, event, arg) -> None:
+        if self._current_rpc_frame is not None:
+            # Executing an RPC on the host; wait for it to return to the kernel.
+            if event == "return" and frame is self._current_rpc_frame:
+                self._current_rpc_frame = None
+            return
+        if event != "call":
+            return
+        code = frame.f_code
+        kind = self._rpc_kinds.get(code, False)
+        if kind is False:
+            kind = _classify_call(frame)
+            self._rpc_kinds[code] = kind
+        if kind is None:
+            return
+        self._current_rpc_frame = frame
+        if kind == "async":
+            self.num_async_rpcs += 1
+            _wait(self.async_rpc_latency)
+        else:
+            self.num_rpcs += 1
+            _wait(self.rpc_latency)
+
+
+def _classify_call(frame) -> Union[str, None]:
+    """Determine whether the function executed in the given (newly entered) frame is
+    to be treated as an RPC when called from kernel code.
+
+    :return: ``"sync"`` or ``"async"`` for RPCs, ``None`` otherwise. Functions that
+        cannot be resolved (e.g. nested functions or comprehensions) are assumed to be
+        part of the kernel.
+    """
+    code = frame.f_code
+    if code in _KERNEL_SIDE_CODES:
+        return None
+    function = _resolve_function(frame)
+    if function is None:
+        return None
+    info = getattr(function, "artiq_embedded", None)
+    if info is not None:
+        if info.core_name is not None or getattr(info, "portable", False) or \
+                info.syscall is not None:
+            return None
+        return "async" if "async" in info.flags else "sync"
+    module = getattr(function, "__module__", None) or ""
+    if module.startswith(("artiq.language", "numpy")):
+        # Built-in functions of the ARTIQ compiler (now_mu(), …).
+        return None
+    return "sync"
+
+
+def _resolve_function(frame) -> Union[Callable, None]:
+    """Find the (possibly ``@kernel``-decorated) function executing in the given frame
+    by looking up its name on the first argument (``self``) or in the globals."""
+    code = frame.f_code
+    name = code.co_name
+
+    candidates = []
+    if code.co_argcount > 0:
+        obj = frame.f_locals.get(code.co_varnames[0], None)
+        if obj is not None:
+            try:
+                candidates.append(inspect.getattr_static(obj, name))
+            except AttributeError:
+                pass
+    candidates.append(frame.f_globals.get(name, None))
+
+    for candidate in candidates:
+        if isinstance(candidate, (staticmethod, classmethod)):
+            candidate = candidate.__func__
+        function = getattr(candidate, "__func__", candidate)
+        if getattr(function, "__code__", None) is code:
+            return function
+        info = getattr(function, "artiq_embedded", None)
+        if info is not None and getattr(info.function, "__code__", None) is code:
+            # The function wrapped by @kernel.
+            return function
+    return None
+
+
+#: The code objects of the functions implementing the emulator itself, which are
+#: executed as part of the kernel.
+_KERNEL_SIDE_CODES = {_wait.__code__}
+for _cls in [EmulatedCore, _TimeManager, _SequentialTimeContext, _ParallelTimeContext]:
+    for _member in vars(_cls).values():
+        _member = getattr(_member, "artiq_embedded", None) and \
+            _member.artiq_embedded.function or _member
+        if inspect.isfunction(_member):
+            _KERNEL_SIDE_CODES.add(_member.__code__)
+
+
+class EmulatedScheduler:
+    """Minimal stand-in for the ARTIQ scheduler device, for use together with
+    :class:`EmulatedCore`.
+
+    :param rid: The RID to report.
+    :param pause_after: If given, a pause is requested after this many calls to
+        :meth:`check_pause` (counting from construction or the last :meth:`pause`).
+    """
+
+    def __init__(self, rid: int = 0, pause_after: int = None):
+        self.rid = rid
+        self.pause_after = pause_after
+        self.num_check_pause_calls = 0
+        self.num_pauses = 0
+        self._pause_requested = False
+        self._termination_requested = False
+        self._calls_since_pause = 0
+
+    def request_pause(self) -> None:
+        """Make :meth:`check_pause` return ``True`` until :meth:`pause` is called."""
+        self._pause_requested = True
+
+    def request_termination(self) -> None:
+        """Make the next call to :meth:`pause` raise ``TerminationRequested``."""
+        self._termination_requested = True
+
+    def check_pause(self, rid: int = None) -> bool:
+        self.num_check_pause_calls += 1
+        self._calls_since_pause += 1
+        if self.pause_after is not None and \
+                self._calls_since_pause >= self.pause_after:
+            self._pause_requested = True
+        return self._pause_requested or self._termination_requested
+
+    def pause(self) -> None:
+        self.num_pauses += 1
+        self._pause_requested = False
+        self._calls_since_pause = 0
+        if self._termination_requested:
+            raise TerminationRequested
@@ -11,21 +11,29 @@ The two main entry points into the :class:`.ExpFragment` universe are
 """
 
 from artiq.language import *
-from contextlib import suppress
+from contextlib import contextmanager, suppress
+import glob
+import h5py
 import json
 import logging
+import os
 import random
 from typing import Any, Callable, Dict, Iterable, Type
 
 from .default_analysis import AnnotationContext
-from .fragment import ExpFragment
+from .fragment import AsyncExpFragment, ExpFragment
+from .kernel_cache import KernelCache
 from .parameters import type_string_to_param
-from .result_channels import (AppendingDatasetSink, LastValueSink, ScalarDatasetSink,
-                              ResultChannel)
+from .result_channels import (AppendingDatasetSink, ArrayChannel, ArrayDatasetSink,
+                              DatasetFlushGroup, FloatChannel, IntChannel,
+                              LastValueSink, ResultChannel, ScalarDatasetSink)
 from .scan_generator import GENERATORS, ScanOptions
 from .scan_runner import (ScanAxis, ScanRunner, ScanSpec, describe_scan,
                           filter_default_analyses)
-from .utils import shorten_to_unambiguous_suffixes, is_kernel
+from .telemetry import ScanProgress, ScanTelemetry
+from .tracing import Tracer
+from .utils import (is_kernel, load_point_values, run_in_new_event_loop,
+                    shorten_to_unambiguous_suffixes)
 
 # We don't want to export FragmentScanExperiment to hide it from experiment
 # class discovery.
@@ -42,6 +50,12 @@ PARAMS_ARG_KEY = "ndscan_params"
 logger = logging.getLogger(__name__)
 
 
+@contextmanager
+def _null_context():
+    # contextlib.nullcontext() is only available from Python 3.7 on.
+    yield
+
+
 class ScanSpecError(Exception):
     """Raised when the scan specification passed in :data:`PARAMS_ARG_KEY` is not valid
     for the given fragment."""
@@ -90,6 +104,18 @@ class FragmentScanExperiment(EnvExperiment):
         self._scan_axis_sinks = None
         self._scan_result_sinks = {}
 
+        # Coordinates the dataset sinks if appends are coalesced (see
+        # ``result_flush_interval`` in the scan specification).
+        self._flush_group = None
+
+        # Number of points and their coordinates already acquired in a previous run if
+        # resuming an interrupted scan.
+        self._resume_index = 0
+        self._resume_axis_data = []
+
+        # Records a host-side execution trace if enabled in the scan specification.
+        self._tracer = None
+
     def prepare(self):
         """Collect parameters to set from both scan axes and simple overrides, and
         initialise result channels.
@@ -126,10 +152,32 @@ class FragmentScanExperiment(EnvExperiment):
             axes.append(ScanAxis(self.schemata[fqn], pathspec, store))
 
         options = ScanOptions(
-            scan.get("num_repeats", 1), scan.get("continuous_without_axes", True),
-            scan.get("randomise_order_globally", False))
+            scan.get("num_repeats", 1),
+            scan.get("continuous_without_axes", True),
+            scan.get("randomise_order_globally", False),
+            chunk_target_duration=scan.get("chunk_target_duration", 0.2),
+            min_chunk_size=scan.get("min_chunk_size", 1),
+            max_chunk_size=scan.get("max_chunk_size", 4096),
+            batch_results=scan.get("batch_results", False),
+            max_upload_points=scan.get("max_upload_points", 0),
+            pause_check_interval=scan.get("pause_check_interval", 256),
+            skip_unchanged_setup=scan.get("skip_unchanged_setup", False),
+            num_workers=scan.get("num_workers", 1),
+            accumulate_repeats=scan.get("accumulate_repeats", False))
         self._scan = ScanSpec(axes, generators, options)
 
+        if scan.get("trace", False):
+            self._tracer = Tracer()
+
+        flush_interval = scan.get("result_flush_interval", None)
+        if flush_interval is not None:
+            self._flush_group = DatasetFlushGroup(max_interval=flush_interval)
+
+        resume_datasets = None
+        resume_from = scan.get("resume_from", None)
+        if resume_from is not None:
+            resume_datasets = self._prepare_resume(resume_from)
+
         self.fragment.init_params(param_stores)
 
         # Initialise result channels.
@@ -143,34 +191,119 @@ class FragmentScanExperiment(EnvExperiment):
             if not channel.save_by_default:
                 continue
             name = chan_name_map[path].replace("/", "_")
-            self._short_child_channel_names[channel] = name
+            self._setup_result_sink(channel, name, resume_datasets)
+
+        # If repeats are accumulated, the standard error of the mean of each scalar
+        # numeric channel is recorded in an extra channel, unless the fragment already
+        # provides one by that name.
+        self._scan_error_sinks = {}
+        if self._scan.axes and options.accumulate_repeats:
+            names = set(self._short_child_channel_names.values())
+            for channel, name in list(self._short_child_channel_names.items()):
+                if (type(channel) not in (FloatChannel, IntChannel)
+                        or "error_bar_for" in channel.display_hints
+                        or name + "_err" in names):
+                    continue
+                error_channel = FloatChannel(
+                    channel.path + "_err",
+                    "Standard error of the mean of " + (channel.description or name),
+                    {"error_bar_for": name},
+                    unit=channel.unit,
+                    scale=channel.scale)
+                self._setup_result_sink(error_channel, name + "_err", resume_datasets)
+                self._scan_error_sinks[channel] = error_channel.sink
+
+        # Resolve result channels given by name for generators adapting to results.
+        channels_by_name = {
+            chan_name_map[path].replace("/", "_"): channel
+            for path, channel in chan_dict.items()
+        }
+        for generator in self._scan.generators:
+            name = generator.get_feedback_channel()
+            if isinstance(name, str):
+                if name not in channels_by_name:
+                    raise ScanSpecError(
+                        "Result channel '{}' for adaptive scan not found".format(name))
+                generator.channel = channels_by_name[name]
+
+    def _setup_result_sink(self, channel: ResultChannel, name: str,
+                           resume_datasets: Dict[str, Any]) -> None:
+        """Create the sink to store the values of the given channel in, under the given
+        (shortened) name, restoring previously acquired values when resuming."""
+        self._short_child_channel_names[channel] = name
+
+        if self._scan.axes:
+            # Arrays that might vary in shape from point to point (e.g. subscan
+            # results) need to be stored in the ragged layout if they do.
+            sink_class = AppendingDatasetSink
+            if isinstance(channel, ArrayChannel) and None in channel.shape:
+                sink_class = ArrayDatasetSink
+            sink = sink_class(self,
+                              "ndscan.points.channel_" + name,
+                              flush_group=self._flush_group)
+        else:
+            sink = ScalarDatasetSink(self, "ndscan.point." + name)
+        channel.set_sink(sink)
+        self._scan_result_sinks[channel] = sink
 
-            if self._scan.axes:
-                sink = AppendingDatasetSink(self, "ndscan.points.channel_" + name)
-            else:
-                sink = ScalarDatasetSink(self, "ndscan.point." + name)
-            channel.set_sink(sink)
-            self._scan_result_sinks[channel] = sink
+        if resume_datasets is not None:
+            previous = load_point_values(resume_datasets.get,
+                                         "ndscan.points.channel_" + name)
+            if previous is not None:
+                sink.push_many(previous[:self._resume_index])
 
     def run(self):
         """Run the (possibly trivial) scan."""
         self._broadcast_metadata()
         self._issue_ccb()
 
-        with suppress(TerminationRequested):
-            if not self._scan.axes:
-                self._run_single()
-            else:
-                runner = ScanRunner(self)
-                self._scan_axis_sinks = [
-                    AppendingDatasetSink(self, "ndscan.points.axis_{}".format(i))
-                    for i in range(len(self._scan.axes))
-                ]
-                runner.run(self.fragment, self._scan, self._scan_axis_sinks)
+        if self._tracer is not None:
+            self._tracer.instrument_fragment(self.fragment)
+            for sink in self._scan_result_sinks.values():
+                self._tracer.instrument_sink(sink, sink.key)
 
-            self._set_completed()
+        try:
+            with suppress(TerminationRequested):
+                if not self._scan.axes:
+                    self._run_single()
+                else:
+                    self._run_scan()
+                self._set_completed()
+        finally:
+            if self._tracer is not None:
+                self._tracer.restore()
+
+    def _run_scan(self):
+        runner = ScanRunner(self)
+        self._scan_axis_sinks = [
+            AppendingDatasetSink(self,
+                                 "ndscan.points.axis_{}".format(i),
+                                 flush_group=self._flush_group)
+            for i in range(len(self._scan.axes))
+        ]
+        for sink, values in zip(self._scan_axis_sinks, self._resume_axis_data):
+            sink.push_many(values)
+        if self._tracer is not None:
+            for sink in self._scan_axis_sinks:
+                self._tracer.instrument_sink(sink, sink.key)
+        runner.run(self.fragment,
+                   self._scan,
+                   self._scan_axis_sinks,
+                   start_index=self._resume_index,
+                   checkpoint_sink=ScalarDatasetSink(self, "ndscan.checkpoint"),
+                   telemetry=ScanTelemetry(self._publish_telemetry),
+                   progress=ScanProgress(self._publish_progress),
+                   flush_group=self._flush_group,
+                   error_sinks=self._scan_error_sinks)
 
     def analyze(self):
+        try:
+            self._run_default_analyses()
+        finally:
+            if self._tracer is not None:
+                self._write_trace()
+
+    def _run_default_analyses(self):
         if not self._scan_axis_sinks:
             return
 
@@ -196,7 +329,8 @@ class FragmentScanExperiment(EnvExperiment):
 
         annotations = []
         for a in analyses:
-            annotations += a.execute(axis_data, result_data, context)
+            with self._trace_span(type(a).__name__, "analysis"):
+                annotations += a.execute(axis_data, result_data, context)
 
         if annotations:
             # Replace existing (online-fit) annotations if any analysis produced custom
@@ -204,6 +338,68 @@ class FragmentScanExperiment(EnvExperiment):
             self.set_dataset(
                 "ndscan.annotations", json.dumps(annotations), broadcast=True)
 
+    def _prepare_resume(self, resume_from) -> Dict[str, Any]:
+        """Load the results of a previous, interrupted run of the same scan, and set up
+        the scan to continue where it left off.
+
+        :param resume_from: The RID of the previous run, or the path to its HDF5
+            results file.
+        :return: The ``ndscan.*`` datasets of the previous run.
+        """
+        if not self._scan.axes:
+            raise ScanSpecError("Can only resume scans with at least one axis")
+        for generator in self._scan.generators:
+            if generator.get_feedback_channel() is not None:
+                raise ScanSpecError("Resuming adaptive scans is not supported")
+
+        if isinstance(resume_from, int):
+            path = _find_results_file(resume_from)
+        else:
+            path = resume_from
+        try:
+            datasets = _load_ndscan_datasets(path)
+        except OSError as e:
+            raise ScanSpecError(
+                "Could not read results file to resume from: {}".format(e))
+
+        if "ndscan.checkpoint" not in datasets:
+            raise ScanSpecError("No scan checkpoint found in '{}'".format(path))
+        checkpoint = json.loads(datasets["ndscan.checkpoint"])
+
+        # The point order is only reproduced exactly if all the parameters that affect
+        # it match.
+        options = self._scan.options
+        if (checkpoint["num_repeats"] != options.num_repeats
+                or checkpoint["randomise_order_globally"] !=
+                options.randomise_order_globally
+                or checkpoint.get("accumulate_repeats", False) !=
+                options.accumulate_repeats):
+            raise ScanSpecError("Scan options do not match those of the run to resume")
+        previous_axes = json.loads(datasets["ndscan.axes"])
+        if len(previous_axes) != len(self._scan.axes):
+            raise ScanSpecError(
+                "Number of axes does not match that of the run to resume")
+        for i, (axis, generator,
+                previous) in enumerate(zip(self._scan.axes, self._scan.generators,
+                                           previous_axes)):
+            limits = {}
+            generator.describe_limits(limits)
+            if (previous["param"]["fqn"] != axis.param_schema["fqn"]
+                    or previous["path"] != axis.path
+                    or any(previous.get(k, None) != v for k, v in limits.items())):
+                raise ScanSpecError(
+                    "Axis {} does not match that of the run to resume".format(i))
+
+        options.seed = checkpoint["seed"]
+        self._resume_index = checkpoint["num_completed"]
+        self._resume_axis_data = [
+            datasets["ndscan.points.axis_{}".format(i)][:self._resume_index]
+            for i in range(len(self._scan.axes))
+        ]
+        logger.info("Resuming scan from '%s' after %s completed points", path,
+                    self._resume_index)
+        return datasets
+
     def _run_single(self):
         try:
             with suppress(TerminationRequested):
@@ -212,6 +408,8 @@ class FragmentScanExperiment(EnvExperiment):
                     if is_kernel(self.fragment.run_once):
                         self._run_continuous_kernel()
                         self.core.comm.close()
+                    elif isinstance(self.fragment, AsyncExpFragment):
+                        run_in_new_event_loop(self._continuous_loop_async())
                     else:
                         self._continuous_loop()
                     if not self._scan.options.continuous_without_axes:
@@ -238,6 +436,36 @@ class FragmentScanExperiment(EnvExperiment):
             if not self._scan.options.continuous_without_axes:
                 return
 
+    async def _continuous_loop_async(self):
+        first = True
+        while not self.scheduler.check_pause():
+            if first:
+                await self.fragment.device_setup()
+                first = False
+            else:
+                await self.fragment.device_reset()
+            await self.fragment.run_once()
+            if not self._scan.options.continuous_without_axes:
+                return
+
+    def _trace_span(self, name, category):
+        if self._tracer is None:
+            return _null_context()
+        return self._tracer.span(name, category)
+
+    def _write_trace(self):
+        # ARTIQ workers are run from within the directory the results file is written
+        # to, so store the trace alongside it under a matching name.
+        path = "{:09}-{}.trace.json".format(self.scheduler.rid, type(self).__name__)
+        self._tracer.write(path, process_name="ndscan: " + self.fragment.fqn)
+        logger.info("Execution trace written to '%s'", os.path.abspath(path))
+
+    def _publish_telemetry(self, name, value):
+        self.set_dataset("ndscan.telemetry." + name, value, broadcast=True)
+
+    def _publish_progress(self, name, value):
+        self.set_dataset("ndscan.progress." + name, value, broadcast=True)
+
     def _set_completed(self):
         self.set_dataset("ndscan.completed", True, broadcast=True)
 
@@ -271,6 +499,39 @@ class FragmentScanExperiment(EnvExperiment):
             is_transient=True)
 
 
+def _find_results_file(rid: int) -> str:
+    name = "{:09}-*.h5".format(rid)
+    # ARTIQ workers are run from within the results/<date>/<hour> directory of the
+    # respective experiment, but also allow results files to be found from the master
+    # directory (e.g. for experiments run using artiq_run).
+    for pattern in [
+            os.path.join("..", "..", "*", "*", name),
+            os.path.join("results", "*", "*", name)
+    ]:
+        matches = sorted(glob.glob(pattern))
+        if matches:
+            return matches[-1]
+    raise ScanSpecError("Results file for RID {} not found".format(rid))
+
+
+def _load_ndscan_datasets(path: str) -> Dict[str, Any]:
+    def decode(value):
+        if isinstance(value, bytes):
+            return value.decode()
+        if hasattr(value, "tolist"):
+            return value.tolist()
+        return value
+
+    with h5py.File(path, "r") as f:
+        # Datasets are stored in the root group in results files from older ARTIQ
+        # versions.
+        group = f["datasets"] if "datasets" in f else f
+        return {
+            key: decode(group[key][()])
+            for key in group.keys() if key.startswith("ndscan.")
+        }
+
+
 def _shorten_result_channel_names(full_names: Iterable[str]) -> Dict[str, str]:
     return shorten_to_unambiguous_suffixes(
         full_names, lambda fqn, n: "/".join(fqn.split("/")[-n:]))
@@ -306,10 +567,16 @@ def make_fragment_scan_exp(
     return FragmentScanShim
 
 
-def run_fragment_once(fragment: ExpFragment) -> Dict[ResultChannel, Any]:
+def run_fragment_once(fragment: ExpFragment,
+                      kernel_cache: KernelCache = None) -> Dict[ResultChannel, Any]:
     """Initialise the passed fragment and run it once, capturing and returning the
     values from any result channels.
 
+    :param kernel_cache: If given, the kernel for running fragments with kernel
+        ``run_once()`` methods is only compiled on the first call for a given fragment
+        and then reused from the cache. This is only appropriate if the parameter
+        values do not change between calls (see :class:`.KernelCache`).
+
     :return: A dictionary mapping :class:`ResultChannel` instances to their values
         (or ``None`` if not pushed to).
     """
@@ -334,7 +601,19 @@ def run_fragment_once(fragment: ExpFragment) -> Dict[ResultChannel, Any]:
                 self.fragment.device_setup()
                 self.fragment.run_once()
 
-        FragmentRunner(fragment, fragment).run()
+        runner = FragmentRunner(fragment, fragment)
+        if kernel_cache is None:
+            runner.run()
+        else:
+            kernel_cache.run(("run_fragment_once", type(fragment), fragment),
+                             runner.run)
+    elif isinstance(fragment, AsyncExpFragment):
+
+        async def run():
+            await fragment.device_setup()
+            await fragment.run_once()
+
+        run_in_new_event_loop(run())
     else:
         fragment.device_setup()
         fragment.run_once()
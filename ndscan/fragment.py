@@ -2,12 +2,13 @@ from artiq.language import *
 from collections import OrderedDict
 from copy import deepcopy
 import logging
+import types
 from typing import Any, Dict, List, Iterable, Type
 
 from .default_analysis import DefaultAnalysis
 from .parameters import *
 from .result_channels import *
-from .utils import path_matches_spec, strip_prefix
+from .utils import compile_function, path_matches_spec, strip_prefix
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +35,9 @@ class Fragment(HasEnvironment):
         self._subfragments = []
         self._free_params = OrderedDict()
 
+        #: Device drivers requested by this fragment (see :meth:`get_device`).
+        self._devices = []
+
         #: Maps own attribute name to the ParamHandles of the rebound parameters in
         #: their original subfragment (currently always only one, as there is only a
         #: rebinding API that targets single paths).
@@ -66,6 +70,15 @@ class Fragment(HasEnvironment):
         self.build_fragment(*args, **kwargs)
         self._building = False
 
+    def get_device(self, key: str) -> Any:
+        """Return the device driver with the given key (see
+        ``HasEnvironment.get_device()``), keeping track of it such that it can be
+        shared rather than copied when the fragment tree is duplicated (e.g. for
+        parallel scans on the host)."""
+        device = super().get_device(key)
+        self._devices.append(device)
+        return device
+
     def host_setup(self):
         """Called on the host, before the kernel is entered."""
         pass
@@ -308,6 +321,53 @@ class Fragment(HasEnvironment):
         for s in self._subfragments:
             s.init_params(overrides)
 
+    def _enable_setup_tracking(self, parent_flags: List[ChangeFlag] = None) -> None:
+        """Make :meth:`device_setup` and :meth:`device_reset` of this fragment and all
+        its subfragments do nothing unless a parameter of the respective fragment (or
+        any of its subfragments) has changed since the last call.
+
+        This is done by replacing the methods with wrappers on the instances, so
+        :meth:`_disable_setup_tracking` needs to be called to restore the original
+        behaviour.
+
+        :param parent_flags: The change flags of all the parent fragments, which are
+            set as well when any parameter of this fragment changes.
+        """
+        if parent_flags is None:
+            parent_flags = []
+        self._change_flag = ChangeFlag()
+        flags = [self._change_flag] + parent_flags
+        for value in list(self.__dict__.values()):
+            if isinstance(value, ParamHandle):
+                value.set_change_flags(flags)
+        for name in _SETUP_METHOD_NAMES:
+            setattr(self, "_" + name + "_unconditional", getattr(self, name))
+            setattr(self, name,
+                    types.MethodType(_make_setup_if_changed(type(self), name), self))
+        for s in self._subfragments:
+            s._enable_setup_tracking(flags)
+
+    def _disable_setup_tracking(self) -> None:
+        """Undo the effects of :meth:`_enable_setup_tracking`."""
+        for s in self._subfragments:
+            s._disable_setup_tracking()
+        for name in _SETUP_METHOD_NAMES:
+            delattr(self, name)
+            delattr(self, "_" + name + "_unconditional")
+        for value in list(self.__dict__.values()):
+            if isinstance(value, ParamHandle):
+                value.set_change_flags([])
+        del self._change_flag
+
+    def _mark_setup_changed(self) -> None:
+        """Set the change flags of this fragment and all its subfragments, such that
+        the next :meth:`device_setup` call fully reinitialises the hardware (e.g. after
+        the experiment was paused and other experiments might have run in between).
+        """
+        self._change_flag.changed = True
+        for s in self._subfragments:
+            s._mark_setup_changed()
+
     def _get_all_handles_for_param(self, name: str) -> List[ParamHandle]:
         return [getattr(self, name)] + self._rebound_subfragment_params.get(name, [])
 
@@ -317,6 +377,11 @@ class Fragment(HasEnvironment):
     def _stringize_path(self) -> str:
         return "/".join(self._fragment_path)
 
+    def _collect_devices(self, devices: List[Any]) -> None:
+        devices.extend(self._devices)
+        for s in self._subfragments:
+            s._collect_devices(devices)
+
     def _collect_result_channels(self, channels: Dict[str, ResultChannel]) -> None:
         channels.update(self._result_channels)
         for s in self._subfragments:
@@ -333,9 +398,38 @@ class Fragment(HasEnvironment):
             return default
 
 
+#: The methods replaced by :meth:`Fragment._enable_setup_tracking`.
+_SETUP_METHOD_NAMES = ["device_setup", "device_reset"]
+
+#: Generated wrapper functions by fragment class and method name, as the ARTIQ compiler
+#: requires each function to be used with one type of ``self`` only.
+_setup_if_changed_functions = {}
+
+
+def _make_setup_if_changed(klass: Type[Fragment], name: str):
+    key = (klass, name)
+    if key not in _setup_if_changed_functions:
+        # The flag is only cleared afterwards, as the default device_reset() calls
+        # device_setup().
+        source = ("@portable\n"
+                  "def {name}_if_changed(self):\n"
+                  "    if self._change_flag.changed:\n"
+                  "        self._{name}_unconditional()\n"
+                  "        self._change_flag.changed = False\n").format(name=name)
+        _setup_if_changed_functions[key] = compile_function(
+            source, name + "_if_changed", {"portable": portable})
+    return _setup_if_changed_functions[key]
+
+
 class ExpFragment(Fragment):
     """Fragment that supports the notion of being run to produce results."""
 
+    #: Whether independent copies of the fragment tree (see :func:`copy.deepcopy`)
+    #: can be run concurrently from several threads, e.g. for pure host-side
+    #: simulations. If so, scans can be executed in parallel (see ``num_workers`` in
+    #: :class:`.ScanOptions`).
+    is_reentrant = False
+
     def run_once(self):
         """Execute the experiment described by the fragment once with the current
         parameters, producing one set of results (if any)."""
@@ -343,3 +437,34 @@ class ExpFragment(Fragment):
 
     def get_default_analyses(self) -> Iterable[DefaultAnalysis]:
         return []
+
+
+class AsyncExpFragment(ExpFragment):
+    """:class:`ExpFragment` implemented in terms of :mod:`asyncio` coroutines on the
+    host, e.g. to communicate with network-attached instruments.
+
+    :meth:`device_setup`, :meth:`device_reset` and :meth:`run_once` are coroutines.
+    In scans, :meth:`device_setup` for the next point is already executed while
+    ``run_once()`` for previous points is still in progress (up to
+    :attr:`max_points_in_flight` points at a time). Implementations of
+    :meth:`run_once` thus need to read all the parameter values they need before first
+    suspending. The results pushed for each point are passed on in point order; for
+    this, they need to be pushed from the coroutine itself rather than from other
+    tasks it spawns.
+    """
+
+    #: The maximum number of points for which :meth:`run_once` can be in progress at
+    #: the same time during scans.
+    max_points_in_flight = 2
+
+    async def device_setup(self) -> None:
+        pass
+
+    async def device_reset(self) -> None:
+        # By default, just completely reinitialize.
+        await self.device_setup()
+
+    async def run_once(self) -> None:
+        """Execute the experiment described by the fragment once with the current
+        parameters, producing one set of results (if any)."""
+        pass
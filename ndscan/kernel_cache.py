@@ -0,0 +1,73 @@
+"""
+Caching of compiled kernels to avoid recompiling the same code again and again (e.g.
+when a scan is resumed after being paused).
+"""
+
+import logging
+from typing import Any, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class KernelCache:
+    """Stores compiled kernel libraries by a user-specified key, so repeated invocations
+    of the same kernel can skip the (potentially very slow) compilation step.
+
+    As ARTIQ embeds the values of any host object attributes accessed from a kernel at
+    compile time, a cached kernel runs with the attribute values from when it was first
+    compiled (rather than those written back at the end of the previous invocation, or
+    changed on the host in the meantime). Keys thus need to capture everything the
+    kernel code and the relevant attributes depend on, and cached kernels should only
+    be used where the kernels do not rely on state kept in attributes across
+    invocations.
+
+    Only kernels without return values are supported. Loading and running the cached
+    libraries mirrors what ``Core.run()`` does internally (using ``Core.compile()`` and
+    the ``comm`` interface), so the core device driver needs to provide those; this
+    is the case for the ARTIQ ``Core`` and :class:`.EmulatedCore`, but not for generic
+    mock objects.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+        #: The number of kernel invocations for which a previously compiled library
+        #: was reused.
+        self.num_hits = 0
+
+        #: The number of kernel invocations that required compiling the kernel.
+        self.num_misses = 0
+
+    def run(self, key: Hashable, kernel_method: Callable[[], Any]) -> None:
+        """Run the given bound ``@kernel`` method (without arguments) on the core
+        device, reusing the library compiled for a previous call with the same key if
+        there is one.
+
+        :param key: The cache key. Host objects that are part of the key are compared
+            by identity and kept alive as long as the entry exists.
+        :param kernel_method: The kernel method to compile if there is no cached
+            entry for ``key``.
+        """
+        obj = kernel_method.__self__
+        core = getattr(obj, kernel_method.__func__.artiq_embedded.core_name)
+
+        entry = self._entries.get(key, None)
+        if entry is None:
+            self.num_misses += 1
+            entry = core.compile(kernel_method.__func__, (obj, ), {})
+            self._entries[key] = entry
+        else:
+            self.num_hits += 1
+            logger.debug("Reusing compiled kernel for %s", key)
+        embedding_map, kernel_library, symbolizer, demangler = entry
+
+        if core.first_run:
+            core.comm.check_system_info()
+            core.first_run = False
+        core.comm.load(kernel_library)
+        core.comm.run()
+        core.comm.serve(embedding_map, symbolizer, demangler)
+
+    def clear(self) -> None:
+        """Remove all cached kernels (the hit/miss counters are left unchanged)."""
+        self._entries.clear()
@@ -10,7 +10,8 @@ machinery for all the value types.
 
 from artiq.language import *
 from artiq.language import units
-from typing import Any, Callable, Dict, Tuple, Union
+import numpy as np
+from typing import Any, Callable, Dict, List, Tuple, Union
 
 from .utils import eval_param_default
 
@@ -58,6 +59,7 @@ class ParamStore:
     def _notify_handles(self):
         for h in self._handles:
             h._changed_after_use = True
+            h._notify_change_flags()
 
     @portable
     def _do_nothing(self):
@@ -109,11 +111,32 @@ class StringParamStore(ParamStore):
         return str(value)
 
 
+class ChangeFlag:
+    """Set whenever a parameter of the fragment it belongs to (or any of its
+    subfragments) changes; used to skip ``device_setup()`` for fragments that have not
+    changed (see ``skip_unchanged_setup`` in :class:`.ScanOptions`)."""
+
+    def __init__(self):
+        self.changed = True
+
+
 class ParamHandle:
     def __init__(self):
         self._store = None
         self._changed_after_use = True
 
+        # KLUDGE: Work around type inference failing for empty lists.
+        self._change_flags = []
+        self._notify_change_flags = self._do_nothing
+
+    @host_only
+    def set_change_flags(self, flags: List[ChangeFlag]) -> None:
+        """Set the :class:`ChangeFlag` instances to set when the parameter value
+        changes (typically those of the owning fragment and all its parents)."""
+        self._change_flags = flags
+        self._notify_change_flags = (self._set_change_flags
+                                     if flags else self._do_nothing)
+
     def set_store(self, store) -> None:
         if self._store:
             self._store.unregister_handle(self)
@@ -130,6 +153,15 @@ class ParamHandle:
     def changed_after_use(self) -> TBool:
         return self._changed_after_use
 
+    @portable
+    def _set_change_flags(self):
+        for f in self._change_flags:
+            f.changed = True
+
+    @portable
+    def _do_nothing(self):
+        pass
+
 
 class FloatParamHandle(ParamHandle):
     @portable
@@ -168,6 +200,7 @@ class FloatParam:
     HandleType = FloatParamHandle
     StoreType = FloatParamStore
     CompilerType = TFloat
+    NumpyDType = np.float64
 
     def __init__(self,
                  fqn: str,
@@ -235,6 +268,7 @@ class IntParam:
     HandleType = IntParamHandle
     StoreType = IntParamStore
     CompilerType = TInt32
+    NumpyDType = np.int32
 
     def __init__(self,
                  fqn: str,
@@ -288,6 +322,7 @@ class StringParam:
     HandleType = StringParamHandle
     StoreType = StringParamStore
     CompilerType = TStr
+    NumpyDType = None
 
     def __init__(self, fqn: str, description: str, default: str):
         self.fqn = fqn
@@ -7,6 +7,7 @@ from .model.subscan import create_subscan_roots
 from .image_2d import Image2DPlotWidget
 from .rolling_1d import Rolling1DPlotWidget
 from .xy_1d import XY1DPlotWidget
+from ..utils import strip_suffix
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,28 @@ def _make_dimensional_plot(model: ScanModel, get_alternate_names):
         "Plots for {}-dimensional data are not yet implemented".format(dim))
 
 
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "{}:{:02}:{:02}".format(hours, minutes, seconds)
+    return "{}:{:02}".format(minutes, seconds)
+
+
+def _describe_progress(progress) -> str:
+    completed = progress.get("completed", None)
+    if completed is None:
+        return ""
+    total = progress.get("total", None)
+    if total is None:
+        return "{} points".format(completed)
+    result = "{}/{} points".format(completed, total)
+    eta = progress.get("eta", None)
+    if eta is not None and completed < total:
+        result += ", ETA {}".format(_format_duration(eta))
+    return result
+
+
 class RootWidget(QtWidgets.QWidget):
     def __init__(self, root: Root, context: Context):
         super().__init__()
@@ -29,7 +52,8 @@ class RootWidget(QtWidgets.QWidget):
         self.root.model_changed.connect(self._update_plot)
 
         self.context = context
-        self.context.title_changed.connect(self._set_window_title)
+        self.context.title_changed.connect(self._update_window_title)
+        self.context.progress_changed.connect(self._update_window_title)
 
         self.layout = QtWidgets.QVBoxLayout()
         self.layout.setContentsMargins(0, 0, 0, 0)
@@ -42,11 +66,39 @@ class RootWidget(QtWidgets.QWidget):
         self.widget_stack.addWidget(self.message_label)
         self.layout.addWidget(self.widget_stack)
 
+        # Scan performance statistics, if any are published.
+        self.telemetry_label = QtWidgets.QLabel()
+        self.telemetry_label.setWordWrap(True)
+        self.telemetry_label.hide()
+        self.layout.addWidget(self.telemetry_label)
+        self.context.telemetry_changed.connect(self._set_telemetry)
+
         self.plot_container = None
 
-    def _set_window_title(self, title):
+    def _update_window_title(self, *args):
+        title = self.context.title
+        progress = _describe_progress(self.context.progress)
+        if progress:
+            title += " ({})".format(progress)
         self.setWindowTitle("{} – ndscan".format(title))
 
+    def _set_telemetry(self, telemetry):
+        telemetry = {k: v for k, v in telemetry.items() if v is not None}
+        parts = []
+        points_per_second = telemetry.get("points_per_second", None)
+        if points_per_second is not None:
+            parts.append("{:.1f} points/s".format(points_per_second))
+        categories = sorted(
+            strip_suffix(name, "_p50") for name in telemetry if name.endswith("_p50"))
+        for category in categories:
+            parts.append("{}: {:.2f}/{:.2f} ms".format(
+                category, 1e3 * telemetry[category + "_p50"],
+                1e3 * telemetry.get(category + "_p99", float("nan"))))
+        self.telemetry_label.setText(" · ".join(parts))
+        self.telemetry_label.setToolTip(
+            "Scan performance (median/99th percentile of recent durations)")
+        self.telemetry_label.setVisible(bool(parts))
+
     def _update_plot(self):
         if self.plot_container:
             self.widget_stack.setCurrentIndex(
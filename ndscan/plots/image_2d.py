@@ -1,4 +1,4 @@
-"""Pseudocolor 2D plot for equidistant data."""
+"""Pseudocolor 2D plot for equidistant or scattered data."""
 
 from itertools import chain, repeat
 import logging
@@ -16,7 +16,7 @@ from .utils import (extract_linked_datasets, extract_scalar_channels, setup_axis
 logger = logging.getLogger(__name__)
 
 
-def _calc_range_spec(preset_min, preset_max, preset_increment, data):
+def _calc_range_spec(preset_min, preset_max, preset_increment, data, num_bins=None):
     sorted_data = np.unique(data)
 
     lower = preset_min if preset_min else sorted_data[0]
@@ -24,6 +24,9 @@ def _calc_range_spec(preset_min, preset_max, preset_increment, data):
 
     if preset_increment:
         increment = preset_increment
+    elif num_bins and lower != upper:
+        # Scattered data, binned into cells with the given resolution.
+        increment = (upper - lower) / num_bins
     elif len(sorted_data) > 1:
         increment = np.min(sorted_data[1:] - sorted_data[:-1])
     else:
@@ -41,6 +44,15 @@ def _calc_range_spec(preset_min, preset_max, preset_increment, data):
     return lower, upper, increment
 
 
+def _scattered_num_bins(num_points_per_cell_column, num_scattered_axes):
+    """Choose the number of bins along scattered axes such that there is about one
+    point per cell on average, so the resolution of the image increases as more points
+    come in (in powers of two to avoid needlessly frequent changes).
+    """
+    num = num_points_per_cell_column**(1 / num_scattered_axes)
+    return int(np.clip(2**np.floor(np.log2(max(num, 1))), 4, 512))
+
+
 def _num_points_in_range(range_spec):
     min, max, increment = range_spec
     return int(np.rint((max - min) / increment + 1))
@@ -56,7 +68,9 @@ class _ImagePlot:
                  x_min: Union[float, None], x_max: Union[float, None],
                  x_increment: Union[float, None], y_min: Union[float, None],
                  y_max: Union[float, None], y_increment: Union[float, None],
-                 hints_for_channels: Dict[str, dict]):
+                 hints_for_channels: Dict[str, dict],
+                 x_scattered: bool = False,
+                 y_scattered: bool = False):
         self.image_item = image_item
         self.active_channel_name = active_channel_name
         self.hints_for_channels = hints_for_channels
@@ -69,6 +83,12 @@ class _ImagePlot:
         self.y_max = y_max
         self.y_increment = y_increment
 
+        #: Whether the coordinates along each axis are scattered (e.g. from a
+        #: low-discrepancy sequence) rather than on a grid. In this case, the points are
+        #: binned into cells, the number of which increases as more data comes in.
+        self.x_scattered = x_scattered
+        self.y_scattered = y_scattered
+
         self.num_shown = 0
         self.current_z_limits = None
         self.x_range = None
@@ -124,8 +144,27 @@ class _ImagePlot:
 
         # Determine range of x/y values to show and prepare image buffer accordingly if
         # it changed.
-        x_range = _calc_range_spec(self.x_min, self.x_max, self.x_increment, x_data)
-        y_range = _calc_range_spec(self.y_min, self.y_max, self.y_increment, y_data)
+        x_bins = None
+        y_bins = None
+        scattered = self.x_scattered or self.y_scattered
+        if scattered:
+            num_per_column = num_to_show
+            if not self.x_scattered:
+                num_per_column /= len(np.unique(x_data[:num_to_show]))
+            if not self.y_scattered:
+                num_per_column /= len(np.unique(y_data[:num_to_show]))
+            num_bins = _scattered_num_bins(num_per_column,
+                                           self.x_scattered + self.y_scattered)
+            x_bins = num_bins if self.x_scattered else None
+            y_bins = num_bins if self.y_scattered else None
+
+            # Cells are coloured according to the mean of all the points they contain,
+            # so always redraw everything.
+            num_skip = 0
+        x_range = _calc_range_spec(self.x_min, self.x_max, self.x_increment, x_data,
+                                   x_bins)
+        y_range = _calc_range_spec(self.y_min, self.y_max, self.y_increment, y_data,
+                                   y_bins)
 
         if x_range != self.x_range or y_range != self.y_range:
             self.x_range = x_range
@@ -147,9 +186,22 @@ class _ImagePlot:
 
         x_inds = _coords_to_indices(x_data[num_skip:num_to_show], self.x_range)
         y_inds = _coords_to_indices(y_data[num_skip:num_to_show], self.y_range)
+        z_values = np.array(z_data[num_skip:num_to_show])
+
+        if scattered:
+            num_y = self.image_data.shape[1]
+            num_cells = self.image_data.shape[0] * num_y
+            cell_inds = x_inds * num_y + y_inds
+            counts = np.bincount(cell_inds, minlength=num_cells)
+            sums = np.bincount(cell_inds, weights=z_values, minlength=num_cells)
+            cell_inds = np.nonzero(counts)[0]
+            x_inds = cell_inds // num_y
+            y_inds = cell_inds % num_y
+            z_values = sums[cell_inds] / counts[cell_inds]
+            self.image_data[:] = 0
 
         z_min, z_max = self.current_z_limits
-        z_scaled = (z_data[num_skip:num_to_show] - z_min) / (z_max - z_min)
+        z_scaled = (z_values - z_min) / (z_max - z_min)
 
         cmap = colormaps.plasma
         if self._get_display_hints().get("coordinate_type", "") == "cyclic":
@@ -223,8 +275,13 @@ class Image2DPlotWidget(AlternateMenuPlotWidget):
 
         image_item = pyqtgraph.ImageItem()
         self.addItem(image_item)
-        self.plot = _ImagePlot(image_item, self.data_names[0], *bounds(self.x_schema),
-                               *bounds(self.y_schema), hints_for_channels)
+        self.plot = _ImagePlot(image_item,
+                               self.data_names[0],
+                               *bounds(self.x_schema),
+                               *bounds(self.y_schema),
+                               hints_for_channels,
+                               x_scattered=self.x_schema.get("scattered", False),
+                               y_scattered=self.y_schema.get("scattered", False))
         self.ready.emit()
 
     def _update_points(self, points, invalidate):
@@ -8,17 +8,33 @@ logger = logging.getLogger(__name__)
 
 class Context(QtCore.QObject):
     title_changed = QtCore.pyqtSignal(str)
+    telemetry_changed = QtCore.pyqtSignal(dict)
+    progress_changed = QtCore.pyqtSignal(dict)
 
     def __init__(self, set_dataset: Callable[[str, Any], None] = None):
         super().__init__()
         self._set_dataset = set_dataset
         self.title = ""
+        self.telemetry = {}
+        self.progress = {}
 
     def set_title(self, title: str) -> None:
         if title != self.title:
             self.title = title
             self.title_changed.emit(title)
 
+    def set_telemetry(self, telemetry: Dict[str, float]) -> None:
+        """Update the scan performance statistics (see :mod:`ndscan.telemetry`)."""
+        if telemetry != self.telemetry:
+            self.telemetry = telemetry
+            self.telemetry_changed.emit(telemetry)
+
+    def set_progress(self, progress: Dict[str, float]) -> None:
+        """Update the scan progress indicators (see :class:`.ScanProgress`)."""
+        if progress != self.progress:
+            self.progress = progress
+            self.progress_changed.emit(progress)
+
     def is_online_master(self) -> bool:
         return self.set_dataset is not None
 
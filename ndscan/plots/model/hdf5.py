@@ -2,6 +2,7 @@ import h5py
 import json
 from typing import Any, Dict
 from . import *
+from ...utils import load_point_values
 from .utils import call_later, emit_later
 
 
@@ -55,10 +56,13 @@ class HDF5ScanModel(ScanModel):
         call_later(lambda: self._set_annotation_schemata(
             json.loads(datasets["ndscan.annotations"][()])))
 
+        def get(key):
+            return datasets[key][:] if key in datasets else None
+
         self._point_data = {}
         for name in (["axis_{}".format(i) for i in range(len(self.axes))] +
                      ["channel_" + c for c in self._channel_schemata.keys()]):
-            self._point_data[name] = datasets["ndscan.points." + name][:]
+            self._point_data[name] = load_point_values(get, "ndscan.points." + name)
         emit_later(self.points_appended, self._point_data)
 
     def get_channel_schemata(self) -> Dict[str, Any]:
@@ -1,3 +1,4 @@
+import numpy as np
 from typing import Any, Dict
 from . import *
 from ...utils import strip_prefix
@@ -46,7 +47,17 @@ class SelectPointFromScanModel(SinglePointModel):
                     name = strip_prefix(key, "channel_")
                     if name != key:
                         point[name] = values[idx]
-        if point == self._point:
+        if _points_equal(point, self._point):
             return
         self._point = point
         self.point_changed.emit(point)
+
+
+def _points_equal(a: Union[None, Dict[str, Any]],
+                  b: Union[None, Dict[str, Any]]) -> bool:
+    # Values might be arrays (e.g. subscan results), for which == is element-wise.
+    if a is None or b is None:
+        return a is b
+    if a.keys() != b.keys():
+        return False
+    return all(np.array_equal(a[k], b[k]) for k in a.keys())
@@ -1,7 +1,7 @@
 from typing import Any, Dict, Iterable
 import json
 from . import *
-from ...utils import strip_prefix
+from ...utils import load_point_values, strip_prefix
 
 
 class SubscriberRoot(Root):
@@ -23,6 +23,17 @@ class SubscriberRoot(Root):
         def d(name):
             return data.get("ndscan." + name, (False, None))[1]
 
+        def collect(prefix):
+            values = {}
+            for key, value in data.items():
+                name = strip_prefix(key, prefix)
+                if name != key:
+                    values[name] = value[1]
+            return values
+
+        self._context.set_telemetry(collect("ndscan.telemetry."))
+        self._context.set_progress(collect("ndscan.progress."))
+
         if not self._title_set:
             fqn = d("fragment_fqn")
             if fqn:
@@ -125,9 +136,13 @@ class SubscriberScanModel(ScanModel):
             self._set_annotation_schemata(json.loads(annotation_json))
             self._annotation_json = annotation_json
 
+        def get(key):
+            return data.get(key, (False, None))[1]
+
         for name in (["axis_{}".format(i) for i in range(len(self.axes))] +
                      ["channel_" + c for c in self._channel_schemata.keys()]):
-            self._point_data[name] = data.get("ndscan.points." + name, (False, []))[1]
+            values = load_point_values(get, "ndscan.points." + name)
+            self._point_data[name] = [] if values is None else values
 
         self.points_appended.emit(self._point_data)
 
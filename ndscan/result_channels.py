@@ -5,7 +5,10 @@ Result handling building blocks.
 from artiq.language import HasEnvironment, rpc
 import artiq.language.units
 import json
-from typing import Any, Dict, List
+import numpy as np
+import time
+from typing import Any, Dict, List, Tuple
+from .utils import RAGGED_OFFSETS_SUFFIX, RaggedArray
 
 
 class ResultSink:
@@ -15,6 +18,13 @@ class ResultSink:
     def push(self, value: Any) -> None:
         raise NotImplementedError
 
+    def push_many(self, values: List[Any]) -> None:
+        """Push several values at once, e.g. when restoring previously acquired
+        results. Equivalent to calling :meth:`push` for each value, which is the
+        default implementation."""
+        for value in values:
+            self.push(value)
+
 
 class LastValueSink(ResultSink):
     """Sink that stores the last-pushed value."""
@@ -39,6 +49,9 @@ class ArraySink(ResultSink):
     def push(self, value: Any) -> None:
         self.data.append(value)
 
+    def push_many(self, values: List[Any]) -> None:
+        self.data.extend(values)
+
     def get_all(self) -> List[Any]:
         """Return a list of all previously pushed values."""
         return self.data
@@ -48,27 +61,271 @@ class ArraySink(ResultSink):
         self.data = []
 
 
+class NumpyArraySink(ArraySink):
+    """Sink that stores all pushed values in a NumPy array of the given data type.
+
+    The backing buffer grows geometrically as values are pushed, and is retained
+    across calls to :meth:`clear`. Sinks that are filled repeatedly (such as those
+    collecting the results of a subscan) thus do not allocate any memory once the
+    buffer has reached the required size.
+
+    :param dtype: The NumPy data type to store the values as.
+    :param shape: The shape of each value, for storing arrays of a fixed shape (e.g.
+        pushed to an :class:`ArrayChannel`). The values are stored along the first
+        axis of the resulting array. Defaults to scalar values.
+    :param capacity: The number of values to initially allocate space for.
+    """
+
+    def __init__(self, dtype, shape: Tuple[int, ...] = (), capacity: int = 16):
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self._buffer = np.empty((max(capacity, 1), ) + self.shape, dtype=self.dtype)
+        self._num_values = 0
+
+    def push(self, value: Any) -> None:
+        if self._num_values == len(self._buffer):
+            self.reserve(2 * len(self._buffer))
+        self._buffer[self._num_values] = value
+        self._num_values += 1
+
+    def push_many(self, values: List[Any]) -> None:
+        if len(values) == 0:
+            return
+        values = np.asarray(values, dtype=self.dtype)
+        end = self._num_values + len(values)
+        if end > len(self._buffer):
+            self.reserve(max(end, 2 * len(self._buffer)))
+        self._buffer[self._num_values:end] = values
+        self._num_values = end
+
+    def reserve(self, capacity: int) -> None:
+        """Make sure the buffer has space for at least the given total number of
+        values, such that they can be pushed without reallocating."""
+        if capacity <= len(self._buffer):
+            return
+        buffer = np.empty((capacity, ) + self.shape, dtype=self.dtype)
+        buffer[:self._num_values] = self._buffer[:self._num_values]
+        self._buffer = buffer
+
+    def get_all(self) -> np.ndarray:
+        """Return an array of all values pushed since the last call to :meth:`clear`.
+
+        The array is a view into the buffer of the sink rather than a copy, so its
+        contents will be overwritten once the sink is cleared and values are pushed
+        again.
+        """
+        return self._buffer[:self._num_values]
+
+    def clear(self) -> None:
+        """Discard all previously pushed values (keeping the allocated buffer)."""
+        self._num_values = 0
+
+
+def make_array_sink(channel: "ResultChannel") -> ArraySink:
+    """Create a sink to store all values pushed to the given result channel.
+
+    :return: A :class:`NumpyArraySink` of the appropriate data type for channels of a
+        fixed numeric type (:class:`FloatChannel`, :class:`IntChannel`) or of arrays
+        of a fixed shape (:class:`ArrayChannel`), and a plain :class:`ArraySink`
+        otherwise.
+    """
+    if isinstance(channel, ArrayChannel):
+        if None in channel.shape:
+            return ArraySink()
+        return NumpyArraySink(channel.dtype, channel.shape)
+    if channel.NumpyDType is None:
+        return ArraySink()
+    return NumpyArraySink(channel.NumpyDType)
+
+
+class DatasetFlushGroup:
+    """Coordinates a set of :class:`AppendingDatasetSink`\\ s that buffer pushed values
+    and write them to their datasets in bulk.
+
+    Every value appended to a broadcast dataset is sent as a separate modification to
+    the master and all subscribers (applets, …), which is costly at high point rates
+    and with many result channels. Sinks in a flush group instead hold on to pushed
+    values until :meth:`flush` is called, and then write them as a single
+    modification per dataset. All sinks in the group are flushed together, so
+    subscribers see consistent numbers of values across datasets as long as the group
+    is only flushed between scan points.
+
+    :param max_interval: The maximum time values are held back for, in seconds.
+    :param max_pending: The maximum number of values held back per sink.
+    """
+
+    def __init__(self, max_interval: float = 0.5, max_pending: int = 1024):
+        self.max_interval = max_interval
+        self.max_pending = max_pending
+        self._sinks = []
+        self._last_flush_time = time.monotonic()
+
+    def add(self, sink: "AppendingDatasetSink") -> None:
+        """Add the given sink to the group (done by the sink itself on creation)."""
+        self._sinks.append(sink)
+
+    def has_pending(self) -> bool:
+        """Return whether any of the sinks hold values not yet written to their
+        datasets."""
+        return any(s.num_pending() for s in self._sinks)
+
+    def maybe_flush(self) -> None:
+        """Flush the group if the oldest values have been held back for longer than
+        ``max_interval``, or more than ``max_pending`` values have accumulated for any
+        sink. Called at scan point boundaries."""
+        if time.monotonic() - self._last_flush_time >= self.max_interval or any(
+                s.num_pending() >= self.max_pending for s in self._sinks):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all the values pushed so far to the datasets."""
+        for sink in self._sinks:
+            sink.flush()
+        self._last_flush_time = time.monotonic()
+
+
 class AppendingDatasetSink(ResultSink, HasEnvironment):
-    def build(self, key: str, broadcast: bool = True) -> None:
+    def build(self,
+              key: str,
+              broadcast: bool = True,
+              flush_group: DatasetFlushGroup = None) -> None:
         """
         :param key: Dataset key to store results in. Set to an array on the first push,
             and subsequently appended to.
         :param broadcast: Whether to set the dataset in broadcast mode.
+        :param flush_group: If given, pushed values are buffered and only written to
+            the dataset when the given :class:`DatasetFlushGroup` is flushed.
         """
         self.key = key
         self.broadcast = broadcast
         self.has_pushed = False
+        self.flush_group = flush_group
+        self._num_written = 0
+        self._pending = []
+        if flush_group is not None:
+            flush_group.add(self)
 
     def push(self, value: Any) -> None:
+        if self.flush_group is not None:
+            self._pending.append(value)
+            return
+        self._write([value])
+
+    def push_many(self, values: List[Any]) -> None:
+        values = list(values)
+        if self.flush_group is not None:
+            self._pending += values
+            return
+        self._write(values)
+
+    def num_pending(self) -> int:
+        """Return the number of values pushed but not yet written to the dataset."""
+        return len(self._pending)
+
+    def flush(self) -> None:
+        """Write any buffered values to the dataset (see :class:`DatasetFlushGroup`)."""
+        if self._pending:
+            values = self._pending
+            self._pending = []
+            self._write(values)
+
+    def _write(self, values: List[Any]) -> None:
+        if not values:
+            return
         if not self.has_pushed:
-            self.set_dataset(self.key, [value], broadcast=self.broadcast)
+            self.set_dataset(self.key, values, broadcast=self.broadcast)
             self.has_pushed = True
+        elif len(values) == 1:
+            self.append_to_dataset(self.key, values[0])
+        else:
+            # Extend the list by assigning to the empty slice at its end, which is a
+            # single modification (rather than one per value for append_to_dataset()).
+            end = self._num_written
+            self.mutate_dataset(self.key, (end, end), values)
+        self._num_written += len(values)
+
+    def get_all(self) -> List[Any]:
+        """Read back the previously pushed values from the target dataset (if any),
+        including those not yet flushed."""
+        values = self.get_dataset(self.key) if self.has_pushed else []
+        if self._pending:
+            values = list(values) + self._pending
+        return values
+
+
+class ArrayDatasetSink(AppendingDatasetSink):
+    """Sink that appends pushed arrays (e.g. the results of subscans) to a dataset,
+    choosing a storage layout depending on whether their shapes vary.
+
+    As long as all arrays have the same shape, they are simply appended to the
+    dataset like for :class:`AppendingDatasetSink`, resulting in an array with an
+    extra leading dimension (dense layout). If a value of a different shape is pushed,
+    the dataset is rewritten to hold the concatenation of all the arrays along their
+    first axis, with the index at which each point starts kept in a second dataset
+    (key suffixed by :data:`.RAGGED_OFFSETS_SUFFIX`) instead (ragged layout). Use
+    :func:`.load_point_values` to read back either layout.
+    """
+
+    def build(self,
+              key: str,
+              broadcast: bool = True,
+              flush_group: DatasetFlushGroup = None) -> None:
+        super().build(key, broadcast, flush_group)
+        self._shape = None
+
+        #: The offsets of the values for each point if the ragged layout is used,
+        #: or ``None`` otherwise.
+        self._offsets = None
+        self._offsets_sink = None
+
+    def _write(self, values: List[Any]) -> None:
+        if not values:
+            return
+        values = [np.asarray(v) for v in values]
+        if self._offsets is None:
+            if self._shape is None:
+                self._shape = values[0].shape
+            if all(v.shape == self._shape for v in values):
+                super()._write(values)
+                return
+
+            # Switch to the ragged layout, rewriting the dataset from scratch. The
+            # offsets are written first, so that readers never see the concatenated
+            # values without them (which would be mistaken for the dense layout).
+            previous = self.get_dataset(self.key) if self.has_pushed else []
+            values = [np.asarray(v) for v in previous] + values
+            self.has_pushed = False
+            self._num_written = 0
+            self._offsets = [0]
+            self._append_offsets(values)
+            self._offsets_sink = AppendingDatasetSink(self,
+                                                      self.key + RAGGED_OFFSETS_SUFFIX,
+                                                      self.broadcast)
+            self._offsets_sink.push_many(self._offsets)
+            super()._write(np.concatenate(values).tolist())
             return
-        self.append_to_dataset(self.key, value)
+
+        # Otherwise, write the values first, so that the offsets never refer to
+        # values not written yet.
+        offsets = self._append_offsets(values)
+        super()._write(np.concatenate(values).tolist())
+        self._offsets_sink.push_many(offsets)
+
+    def _append_offsets(self, values: List[np.ndarray]) -> List[int]:
+        """Extend :attr:`_offsets` by the given values, returning the new entries."""
+        offsets = []
+        for v in values:
+            offsets.append(self._offsets[-1] + len(v))
+            self._offsets.append(offsets[-1])
+        return offsets
 
     def get_all(self) -> List[Any]:
-        """Read back the previously pushed values from the target dataset (if any)."""
-        return self.get_dataset(self.key) if self.has_pushed else []
+        """Read back the previously pushed values from the target dataset (if any),
+        including those not yet flushed, as a list with an array for each point."""
+        if self._offsets is None:
+            return super().get_all()
+        values = RaggedArray(np.asarray(self.get_dataset(self.key)), self._offsets)
+        return list(values) + self._pending
 
 
 class ScalarDatasetSink(ResultSink, HasEnvironment):
@@ -97,6 +354,10 @@ class ResultChannel:
     """
     """
 
+    #: The NumPy data type to use for storing values of this channel in arrays, or
+    #: ``None`` if the values are not of a fixed numeric type.
+    NumpyDType = None
+
     def __init__(self,
                  path: str,
                  description: str = "",
@@ -140,6 +401,15 @@ class ResultChannel:
         if self.sink:
             self.sink.push(value)
 
+    @rpc(flags={"async"})
+    def push_many(self, raw_values) -> None:
+        """Push several values at once; equivalent to calling :meth:`push` for each of
+        them, but only requiring a single RPC when called from kernels.
+        """
+        values = [self._coerce_to_type(v) for v in raw_values]
+        if self.sink:
+            self.sink.push_many(values)
+
     def _get_type_string(self):
         raise NotImplementedError()
 
@@ -158,8 +428,9 @@ class NumericChannel(ResultChannel):
                  min=None,
                  max=None,
                  unit: str = "",
-                 scale=None):
-        super().__init__(path, description, display_hints)
+                 scale=None,
+                 save_by_default: bool = True):
+        super().__init__(path, description, display_hints, save_by_default)
         self.min = min
         self.max = max
 
@@ -189,6 +460,8 @@ class NumericChannel(ResultChannel):
 
 
 class FloatChannel(NumericChannel):
+    NumpyDType = np.float64
+
     def _get_type_string(self):
         return "float"
 
@@ -197,6 +470,8 @@ class FloatChannel(NumericChannel):
 
 
 class IntChannel(NumericChannel):
+    NumpyDType = np.int64
+
     def _get_type_string(self):
         return "int"
 
@@ -204,6 +479,58 @@ class IntChannel(NumericChannel):
         return int(value)
 
 
+class ArrayChannel(NumericChannel):
+    """Channel for results that are arrays of numbers, such as the photon counts for
+    each of a number of shots.
+
+    Arrays are pushed as a whole (using a single RPC from kernels), and stored as NumPy
+    arrays of the given data type. If the shape is fixed, the values from all points
+    of a scan thus form an array with an extra leading dimension in the results.
+
+    Range limits and units (see :class:`NumericChannel`) refer to the individual
+    elements.
+
+    :param dtype: The NumPy data type of the elements.
+    :param shape: The shape of the arrays, with ``None`` for dimensions the length of
+        which varies from point to point. Defaults to one-dimensional arrays of any
+        length.
+    """
+
+    def __init__(self,
+                 path: str,
+                 description: str = "",
+                 display_hints: Dict[str, Any] = {},
+                 min=None,
+                 max=None,
+                 unit: str = "",
+                 scale=None,
+                 save_by_default: bool = True,
+                 dtype=np.float64,
+                 shape: Tuple[int, ...] = (None, )):
+        super().__init__(path, description, display_hints, min, max, unit, scale,
+                         save_by_default)
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+
+    def describe(self) -> Dict[str, Any]:
+        result = super().describe()
+        result["dtype"] = self.dtype.name
+        result["shape"] = list(self.shape)
+        return result
+
+    def _get_type_string(self):
+        return "array"
+
+    def _coerce_to_type(self, value):
+        # Copy the values, as the caller might reuse the array for the next point.
+        value = np.array(value, dtype=self.dtype)
+        if value.ndim != len(self.shape) or any(
+                e is not None and e != n for e, n in zip(self.shape, value.shape)):
+            raise ValueError("Array of shape {} pushed to result channel '{}' of shape "
+                             "{}".format(value.shape, self.path, self.shape))
+        return value
+
+
 class OpaqueChannel(ResultChannel):
     def _get_type_string(self):
         return "opaque"
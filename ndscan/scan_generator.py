@@ -1,10 +1,17 @@
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
 from itertools import product
 import numpy as np
 import random
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple, Union
 
 
 class ScanGenerator:
+    #: Whether all the axes of a scan using generators of this class are to be sampled
+    #: jointly (see :meth:`joint_points_for_level`) rather than each on their own, with
+    #: the scan then iterating over the Cartesian product of the individual axes.
+    samples_jointly = False
+
     def has_level(self, level: int) -> bool:
         raise NotImplementedError
 
@@ -14,6 +21,40 @@ class ScanGenerator:
     def describe_limits(self, target: Dict[str, Any]) -> None:
         raise NotImplementedError
 
+    def get_num_points(self) -> Union[int, None]:
+        """Return the total number of points along this axis across all levels, or
+        ``None`` if the scan continues indefinitely (the default).
+
+        For generators that adapt to results, this is an upper bound, as they might
+        stop early.
+        """
+        return None
+
+    def get_feedback_channel(self) -> Any:
+        """Return the result channel the points generated depend on, or ``None`` if
+        the generator does not adapt to results (the default).
+
+        For generators returning a channel, :meth:`feedback` is called with the
+        results of all points completed before a new level is requested.
+        """
+        return None
+
+    def feedback(self, coordinates: np.ndarray, values: np.ndarray) -> None:
+        """Called by the scan runner with the coordinates along this axis and the
+        values pushed to the feedback channel for any points completed since the
+        previous call.
+        """
+        pass
+
+    @classmethod
+    def joint_points_for_level(cls, generators: List["ScanGenerator"], level: int,
+                               rng=None) -> List[np.ndarray]:
+        """For generators that sample jointly, return the coordinates of the points in
+        the given level across all the given generators (one per axis, all of this
+        class), as a list of equally long arrays, one per axis.
+        """
+        raise NotImplementedError
+
 
 class RefiningGenerator(ScanGenerator):
     def __init__(self, lower, upper, randomise_order):
@@ -67,6 +108,9 @@ class LinearGenerator(ScanGenerator):
         target["max"] = max(self.start, self.stop)
         target["increment"] = abs(self.stop - self.start) / (self.num_points - 1)
 
+    def get_num_points(self) -> Union[int, None]:
+        return self.num_points
+
 
 class ListGenerator(ScanGenerator):
     def __init__(self, values, randomise_order):
@@ -87,23 +131,302 @@ class ListGenerator(ScanGenerator):
     def describe_limits(self, target: Dict[str, Any]) -> None:
         values = np.array(self.values)
         if np.issubdtype(values.dtype, np.number):
-            target["min"] = np.min(values)
-            target["max"] = np.max(values)
+            # Convert to built-in types, as the limits are serialised to JSON.
+            target["min"] = np.min(values).item()
+            target["max"] = np.max(values).item()
+
+    def get_num_points(self) -> Union[int, None]:
+        return len(self.values)
+
+
+class AdaptiveGenerator(ScanGenerator):
+    """Generator that chooses points based on the results already acquired, such that
+    regions where the result changes quickly are sampled more densely.
+
+    The first level consists of ``num_initial`` equidistant points across the range.
+    After that, every level adds (up to) ``batch_size`` points at the midpoints of the
+    intervals between the previously measured points that have the largest loss, until
+    ``num_points`` points have been generated. The loss of each interval is given by
+    its length in the plane spanned by the coordinate and the result value (both
+    normalised to the range spanned so far), plus the areas of the triangles formed
+    with the adjacent points (large where the curvature is large).
+
+    If the scan has more than one axis, results are averaged across all points
+    sharing the same coordinate along this axis.
+
+    :param lower: The lower limit of the scan range.
+    :param upper: The upper limit of the scan range.
+    :param num_points: The total number of points to generate.
+    :param channel: The result channel to adapt to, which must be pushed exactly
+        once per point. Can be given by name (the shortened name as used in the
+        ``ndscan.points.channel_*`` datasets) when created from the ``ndscan`` scan
+        spec, in which case it is resolved by the experiment.
+    :param num_initial: The number of equidistant points in the initial level.
+    :param batch_size: The maximum number of points to add in every subsequent level.
+    :param randomise_order: Whether to randomise the order of points within a level.
+    """
+
+    def __init__(self,
+                 lower,
+                 upper,
+                 num_points,
+                 channel,
+                 num_initial=8,
+                 batch_size=4,
+                 randomise_order=False):
+        if num_initial < 2:
+            raise ValueError("Need at least 2 initial points in adaptive scan")
+        if batch_size < 1:
+            raise ValueError("Batch size must be positive")
+        self.lower = float(min(lower, upper))
+        self.upper = float(max(lower, upper))
+        self.num_points = num_points
+        self.channel = channel
+        self.num_initial = min(num_initial, num_points)
+        self.batch_size = batch_size
+        self.randomise_order = randomise_order
+
+        # Points generated for each level so far.
+        self._level_points = []
+
+        self._coordinates = []
+        self._values = []
+
+    def has_level(self, level: int) -> bool:
+        if level == 0:
+            return True
+        return level <= len(self._level_points) and \
+            sum(len(p) for p in self._level_points[:level]) < self.num_points
+
+    def points_for_level(self, level: int, rng=None) -> List[Any]:
+        del self._level_points[level:]
+        if level == 0:
+            # Starting over (e.g. when the generator is reused for another scan), so
+            # discard any results from previous runs.
+            self._coordinates = []
+            self._values = []
+            points = np.linspace(self.lower, self.upper, self.num_initial)
+        else:
+            num_remaining = self.num_points - sum(len(p) for p in self._level_points)
+            points = self._choose_points(min(self.batch_size, num_remaining))
+        self._level_points.append(points.copy())
+
+        if self.randomise_order:
+            rng.shuffle(points)
+        return points
+
+    def describe_limits(self, target: Dict[str, Any]) -> None:
+        target["min"] = self.lower
+        target["max"] = self.upper
+
+    def get_num_points(self) -> Union[int, None]:
+        return self.num_points
+
+    def get_feedback_channel(self) -> Any:
+        return self.channel
+
+    def feedback(self, coordinates: np.ndarray, values: np.ndarray) -> None:
+        assert len(coordinates) == len(values), \
+            "Mismatched number of coordinates and results"
+        self._coordinates.append(np.asarray(coordinates, dtype=float))
+        self._values.append(np.asarray(values, dtype=float))
+
+    def _choose_points(self, num: int) -> np.ndarray:
+        xs, ys = self._get_mean_results()
+        issued = np.unique(np.concatenate(self._level_points))
+        if len(xs) < len(issued):
+            # Results are missing for some points (e.g. channel not pushed), so just
+            # bisect the largest gaps between the points generated so far.
+            xs = issued
+            ys = np.zeros_like(xs)
+
+        x_scale = self.upper - self.lower
+        if x_scale == 0.0:
+            return np.empty(0)
+        y_scale = np.ptp(ys)
+        if y_scale == 0.0:
+            y_scale = 1.0
+        dx = np.diff(xs) / x_scale
+        dy = np.diff(ys) / y_scale
+        loss = np.hypot(dx, dy)
+
+        # Triangle areas spanned by each point with its neighbours, attributed to both
+        # adjacent intervals.
+        area = 0.5 * np.abs(dx[:-1] * dy[1:] - dx[1:] * dy[:-1])
+        loss[:-1] += area
+        loss[1:] += area
+
+        # Do not split intervals any further once they approach the floating point
+        # resolution.
+        loss[dx < 1e-12] = 0.0
+
+        candidates = np.argsort(loss)[::-1][:num]
+        candidates = candidates[loss[candidates] > 0.0]
+        return np.sort(0.5 * (xs[candidates] + xs[candidates + 1]))
+
+    def _get_mean_results(self):
+        if not self._coordinates:
+            return np.empty(0), np.empty(0)
+        coords = np.concatenate(self._coordinates)
+        values = np.concatenate(self._values)
+        xs, inverse = np.unique(coords, return_inverse=True)
+        ys = np.bincount(inverse, weights=values) / np.bincount(inverse)
+        return xs, ys
+
+
+class LowDiscrepancyGenerator(ScanGenerator):
+    """Generator that covers the joint range of all the axes in a scan that use it with
+    points from a scrambled Halton sequence (a low-discrepancy sequence), rather than
+    refining each axis on its own.
+
+    Any prefix of the sequence covers the (hyper-)rectangle spanned by the axis ranges
+    roughly uniformly, so the scan can be stopped at any point and still give a
+    usable picture. Like :class:`RefiningGenerator`, the scan continues indefinitely;
+    the first level contains ``INITIAL_LEVEL_SIZE`` points, and every further level
+    doubles the total number of points.
+
+    The sequence is scrambled using a random permutation of the digits in each digit
+    position (drawn from the scan RNG), which avoids the correlations between axes
+    that the plain Halton sequence has for larger numbers of axes.
+
+    :param lower: The lower limit of the scan range.
+    :param upper: The upper limit of the scan range.
+    """
+    samples_jointly = True
+
+    INITIAL_LEVEL_SIZE = 16
+
+    #: Halton sequence bases used for the individual axes (which also limits the number
+    #: of axes that can be sampled jointly).
+    BASES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53]
+
+    def __init__(self, lower, upper):
+        self.lower = float(min(lower, upper))
+        self.upper = float(max(lower, upper))
+        self._digit_permutations = None
+
+    def has_level(self, level: int) -> bool:
+        return True
+
+    def points_for_level(self, level: int, rng=None) -> List[Any]:
+        return self.joint_points_for_level([self], level, rng)[0]
+
+    def describe_limits(self, target: Dict[str, Any]) -> None:
+        target["min"] = self.lower
+        target["max"] = self.upper
+        target["scattered"] = True
+
+    @classmethod
+    def joint_points_for_level(cls, generators: List["LowDiscrepancyGenerator"],
+                               level: int, rng=None) -> List[np.ndarray]:
+        if len(generators) > len(cls.BASES):
+            raise ValueError("Low-discrepancy scans over more than {} axes not "
+                             "supported".format(len(cls.BASES)))
+        if level == 0:
+            start = 0
+            for gen, base in zip(generators, cls.BASES):
+                gen._draw_digit_permutations(base, rng)
+        else:
+            start = cls.INITIAL_LEVEL_SIZE * 2**(level - 1)
+        indices = np.arange(start, cls.INITIAL_LEVEL_SIZE * 2**level, dtype=np.int64)
+        return [
+            gen._sample(indices, base) for gen, base in zip(generators, cls.BASES)
+        ]
+
+    def _draw_digit_permutations(self, base: int, rng) -> None:
+        # Enough digits to exhaust the double precision mantissa.
+        num_digits = int(np.ceil(53 / np.log2(base)))
+        self._digit_permutations = []
+        for _ in range(num_digits):
+            perm = np.arange(base)
+            if rng is not None:
+                rng.shuffle(perm)
+            self._digit_permutations.append(perm)
+
+    def _sample(self, indices: np.ndarray, base: int) -> np.ndarray:
+        # Radical inverse of the indices in the given base, with the digits permuted.
+        digits = indices.copy()
+        result = np.zeros(len(indices))
+        scale = 1.0
+        for perm in self._digit_permutations:
+            scale /= base
+            result += perm[digits % base] * scale
+            digits //= base
+        return self.lower + (self.upper - self.lower) * result
 
 
 GENERATORS = {
     "refining": RefiningGenerator,
     "linear": LinearGenerator,
-    "list": ListGenerator
+    "list": ListGenerator,
+    "adaptive": AdaptiveGenerator,
+    "low_discrepancy": LowDiscrepancyGenerator
 }
 
 
 class ScanOptions:
+    """
+    :param num_repeats: The number of times to repeat each level of the scan.
+    :param continuous_without_axes: Whether to run the fragment continuously if there
+        are no scan axes.
+    :param randomise_order_globally: Whether to randomise the order of points across
+        all axes (within each level and repeat).
+    :param seed: The seed for the scan RNG; chosen randomly if ``None``.
+    :param chunk_target_duration: For scans executed on the core device, the target
+        wall clock duration of each chunk of points, in seconds. The kernel returns to
+        the host after each chunk to fetch more points and check for pause/termination
+        requests, so this trades off RPC overhead against responsiveness.
+    :param min_chunk_size: The minimum number of points per chunk.
+    :param max_chunk_size: The maximum number of points per chunk.
+    :param batch_results: For scans executed on the core device, whether to collect
+        the values pushed to numeric result channels in buffers on the core device,
+        and return them to the host (together with the number of completed points)
+        in bulk at the end of each chunk, rather than using one RPC per point and
+        result. Requires results to be pushed from kernel code only.
+    :param max_upload_points: For scans executed on the core device, the maximum
+        number of (remaining) points for which the coordinates for the whole scan are
+        uploaded at once and executed in a single kernel invocation, avoiding the
+        overhead of fetching individual chunks. As pause/termination requests are
+        then only checked for every ``pause_check_interval`` points rather than
+        after each chunk (sized according to ``chunk_target_duration``), this is
+        disabled (0, always use chunks) by default; only enable it for fast points.
+        Not applicable to scans with generators adapting to results.
+    :param pause_check_interval: For scans uploaded as a whole, the number of points
+        after which to check for pause/termination requests (and, if enabled, to
+        return batched results).
+    :param skip_unchanged_setup: Whether to only call ``device_setup()`` (and
+        ``device_reset()``) on fragments for which any parameters (including those of
+        their subfragments) have changed since the last call, rather than on the whole
+        fragment tree for every point. Only appropriate if the setup code does not need
+        to be re-run otherwise (e.g. because the hardware state is modified in
+        ``run_once()``).
+    :param num_workers: For scans executed on the host, the number of threads to run
+        points in in parallel, each with its own copy of the fragment tree. Only used
+        for fragments declared as reentrant (see :attr:`.ExpFragment.is_reentrant`).
+    :param accumulate_repeats: Whether to run all the ``num_repeats`` repeats of each
+        point back to back (with a single call to ``device_setup()``), rather than
+        repeating each level of the scan as a whole. The values pushed to scalar
+        numeric result channels are then accumulated across the repeats (on the core
+        device for kernel fragments), and only their mean and the standard error of
+        the mean are recorded, once per point (as floating-point values, also for
+        integer channels). Not supported together with ``batch_results``, or in
+        subscans of fragments with integer result channels.
+    """
+
     def __init__(self,
                  num_repeats: int = 1,
                  continuous_without_axes: bool = False,
                  randomise_order_globally: bool = False,
-                 seed=None):
+                 seed=None,
+                 chunk_target_duration: float = 0.2,
+                 min_chunk_size: int = 1,
+                 max_chunk_size: int = 4096,
+                 batch_results: bool = False,
+                 max_upload_points: int = 0,
+                 pause_check_interval: int = 256,
+                 skip_unchanged_setup: bool = False,
+                 num_workers: int = 1,
+                 accumulate_repeats: bool = False):
         self.num_repeats = num_repeats
         self.continuous_without_axes = continuous_without_axes
         self.randomise_order_globally = randomise_order_globally
@@ -112,40 +435,450 @@ class ScanOptions:
             seed = random.getrandbits(32)
         self.seed = seed
 
+        if min_chunk_size < 1 or max_chunk_size < min_chunk_size:
+            raise ValueError("Invalid chunk size limits: {}, {}".format(
+                min_chunk_size, max_chunk_size))
+        self.chunk_target_duration = chunk_target_duration
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.batch_results = batch_results
+
+        if max_upload_points < 0 or pause_check_interval < 1:
+            raise ValueError("Invalid whole-scan upload limits: {}, {}".format(
+                max_upload_points, pause_check_interval))
+        self.max_upload_points = max_upload_points
+        self.pause_check_interval = pause_check_interval
+        self.skip_unchanged_setup = skip_unchanged_setup
+
+        if num_workers < 1:
+            raise ValueError("Invalid number of workers: {}".format(num_workers))
+        self.num_workers = num_workers
+
+        if accumulate_repeats and batch_results:
+            raise ValueError("Accumulating repeats is not supported together with "
+                             "batched results")
+        self.accumulate_repeats = accumulate_repeats
+
+    def get_repeats_per_point(self) -> int:
+        """Return the number of times each point is run back to back (see
+        ``accumulate_repeats``)."""
+        return self.num_repeats if self.accumulate_repeats else 1
+
+    def get_repeats_per_level(self) -> int:
+        """Return the number of times the points of each level are iterated over."""
+        return 1 if self.accumulate_repeats else self.num_repeats
+
+
+class IndexPermutation:
+    """Pseudo-random bijection of ``[0, n)`` onto itself, evaluated lazily for any
+    given index without materialising the permuted sequence.
+
+    This is implemented as a balanced Feistel network over the smallest domain of
+    ``2^(2k) >= n`` elements, with "cycle walking" to restrict it to ``[0, n)`` (i.e.
+    the network is applied again to any results outside the range until they fall
+    inside it; as the domain is less than four times as large as the range, only a few
+    iterations are needed on average).
+
+    :param n: The number of elements to permute.
+    :param rng: The ``numpy.random.RandomState`` to draw the round keys from. The
+        permutation is fully determined by its state.
+    """
+
+    NUM_ROUNDS = 4
+
+    def __init__(self, n: int, rng):
+        self.n = n
+        self._half_bits = max(1, (int(n - 1).bit_length() + 1) // 2)
+        self._half_mask = np.uint64((1 << self._half_bits) - 1)
+        self._keys = rng.randint(2**32, size=self.NUM_ROUNDS, dtype=np.uint64)
+
+    def __call__(self, indices: np.ndarray) -> np.ndarray:
+        """Return the permuted values for the given array of indices in ``[0, n)``."""
+        result = self._apply_network(np.asarray(indices, dtype=np.uint64))
+        while True:
+            outside = result >= self.n
+            if not np.any(outside):
+                return result.astype(np.int64)
+            result[outside] = self._apply_network(result[outside])
+
+    def _apply_network(self, x: np.ndarray) -> np.ndarray:
+        shift = np.uint64(self._half_bits)
+        left = x >> shift
+        right = x & self._half_mask
+        for key in self._keys:
+            left, right = right, left ^ self._round_function(right, key)
+        return (left << shift) | right
+
+    def _round_function(self, x: np.ndarray, key: np.uint64) -> np.ndarray:
+        # Integer hash (SplitMix64 finaliser) of the input mixed with the round key;
+        # arithmetic is modulo 2^64.
+        x = (x ^ key) * np.uint64(0x9E3779B97F4A7C15)
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+        return x & self._half_mask
+
+
+class _PlanLevel:
+    """The points newly added to a scan in a given refinement level (i.e. the union of
+    all the Cartesian products of per-dimension levels that have not been visited
+    before).
+
+    :param blocks: A list of Cartesian product blocks, each given as a list with an
+        entry for each dimension, which in turn is a list of equally long coordinate
+        arrays, one for each axis in that dimension. The first dimension varies
+        fastest.
+    :param dimensions: The indices of the axes in each dimension.
+    """
+
+    def __init__(self, blocks: List[List[List[np.ndarray]]],
+                 dimensions: List[List[int]]):
+        self.blocks = blocks
+        self.dimensions = dimensions
+        sizes = [int(np.prod([len(d[0]) for d in b])) for b in blocks]
+        self.block_starts = np.cumsum([0] + sizes[:-1], dtype=np.int64)
+        self.num_points = sum(sizes)
+
+        #: :class:`IndexPermutation`\ s of ``range(num_points)`` to apply for each
+        #: repeat if the point order is to be randomised globally, ``None`` otherwise.
+        self.permutations = None
+
+    def coordinates(self, indices: np.ndarray,
+                    axis_dtypes: List[np.dtype]) -> List[np.ndarray]:
+        """Return the coordinates of the points with the given indices into this level,
+        as one array per axis."""
+        result = [np.empty(len(indices), dtype=t) for t in axis_dtypes]
+        block_idxs = np.searchsorted(self.block_starts, indices, side="right") - 1
+        for b in np.unique(block_idxs):
+            mask = block_idxs == b
+            digits = indices[mask] - self.block_starts[b]
+            # Decompose index into mixed-radix digits, one per dimension.
+            for axes, dim_values in zip(self.dimensions, self.blocks[b]):
+                n = len(dim_values[0])
+                dim_indices = digits % n
+                for axis, values in zip(axes, dim_values):
+                    result[axis][mask] = values[dim_indices]
+                digits //= n
+        return result
+
+
+class ScanPointPlan:
+    """Index-addressable sequence of the points of a scan over the given axes.
+
+    Rather than materialising the list of points, the coordinates are computed on
+    demand from the flat point index, using the per-axis coordinate arrays returned by
+    the generators for each level and mixed-radix index arithmetic. Levels are only
+    generated once they are first accessed, so infinite generators (such as
+    :class:`RefiningGenerator`) are supported.
+
+    Axes with generators that sample jointly (see
+    :attr:`ScanGenerator.samples_jointly`) are combined into a single dimension of the
+    scan, along which their coordinates vary together. All other axes form a
+    dimension on their own.
+
+    The order of points matches that of previous versions of :func:`generate_points`:
+    for each level, the points not already visited are iterated in order of increasing
+    index with the first axis varying fastest (``num_repeats`` times), before moving on
+    to the next level.
+
+    :param axis_generators: The generators for each scan axis.
+    :param options: The :class:`ScanOptions` to apply (repeats, randomisation, seed).
+    :param axis_dtypes: If given, the NumPy data type to convert the coordinates for
+        each axis to, such that they can be directly used as parameter values (e.g.
+        rounding to the nearest integer for integer parameters). Coordinates for
+        axes with ``None`` entries are kept as returned by the generators.
+    """
 
-def generate_points(axis_generators: List[ScanGenerator], options: ScanOptions):
-    rng = np.random.RandomState(options.seed)
-
-    # Stores computed coordinates for each axis, indexed first by
-    # axis order, then by level.
-    axis_level_points = [[] for _ in axis_generators]
-
-    max_level = 0
-    while True:
+    def __init__(self,
+                 axis_generators: List[ScanGenerator],
+                 options: ScanOptions,
+                 axis_dtypes: List[Any] = None):
+        self.axis_generators = axis_generators
+        self.options = options
+
+        self._rng = np.random.RandomState(options.seed)
+
+        #: The indices of the axes in each dimension.
+        self._dimensions = []
+        joint_dimensions = {}
+        for i, gen in enumerate(axis_generators):
+            if gen.samples_jointly:
+                if type(gen) in joint_dimensions:
+                    self._dimensions[joint_dimensions[type(gen)]].append(i)
+                    continue
+                joint_dimensions[type(gen)] = len(self._dimensions)
+            self._dimensions.append([i])
+
+        #: Stores computed coordinates for each dimension, indexed first by dimension,
+        #: then by level, then by axis within the dimension.
+        self._dim_level_points = [[] for _ in self._dimensions]
+        if axis_dtypes is None:
+            axis_dtypes = [None for _ in axis_generators]
+        self._axis_dtypes = [None if t is None else np.dtype(t) for t in axis_dtypes]
+
+        self._levels = []
+
+        #: Global index of the first point of each level (including repeats), followed
+        #: by the end of the last level generated so far.
+        self._level_starts = [0]
+
+        self._exhausted = False
+
+    def level_end(self, index: int) -> int:
+        """Return the index one past the last point in the level containing the
+        point with the given index, or ``index`` if it is beyond the end of the scan.
+
+        Generators that adapt to results only generate new levels once all the
+        previous ones have been completed, so callers should avoid requesting points
+        across this boundary before feedback has been given.
+        """
+        level_idx = self._find_level(index)
+        if level_idx is None:
+            return index
+        return self._level_starts[level_idx + 1]
+
+    def describe_position(self, index: int) -> Dict[str, int]:
+        """Return the position of the point with the given index in terms of the
+        refinement level, the repeat within that level, and the index within that
+        repeat (e.g. for logging or checkpointing).
+
+        Points beyond the end of the scan are described as being at the start of the
+        (non-existent) next level.
+        """
+        level_idx = self._find_level(index)
+        if level_idx is None:
+            return {"level": len(self._levels), "repeat": 0, "index": 0}
+        offset = index - self._level_starts[level_idx]
+        num_points = self._levels[level_idx].num_points
+        return {
+            "level": level_idx,
+            "repeat": offset // num_points,
+            "index": offset % num_points
+        }
+
+    def get_num_points(self) -> Union[int, None]:
+        """Return the total number of points in the scan (including repeats), or
+        ``None`` if any of the generators continues indefinitely.
+
+        This is computed from :meth:`ScanGenerator.get_num_points` without generating
+        any levels.
+        """
+        total = self.options.get_repeats_per_level()
+        for axes in self._dimensions:
+            # Axes sampled jointly share the same number of points.
+            num = self.axis_generators[axes[0]].get_num_points()
+            if num is None:
+                return None
+            total *= num
+        return total
+
+    def has_point(self, index: int) -> bool:
+        """Return whether the scan contains a point with the given (global) index."""
+        return self._find_level(index) is not None
+
+    def point(self, index: int) -> Tuple:
+        """Return the coordinates of the point with the given index as a tuple, with
+        one element per axis.
+
+        :raises IndexError: if ``index`` is beyond the end of the scan.
+        """
+        coords = self.points(index, index + 1)
+        if len(coords) == 0 or len(coords[0]) == 0:
+            raise IndexError("Point index {} out of range".format(index))
+        return tuple(c[0] for c in coords)
+
+    def points(self, start: int, stop: int) -> List[np.ndarray]:
+        """Return the coordinates of the points with indices in ``[start, stop)``.
+
+        :return: A list of arrays, one per axis. The arrays are shorter than
+            ``stop - start`` if the end of the scan is reached.
+        """
+        parts = []
+        index = start
+        while index < stop:
+            level_idx = self._find_level(index)
+            if level_idx is None:
+                break
+            level_start = self._level_starts[level_idx]
+            level_end = self._level_starts[level_idx + 1]
+            end = min(stop, level_end)
+            parts.append(
+                self._level_coordinates(level_idx,
+                                        np.arange(index - level_start,
+                                                  end - level_start,
+                                                  dtype=np.int64)))
+            index = end
+
+        if not parts:
+            return [np.empty(0, dtype=t) for t in self._axis_dtypes]
+        if len(parts) == 1:
+            return parts[0]
+        return [np.concatenate(p) for p in zip(*parts)]
+
+    def __iter__(self):
+        BLOCK_SIZE = 1024
+        index = 0
+        while True:
+            coords = self.points(index, index + BLOCK_SIZE)
+            if not coords or len(coords[0]) == 0:
+                return
+            for i in range(len(coords[0])):
+                yield tuple(c[i] for c in coords)
+            index += len(coords[0])
+
+    def _level_coordinates(self, level_idx: int, indices: np.ndarray):
+        """Compute coordinates for the given indices relative to the start of a level
+        (including repeats)."""
+        level = self._levels[level_idx]
+        if level.permutations is None:
+            indices %= level.num_points
+        else:
+            repeats = indices // level.num_points
+            indices %= level.num_points
+            for r in np.unique(repeats):
+                mask = repeats == r
+                indices[mask] = level.permutations[r](indices[mask])
+        return level.coordinates(indices, self._axis_dtypes)
+
+    def _find_level(self, index: int) -> Union[int, None]:
+        """Return the index of the level containing the given point, generating new
+        levels as necessary, or ``None`` if the index is beyond the end of the scan."""
+        if index < 0:
+            return None
+        while index >= self._level_starts[-1]:
+            if not self._add_level():
+                return None
+        return bisect_right(self._level_starts, index) - 1
+
+    def _add_level(self) -> bool:
+        if self._exhausted:
+            return False
+        level = len(self._levels)
+
+        # Iterate generators in reverse order to preserve the order in which random
+        # numbers were drawn in previous versions.
         found_new_levels = False
-        for i, a in enumerate(axis_generators[::-1]):
-            if a.has_level(max_level):
-                axis_level_points[i].append(a.points_for_level(max_level, rng))
-                found_new_levels = True
+        for d in reversed(range(len(self._dimensions))):
+            axes = self._dimensions[d]
+            gens = [self.axis_generators[i] for i in axes]
+            if not gens[0].has_level(level):
+                continue
+            if len(gens) == 1:
+                all_points = [gens[0].points_for_level(level, self._rng)]
+            else:
+                all_points = type(gens[0]).joint_points_for_level(
+                    gens, level, self._rng)
+            dim_points = []
+            for i, points in zip(axes, all_points):
+                points = np.asarray(points)
+                dtype = self._axis_dtypes[i]
+                if dtype is None:
+                    self._axis_dtypes[i] = points.dtype
+                elif np.issubdtype(dtype, np.integer) and \
+                        not np.issubdtype(points.dtype, np.integer):
+                    points = np.rint(points)
+                dim_points.append(points.astype(self._axis_dtypes[i], copy=False))
+            self._dim_level_points[d].append(dim_points)
+            found_new_levels = True
 
         if not found_new_levels:
             # No levels left to exhaust, done.
-            return
-
-        points = []
-
-        for axis_levels in product(*(range(len(p)) for p in axis_level_points)):
-            if all(l < max_level for l in axis_levels):
+            self._exhausted = True
+            return False
+
+        blocks = []
+        for rev_dim_levels in product(
+                *(range(len(p)) for p in reversed(self._dim_level_points))):
+            dim_levels = rev_dim_levels[::-1]
+            if all(l < level for l in dim_levels):
                 # Previously visited this combination already.
                 continue
-            tp = product(*(p[l] for (l, p) in zip(axis_levels, axis_level_points)))
-            points.extend(tp)
+            blocks.append([p[l] for (l, p) in zip(dim_levels, self._dim_level_points)])
+
+        plan_level = _PlanLevel(blocks, self._dimensions)
+        if self.options.randomise_order_globally:
+            plan_level.permutations = [
+                IndexPermutation(plan_level.num_points, self._rng)
+                for _ in range(self.options.get_repeats_per_level())
+            ]
+        self._levels.append(plan_level)
+        self._level_starts.append(self._level_starts[-1] + plan_level.num_points *
+                                  self.options.get_repeats_per_level())
+        return True
 
-        for _ in range(options.num_repeats):
-            if options.randomise_order_globally:
-                rng.shuffle(points)
 
-            for p in points:
-                yield p[::-1]
+class ChunkPrefetcher:
+    """Fetches chunks of consecutive points from a :class:`ScanPointPlan`, computing
+    the coordinates for the chunk following the last one requested in a background
+    thread, so they are ready to be returned immediately when asked for next.
+
+    Chunks never extend across the end of a level (see
+    :meth:`ScanPointPlan.level_end`).
+
+    As :class:`ScanPointPlan` is not thread-safe, users must call :meth:`wait` before
+    otherwise accessing the plan while a chunk might be being prefetched.
+
+    :param plan: The plan to fetch points from.
+    :param enabled: Whether to prefetch chunks at all; if ``False``, all chunks are
+        computed synchronously in :meth:`get`.
+    """
+
+    def __init__(self, plan: ScanPointPlan, enabled: bool = True):
+        self.plan = plan
+        self.enabled = enabled
+        self._executor = None
+        self._pending = None
+
+    def get(self, start: int, size: int) -> List[np.ndarray]:
+        """Return the coordinates of the points in ``[start, start + size)`` (or fewer,
+        if the end of the level is reached first), and start prefetching the chunk of
+        the same size after that.
+        """
+        coords = None
+        if self._pending is not None:
+            pending_start, future = self._pending
+            self._pending = None
+            prefetched = future.result()
+            if pending_start == start:
+                # Might have been computed for a different size, but is still a
+                # valid chunk if it was smaller.
+                coords = [c[:size] for c in prefetched]
+        if coords is None:
+            coords = self._fetch(start, size)
+
+        num_points = len(coords[0])
+        if self.enabled and num_points > 0:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+            next_start = start + num_points
+            self._pending = (next_start,
+                             self._executor.submit(self._fetch, next_start, size))
+        return coords
+
+    def wait(self) -> None:
+        """Wait for any chunk currently being prefetched to be completed."""
+        if self._pending is not None:
+            self._pending[1].result()
+
+    def close(self) -> None:
+        """Wait for any pending work to complete and shut down the background
+        thread."""
+        self.wait()
+        self._pending = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _fetch(self, start: int, size: int) -> List[np.ndarray]:
+        return self.plan.points(start, min(start + size, self.plan.level_end(start)))
+
+
+def generate_points(axis_generators: List[ScanGenerator], options: ScanOptions):
+    """Return an iterator over the points of a scan with the given axes, yielding one
+    tuple of coordinates per point.
 
-        max_level += 1
+    Prefer using :class:`ScanPointPlan` directly to compute blocks of coordinates.
+    """
+    return iter(ScanPointPlan(axis_generators, options))
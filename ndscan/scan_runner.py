@@ -1,13 +1,28 @@
 from artiq.language import *
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import suppress
-from itertools import islice
-from typing import Any, Dict, List, Iterator, Tuple
+import copy
+import functools
+import json
+import logging
+import numpy as np
+import queue
+import time
+import types
+from typing import Any, Dict, List
 from .default_analysis import AnnotationContext, DefaultAnalysis
-from .fragment import ExpFragment
+from .fragment import AsyncExpFragment, ExpFragment
+from .kernel_cache import KernelCache
 from .parameters import ParamStore, type_string_to_param
-from .result_channels import ResultChannel, ResultSink
-from .scan_generator import generate_points, ScanGenerator, ScanOptions
-from .utils import is_kernel
+from .result_channels import (ArraySink, DatasetFlushGroup, FloatChannel, IntChannel,
+                              ResultChannel, ResultSink)
+from .scan_generator import ChunkPrefetcher, ScanGenerator, ScanOptions, ScanPointPlan
+from .telemetry import ScanProgress, ScanTelemetry
+from .utils import compile_function, is_kernel, run_in_new_event_loop
+
+logger = logging.getLogger(__name__)
 
 
 class ScanFinished(Exception):
@@ -36,6 +51,279 @@ class ScanSpec:
         self.options = options
 
 
+class _FeedbackSink(ResultSink):
+    """Forwards pushed values to another sink (if any), while also keeping them around
+    to be fed back to generators that adapt to the scan results.
+    """
+
+    def __init__(self, downstream: ResultSink):
+        self.downstream = downstream
+        self.values = []
+
+    def push(self, value: Any) -> None:
+        self.values.append(value)
+        if self.downstream:
+            self.downstream.push(value)
+
+
+class _ResultBuffer:
+    """Collects the values pushed to a result channel from kernel code in a buffer on
+    the core device, which is transferred to the host in one RPC when flushed (or
+    full).
+
+    Values transferred to the host are only passed on to the channel's sink once
+    :meth:`commit` is called for the points they belong to (at the end of each
+    chunk), such that the results of an interrupted chunk are dropped together with
+    its point completions, even if the buffer already had to be flushed mid-chunk.
+
+    Instances take the place of the channel's ``push()`` method while a scan with
+    batched results is running. As the ARTIQ compiler requires attribute types to be
+    consistent across all instances of a class, there is a subclass per value type.
+    """
+
+    def __init__(self, core, channel: ResultChannel, size: int):
+        self.core = core
+        self.channel = channel
+        self.values = [self.ZERO] * size
+        self.num_values = 0
+        self._pending = []
+
+    @kernel
+    def push(self, value):
+        if self.num_values == len(self.values):
+            self.flush()
+        self.values[self.num_values] = value
+        self.num_values += 1
+
+    @kernel
+    def flush(self):
+        if self.num_values > 0:
+            # Only transfer the values actually pushed, as chunks (and hence the number
+            # of values per flush) are often much smaller than the buffer.
+            self._push_to_sink(self.values[:self.num_values])
+            self.num_values = 0
+
+    @rpc(flags={"async"})
+    def _push_to_sink(self, values):
+        coerce = self.channel._coerce_to_type
+        self._pending += [coerce(v) for v in values]
+
+    def commit(self) -> None:
+        """Pass the values transferred so far on to the channel's sink."""
+        values = self._pending
+        self._pending = []
+        if self.channel.sink:
+            self.channel.sink.push_many(values)
+
+
+class _FloatResultBuffer(_ResultBuffer):
+    ZERO = 0.0
+
+
+class _IntResultBuffer(_ResultBuffer):
+    ZERO = 0
+
+
+class _RepeatAccumulator(ResultSink):
+    """Accumulates the values pushed to a scalar numeric result channel across the
+    repeats of a scan point (see ``accumulate_repeats`` in :class:`.ScanOptions`).
+
+    The running mean and sum of squared deviations are updated using Welford's
+    algorithm. Once the point is complete, the mean is pushed to the downstream sink,
+    and the standard error of the mean to the error sink (if any; ``nan`` for a single
+    value).
+    """
+
+    def __init__(self, downstream: ResultSink, error_sink: ResultSink = None):
+        self.downstream = downstream
+        self.error_sink = error_sink
+        self._reset()
+
+    def push(self, value: Any) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def complete_point(self) -> None:
+        """Push the aggregates for the values accumulated so far, if any."""
+        if self.count > 0:
+            self.push_aggregate(self.count, self.mean, self.m2)
+            self._reset()
+
+    def push_aggregate(self, count: int, mean: float, m2: float) -> None:
+        """Push the aggregates for ``count`` values with the given mean and sum of
+        squared deviations from it (e.g. as accumulated on the core device)."""
+        if self.downstream:
+            self.downstream.push(mean)
+        if self.error_sink:
+            err = np.sqrt(m2 / (count - 1) / count) if count > 1 else float("nan")
+            self.error_sink.push(err)
+
+    def _reset(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+
+class _LastRepeatSink(ResultSink):
+    """Passes on only the last value pushed across the repeats of a scan point, for
+    result channels that cannot be accumulated (see :class:`_RepeatAccumulator`)."""
+
+    def __init__(self, downstream: ResultSink):
+        self.downstream = downstream
+        self._has_value = False
+        self._value = None
+
+    def push(self, value: Any) -> None:
+        self._value = value
+        self._has_value = True
+
+    def complete_point(self) -> None:
+        if self._has_value:
+            self.downstream.push(self._value)
+            self._has_value = False
+            self._value = None
+
+
+class _DeviceRepeatAccumulator:
+    """Implements :class:`_RepeatAccumulator` on the core device, transferring only the
+    aggregates to the host once per point.
+
+    Instances take the place of the channel's ``push()`` method while a scan with
+    accumulated repeats is running. As for :class:`_ResultBuffer`, there is a subclass
+    per value type.
+    """
+
+    def __init__(self, core, accumulator: _RepeatAccumulator):
+        self.core = core
+        self.accumulator = accumulator
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    @kernel
+    def push(self, value):
+        self.count += 1
+        delta = float(value) - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (float(value) - self.mean)
+
+    @kernel
+    def complete_point(self):
+        if self.count > 0:
+            self._push_aggregate(self.count, self.mean, self.m2)
+            self.count = 0
+            self.mean = 0.0
+            self.m2 = 0.0
+
+    @rpc(flags={"async"})
+    def _push_aggregate(self, count, mean, m2):
+        self.accumulator.push_aggregate(count, mean, m2)
+
+
+class _FloatDeviceRepeatAccumulator(_DeviceRepeatAccumulator):
+    pass
+
+
+class _IntDeviceRepeatAccumulator(_DeviceRepeatAccumulator):
+    pass
+
+
+def _current_task() -> Any:
+    """Return the :mod:`asyncio` task currently being executed, or ``None``."""
+    current_task = getattr(asyncio, "current_task", None)
+    if current_task is None:
+        # Python < 3.7.
+        return asyncio.Task.current_task()
+    try:
+        return current_task()
+    except RuntimeError:
+        # No event loop running.
+        return None
+
+
+class _PointResultRouter(ResultSink):
+    """Sink that records the values pushed for the point being run in the current
+    :mod:`asyncio` task, so they can be passed on to the downstream sink in point
+    order.
+
+    :param downstream: The sink to pass on values to, directly if pushed from a task
+        not associated with any point.
+    :param point_results: Maps each task running a point to the list to record the
+        results pushed for the point in, as ``(sink, value)`` tuples.
+    """
+
+    def __init__(self, downstream: ResultSink, point_results: Dict[Any, list]):
+        self.downstream = downstream
+        self.point_results = point_results
+
+    def push(self, value: Any) -> None:
+        results = self.point_results.get(_current_task(), None)
+        if results is None:
+            self.downstream.push(value)
+        else:
+            results.append((self.downstream, value))
+
+
+class _HostWorker:
+    """Independent copy of a (reentrant) fragment tree for running scan points in
+    parallel, capturing the values pushed to the result channels for each point.
+
+    The copies share the ARTIQ environment (device/dataset managers), the device
+    drivers and the result sinks with the original fragment tree, but no other
+    objects.
+
+    :param fragment: The fragment to copy.
+    :param axes: The scan axes, the parameter stores of which to set in the copy.
+    """
+
+    def __init__(self, fragment: ExpFragment, axes: List[ScanAxis]):
+        memo = {}
+        for name, value in vars(fragment).items():
+            if name.startswith("_HasEnvironment__"):
+                memo[id(value)] = value
+        devices = []
+        fragment._collect_devices(devices)
+        for device in devices:
+            memo[id(device)] = device
+        channels = {}
+        fragment._collect_result_channels(channels)
+        for channel in channels.values():
+            if channel.sink is not None:
+                memo[id(channel.sink)] = channel.sink
+
+        self.fragment = copy.deepcopy(fragment, memo)
+        self.param_stores = [copy.deepcopy(a.param_store, memo) for a in axes]
+
+        copied_channels = {}
+        self.fragment._collect_result_channels(copied_channels)
+        self._sinks = []
+        for path, channel in copied_channels.items():
+            sink = ArraySink()
+            channel.set_sink(sink)
+            self._sinks.append((channels[path], sink))
+
+    def run_point(self, coords: tuple, num_repeats: int = 1) -> List[tuple]:
+        """Run the fragment for the given point.
+
+        :param num_repeats: The number of times to run the fragment back to back.
+        :return: A list of ``(channel, values)`` tuples, giving the values pushed to
+            each of the result channels (of the original fragment tree).
+        """
+        for store, value in zip(self.param_stores, coords):
+            store.set_value(value)
+        self.fragment.device_setup()
+        for _ in range(num_repeats):
+            self.fragment.run_once()
+
+        results = []
+        for channel, sink in self._sinks:
+            results.append((channel, sink.get_all()))
+            sink.clear()
+        return results
+
+
 class ScanRunner(HasEnvironment):
     """Runs the actual loop that executes an :class:`ExpFragment` for a specified list
     of scan axes (on either the host or core device, as appropriate).
@@ -48,22 +336,73 @@ class ScanRunner(HasEnvironment):
 
     # Note: ARTIQ Python is currently severely limited in its support for generics or
     # metaprogramming. While the interface for this class is effortlessly generic, the
-    # implementation might well be a long-forgotten ritual for invoking Cthulhu, and is
-    # special-cased for a number of low dimensions.
+    # implementation might well be a long-forgotten ritual for invoking Cthulhu, and
+    # generates the kernel code for the given number of dimensions at runtime.
+
+    #: Number of values buffered on the core device per result channel in batched
+    #: mode before they are transferred to the host (independent of the chunk size).
+    RESULT_BUFFER_SIZE = 256
+
+    def build(self, kernel_cache: KernelCache = None):
+        """
+        :param kernel_cache: If given, the :class:`KernelCache` to keep compiled scan
+            kernels in, to be reused when resuming the scan after a pause and when
+            scanning the same fragment along the same axes again in later calls to
+            :meth:`run`. By default, the kernel is compiled afresh for every
+            invocation.
 
-    def build(self):
-        ""
+            A cached kernel starts from the host attribute values embedded at the
+            time of its compilation; values written back at the end of a previous
+            invocation, or changed on the host in the meantime, are lost. This is
+            thus only appropriate if any parameters not scanned do not change between
+            runs, and the fragment does not keep state in attributes across kernel
+            invocations (e.g. counters, or calibrations updated by RPC), as that is
+            silently reset after every pause.
+        """
         self.setattr_device("core")
         self.setattr_device("scheduler")
+        self.kernel_cache = kernel_cache
+
+    #: Minimum interval between checkpoints pushed while the scan is running, in
+    #: seconds.
+    CHECKPOINT_INTERVAL = 1.0
 
-    def run(self, fragment: ExpFragment, spec: ScanSpec,
-            axis_sinks: List[ResultSink]) -> None:
+    def run(self,
+            fragment: ExpFragment,
+            spec: ScanSpec,
+            axis_sinks: List[ResultSink],
+            start_index: int = 0,
+            checkpoint_sink: ResultSink = None,
+            telemetry: ScanTelemetry = None,
+            progress: ScanProgress = None,
+            flush_group: DatasetFlushGroup = None,
+            error_sinks: Dict[ResultChannel, ResultSink] = None) -> None:
         """Run a scan of the given fragment, with axes as specified.
 
         :param fragment: The fragment to iterate.
         :param options: The options for the scan generator.
         :param axis_sinks: A list of :class:`ResultSink` instances to push the
             coordinates for each scan point to, matching ``scan.axes``.
+        :param start_index: The index of the first point to acquire, for resuming a
+            previously interrupted scan with the same spec (including the seed). The
+            points before are skipped.
+        :param checkpoint_sink: If given, a JSON string describing the scan progress
+            (number of points completed, the respective position in the scan, and the
+            scan options required to reproduce the point order) is pushed to this sink
+            from time to time while the scan is running, as well as when it exits.
+        :param telemetry: If given, the :class:`.ScanTelemetry` instance to record the
+            time spent in the various steps of executing each point with, and to
+            publish the statistics through.
+        :param progress: If given, the :class:`.ScanProgress` instance to report the
+            number of completed points (and the total, if known) to.
+        :param flush_group: If given, the :class:`.DatasetFlushGroup` of the sinks
+            receiving the scan results, which is flushed between points (subject to its
+            thresholds), before the scan is paused, and once it ends. As pause requests
+            then need to be checked for before the fact, this incurs an extra call to
+            the scheduler per point for scans executed on the host.
+        :param error_sinks: If repeats are accumulated (see ``accumulate_repeats`` in
+            :class:`.ScanOptions`), a map from result channels to the sinks to push the
+            standard error of the mean of their values to.
         """
 
         # Stash away _fragment in member variable to pacify ARTIQ compiler; there is no
@@ -73,138 +412,756 @@ class ScanRunner(HasEnvironment):
         # TODO: Handle parameters requiring host setup.
         self._fragment.host_setup()
 
-        points = generate_points(spec.generators, spec.options)
+        # Have the plan directly produce coordinates of the parameter types (e.g. int32
+        # arrays for integer parameters), which can then be passed on to the core device
+        # without any further conversion.
+        plan = ScanPointPlan(spec.generators, spec.options, [
+            type_string_to_param(a.param_schema["type"]).NumpyDType for a in spec.axes
+        ])
+
+        # For generators that adapt to the results, intercept the coordinates along the
+        # respective axis and the values pushed to the result channel of interest.
+        axis_sinks = list(axis_sinks)
+        self._feedback = []
+        original_sinks = []
+        for i, generator in enumerate(spec.generators):
+            channel = generator.get_feedback_channel()
+            if channel is None:
+                continue
+            if not isinstance(channel, ResultChannel):
+                raise ValueError(
+                    "Feedback channel for axis '{}' not resolved: {}".format(
+                        spec.axes[i].param_schema["fqn"], channel))
+            coord_sink = _FeedbackSink(axis_sinks[i])
+            axis_sinks[i] = coord_sink
+            value_sink = _FeedbackSink(channel.sink)
+            original_sinks.append((channel, channel.sink))
+            channel.set_sink(value_sink)
+            self._feedback.append((generator, coord_sink, value_sink))
+        if self._feedback and start_index != 0:
+            raise ValueError("Cannot resume scans with generators adapting to results")
+
+        # If repeats are accumulated, intercept the values pushed to all result
+        # channels such that only one (aggregate) value per point is passed on (to the
+        # sinks used for feedback, if any).
+        self._repeat_sinks = []
+        if spec.options.accumulate_repeats:
+            if error_sinks is None:
+                error_sinks = {}
+            channels = {}
+            self._fragment._collect_result_channels(channels)
+            for channel in channels.values():
+                if channel.sink is None:
+                    continue
+                if type(channel) in (FloatChannel, IntChannel):
+                    sink = _RepeatAccumulator(channel.sink, error_sinks.get(channel))
+                else:
+                    sink = _LastRepeatSink(channel.sink)
+                original_sinks.append((channel, channel.sink))
+                channel.set_sink(sink)
+                self._repeat_sinks.append(sink)
 
-        run_impl = self._run_scan_on_core_device if is_kernel(
-            self._fragment.run_once) else self._run_scan_on_host
-        run_impl(points, spec.axes, axis_sinks)
+        self._options = spec.options
+        self._checkpoint_sink = checkpoint_sink
+        self._last_checkpoint_time = None
+        if telemetry is None:
+            telemetry = ScanTelemetry()
+        self._telemetry = telemetry
+        telemetry.start()
+        if progress is None:
+            progress = ScanProgress()
+        self._progress = progress
+        progress.start(plan.get_num_points(), start_index)
+        self._flush_group = flush_group
 
-    def _run_scan_on_host(self, points: Iterator[Tuple], axes: List[ScanAxis],
-                          axis_sinks: List[ResultSink]) -> None:
-        while True:
-            axis_values = next(points, None)
-            if axis_values is None:
-                break
-            for (axis, value, sink) in zip(axes, axis_values, axis_sinks):
-                axis.param_store.set_value(value)
+        if is_kernel(self._fragment.run_once):
+            run_impl = self._run_scan_on_core_device
+        elif isinstance(self._fragment, AsyncExpFragment):
+            if self._options.skip_unchanged_setup:
+                raise ValueError("Skipping unchanged device_setup() calls is not "
+                                 "supported for asynchronous fragments")
+            run_impl = self._run_scan_on_host_async
+        elif self._options.num_workers > 1 and self._fragment.is_reentrant:
+            run_impl = self._run_scan_on_host_parallel
+        else:
+            run_impl = self._run_scan_on_host
+
+        # For parallel scans, this is done on each of the copies of the fragment tree
+        # instead.
+        track_setup = (self._options.skip_unchanged_setup
+                       and run_impl != self._run_scan_on_host_parallel)
+        if track_setup:
+            self._fragment._enable_setup_tracking()
+        try:
+            run_impl(plan, spec.axes, axis_sinks, start_index)
+        finally:
+            if track_setup:
+                self._fragment._disable_setup_tracking()
+            for channel, sink in reversed(original_sinks):
+                channel.set_sink(sink)
+            if flush_group is not None:
+                flush_group.flush()
+            telemetry.publish(force=True)
+            progress.publish(force=True)
+
+    def _push_checkpoint(self, plan: ScanPointPlan, num_completed: int,
+                         force: bool = False) -> None:
+        """Push a checkpoint to the checkpoint sink (if any) for the given number of
+        completed points, unless one was already pushed very recently.
+        """
+        if self._checkpoint_sink is None:
+            return
+        now = time.monotonic()
+        if not force and self._last_checkpoint_time is not None and \
+                now - self._last_checkpoint_time < self.CHECKPOINT_INTERVAL:
+            return
+        self._last_checkpoint_time = now
+
+        checkpoint = plan.describe_position(num_completed)
+        checkpoint["num_completed"] = num_completed
+        checkpoint["seed"] = self._options.seed
+        checkpoint["num_repeats"] = self._options.num_repeats
+        checkpoint["accumulate_repeats"] = self._options.accumulate_repeats
+        checkpoint["randomise_order_globally"] = self._options.randomise_order_globally
+        self._checkpoint_sink.push(json.dumps(checkpoint))
+
+    def _complete_repeats(self) -> None:
+        """Pass on the aggregate results for the repeats of the point just completed,
+        if repeats are accumulated."""
+        for sink in self._repeat_sinks:
+            sink.complete_point()
+
+    def _points_completed(self, num_points: int = 1) -> None:
+        self._telemetry.points_completed(num_points)
+        self._progress.points_completed(num_points)
+        if self._flush_group is not None:
+            self._flush_group.maybe_flush()
+
+    def _needs_pause_check(self) -> bool:
+        """Return whether pause requests need to be checked for explicitly (rather than
+        just calling ``scheduler.pause()``), as some preparations are necessary before
+        a pause."""
+        return self._options.skip_unchanged_setup or (
+            self._flush_group is not None and self._flush_group.has_pending())
+
+    def _flush_before_pause(self) -> None:
+        """Make the results buffered so far visible while the scan is paused."""
+        if self._flush_group is not None:
+            self._flush_group.flush()
+
+    def _deliver_feedback(self) -> None:
+        """Pass on the results for any points completed since the last call to the
+        generators adapting to them.
+        """
+        for generator, coord_sink, value_sink in self._feedback:
+            num = min(len(coord_sink.values), len(value_sink.values))
+            if num == 0:
+                continue
+            generator.feedback(np.array(coord_sink.values[:num]),
+                               np.array(value_sink.values[:num]))
+            del coord_sink.values[:num]
+            del value_sink.values[:num]
+
+    def _run_scan_on_host(self, plan: ScanPointPlan, axes: List[ScanAxis],
+                          axis_sinks: List[ResultSink], start_index: int) -> None:
+        # Coordinates are fetched from the plan in blocks to amortise the overhead of
+        # computing them; the block size does not otherwise affect the scan. Blocks
+        # never extend across levels, so adaptive generators get to see all the results
+        # before generating the next level.
+        BLOCK_SIZE = 64
+
+        telemetry = self._telemetry
+        index = start_index
+        try:
+            while True:
+                self._deliver_feedback()
+                coords = plan.points(index,
+                                     min(index + BLOCK_SIZE, plan.level_end(index)))
+                num_points = len(coords[0])
+                if num_points == 0:
+                    break
+                for i in range(num_points):
+                    # Rate-limited by time, so cheap enough to call for every point.
+                    self._push_checkpoint(plan, index)
+                    start_time = time.monotonic()
+                    for (axis, values, sink) in zip(axes, coords, axis_sinks):
+                        value = values[i]
+                        axis.param_store.set_value(value)
+                        sink.push(value)
+
+                    pushed_time = time.monotonic()
+                    self._fragment.device_setup()
+                    setup_time = time.monotonic()
+                    for _ in range(self._options.get_repeats_per_point()):
+                        self._fragment.run_once()
+                    self._complete_repeats()
+                    run_time = time.monotonic()
+                    index += 1
+                    if self._needs_pause_check() and self.scheduler.check_pause():
+                        if self._options.skip_unchanged_setup:
+                            # Other experiments might change the hardware state while
+                            # we are paused.
+                            self._fragment._mark_setup_changed()
+                        self._flush_before_pause()
+                    self.scheduler.pause()
+                    end_time = time.monotonic()
+
+                    telemetry.record("sink_push", pushed_time - start_time)
+                    telemetry.record("device_setup", setup_time - pushed_time)
+                    telemetry.record("run_once", run_time - setup_time)
+                    telemetry.record("scheduler", end_time - run_time)
+                    telemetry.record("point", end_time - start_time)
+                    self._points_completed()
+        finally:
+            self._push_checkpoint(plan, index, force=True)
+
+    def _run_scan_on_host_parallel(self, plan: ScanPointPlan, axes: List[ScanAxis],
+                                   axis_sinks: List[ResultSink],
+                                   start_index: int) -> None:
+        # Points are distributed across a pool of threads, each of which uses its own
+        # copy of the fragment tree. The coordinates and results are then pushed to
+        # the sinks in point order, so the result is the same as for a serial scan.
+        # As in _run_scan_on_host(), blocks never extend across levels.
+        num_workers = self._options.num_workers
+        BLOCK_SIZE = 16 * num_workers
+
+        idle_workers = queue.Queue()
+        workers = []
+        for _ in range(num_workers):
+            worker = _HostWorker(self._fragment, axes)
+            if self._options.skip_unchanged_setup:
+                worker.fragment._enable_setup_tracking()
+            workers.append(worker)
+            idle_workers.put(worker)
+
+        def run_point(point_coords):
+            worker = idle_workers.get()
+            try:
+                return worker.run_point(point_coords,
+                                        self._options.get_repeats_per_point())
+            finally:
+                idle_workers.put(worker)
+
+        # Points submitted to the pool whose results have not been pushed yet, in
+        # order, as (coordinates, future) tuples. At most one per worker is submitted
+        # ahead, so pause requests (checked after each point) are honoured within
+        # about the time of a single point.
+        in_flight = deque()
+        num_completed = start_index
+        pause_pending = False
+
+        def complete_oldest():
+            nonlocal num_completed, pause_pending
+            point_coords, future = in_flight.popleft()
+            results = future.result()
+            for value, sink in zip(point_coords, axis_sinks):
                 sink.push(value)
+            for channel, values in results:
+                if channel.sink:
+                    channel.sink.push_many(values)
+            self._complete_repeats()
+            num_completed += 1
+            self._points_completed()
+            self._push_checkpoint(plan, num_completed)
+            if self.scheduler.check_pause():
+                pause_pending = True
 
-            self._fragment.device_setup()
-            self._fragment.run_once()
-            self.scheduler.pause()
+        def complete_all():
+            while in_flight:
+                complete_oldest()
 
-    def _run_scan_on_core_device(self, points: list, axes: List[ScanAxis],
-                                 axis_sinks: List[ResultSink]) -> None:
+        index = start_index
+        executor = ThreadPoolExecutor(max_workers=num_workers)
+        try:
+            while True:
+                if self._feedback:
+                    # Adaptive generators need all the results first.
+                    complete_all()
+                    self._deliver_feedback()
+                coords = plan.points(index,
+                                     min(index + BLOCK_SIZE, plan.level_end(index)))
+                num_points = len(coords[0])
+                if num_points == 0:
+                    break
+                for i in range(num_points):
+                    if len(in_flight) >= num_workers:
+                        complete_oldest()
+                    if pause_pending:
+                        # Do not start any new points before pausing.
+                        complete_all()
+                        if self._options.skip_unchanged_setup:
+                            for worker in workers:
+                                worker.fragment._mark_setup_changed()
+                        self._flush_before_pause()
+                        self.scheduler.pause()
+                        pause_pending = False
+                    point_coords = tuple(c[i] for c in coords)
+                    in_flight.append(
+                        (point_coords, executor.submit(run_point, point_coords)))
+                    index += 1
+            complete_all()
+        finally:
+            executor.shutdown()
+            self._push_checkpoint(plan, num_completed, force=True)
+
+    def _run_scan_on_host_async(self, plan: ScanPointPlan, axes: List[ScanAxis],
+                                axis_sinks: List[ResultSink],
+                                start_index: int) -> None:
+        # Record the results pushed from each point separately, such that they can be
+        # passed on in order even though several points are in progress at once.
+        self._async_point_results = {}
+        channels = {}
+        self._fragment._collect_result_channels(channels)
+        original_sinks = []
+        for channel in channels.values():
+            if channel.sink is not None:
+                original_sinks.append((channel, channel.sink))
+                channel.set_sink(
+                    _PointResultRouter(channel.sink, self._async_point_results))
+        try:
+            run_in_new_event_loop(
+                self._scan_points_async(plan, axes, axis_sinks, start_index))
+        finally:
+            for channel, sink in original_sinks:
+                channel.set_sink(sink)
+
+    async def _scan_points_async(self, plan: ScanPointPlan, axes: List[ScanAxis],
+                                 axis_sinks: List[ResultSink],
+                                 start_index: int) -> None:
+        # As in _run_scan_on_host(), blocks never extend across levels.
+        BLOCK_SIZE = 64
+
+        # Points for which run_once() has been started, in order, as (coordinates,
+        # results, task) tuples.
+        in_flight = deque()
+        num_completed = start_index
+        point_results = self._async_point_results
+        scan_task = _current_task()
+
+        async def complete_oldest():
+            nonlocal num_completed
+            point_coords, results, task = in_flight.popleft()
+            await task
+            del point_results[task]
+            for value, sink in zip(point_coords, axis_sinks):
+                sink.push(value)
+            for sink, value in results:
+                sink.push(value)
+            self._complete_repeats()
+            num_completed += 1
+            self._points_completed()
+            # Points are completed in order, so all points before this one are done
+            # as well. Rate-limited by time, so cheap enough to call for every point.
+            self._push_checkpoint(plan, num_completed)
+
+        async def complete_all():
+            while in_flight:
+                await complete_oldest()
+
+        index = start_index
+        try:
+            while True:
+                if self._feedback:
+                    # Adaptive generators need all the results first.
+                    await complete_all()
+                    self._deliver_feedback()
+                coords = plan.points(index,
+                                     min(index + BLOCK_SIZE, plan.level_end(index)))
+                num_points = len(coords[0])
+                if num_points == 0:
+                    break
+                for i in range(num_points):
+                    if len(in_flight) >= self._fragment.max_points_in_flight:
+                        await complete_oldest()
+
+                    point_coords = tuple(c[i] for c in coords)
+                    results = []
+                    # Results pushed from device_setup() (run in this task) belong to
+                    # the new point as well.
+                    point_results[scan_task] = results
+                    try:
+                        for axis, value in zip(axes, point_coords):
+                            axis.param_store.set_value(value)
+                        await self._fragment.device_setup()
+                        task = asyncio.ensure_future(self._run_repeats_async())
+                    finally:
+                        del point_results[scan_task]
+                    point_results[task] = results
+                    in_flight.append((point_coords, results, task))
+                    index += 1
+
+                    # Let run_once() start (and read the parameters) before they are
+                    # changed for the next point.
+                    await asyncio.sleep(0)
+
+                    if self.scheduler.check_pause():
+                        await complete_all()
+                        self._flush_before_pause()
+                        self.scheduler.pause()
+            await complete_all()
+        finally:
+            # Abandon any points still in progress (e.g. if one failed).
+            tasks = [task for _, _, task in in_flight]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            point_results.clear()
+            self._push_checkpoint(plan, num_completed, force=True)
+
+    async def _run_repeats_async(self) -> None:
+        for _ in range(self._options.get_repeats_per_point()):
+            await self._fragment.run_once()
+
+    def _run_scan_on_core_device(self, plan: ScanPointPlan, axes: List[ScanAxis],
+                                 axis_sinks: List[ResultSink],
+                                 start_index: int) -> None:
         # Set up members to be accessed from the kernel through the
         # _kscan_param_values_chunk RPC call later.
-        self._kscan_points = points
+        self._kscan_plan = plan
         self._kscan_axis_sinks = axis_sinks
-        self._kscan_axis_coerce_fns = [a.param_store.coerce for a in axes]
 
-        # Stash away points in current kernel chunk until they have been marked
-        # completed as a quick shortcut to be able to resume from interruptions. This
-        # should be cleaned up a bit later. Alternatively, if we use an (async, but
-        # still) RPC to keep track of points completed, we might as well use it to send
-        # back all the result channel values from the core device in one go.
-        self._kscan_current_chunk = []
+        # Small scans are uploaded to the core device as a whole and executed in a
+        # single kernel invocation (which still periodically checks for pause
+        # requests), avoiding the per-chunk RPC and kernel re-entry overhead. Adaptive
+        # generators need the results before generating further points, though.
+        max_upload_points = self._options.max_upload_points
+        self._kscan_upload_whole = (not self._feedback and max_upload_points > 0
+                                    and not plan.has_point(start_index +
+                                                           max_upload_points))
+        if self._kscan_upload_whole:
+            self._kscan_pause_check_interval = self._options.pause_check_interval
+        else:
+            # Chunks are never larger than this, so only check after each chunk.
+            self._kscan_pause_check_interval = self._options.max_chunk_size
+
+        # Compute the next chunk in the background while the kernel is busy with the
+        # current one. Adaptive generators need the results of the current chunk first,
+        # though.
+        self._kscan_prefetcher = ChunkPrefetcher(
+            plan, enabled=not (self._feedback or self._kscan_upload_whole))
+
+        # Coordinates for parameter types without a NumPy equivalent (i.e. strings) are
+        # passed as lists.
+        param_types = [type_string_to_param(a.param_schema["type"]) for a in axes]
+        self._kscan_axis_as_list = [t.NumpyDType is None for t in param_types]
+
+        # Keep track of the index of the first point not yet marked as completed, so we
+        # can resume from there after interruptions. The coordinates of the current
+        # chunk are kept around to push them to the axis sinks once the respective
+        # points have been completed.
+        self._kscan_next_index = start_index
+        self._kscan_chunk_start = start_index
+        self._kscan_chunk_coords = []
+
+        # The number of points per chunk is chosen based on a running estimate of the
+        # wall clock time per point (including RPC overhead), measured between chunk
+        # requests within the same kernel invocation.
+        self._kscan_time_per_point = None
+        self._kscan_chunk_sent_time = None
 
         for i, axis in enumerate(axes):
             setattr(self, "_kscan_param_setter_{}".format(i),
                     axis.param_store.set_value)
 
-        # _kscan_param_values_chunk returns a tuple of lists of values, one for each
+        # Point completion is either signalled to the host after each point, or in bulk
+        # at the end of each chunk, together with the buffered results.
+        buffered_channels = []
+        self._kscan_result_buffers = []
+        if self._options.batch_results:
+            buffered_channels = self._kscan_setup_result_buffers()
+        else:
+            self._kscan_on_point_completed = self._kscan_point_completed
+            self._kscan_on_chunk_completed = self._kscan_ignore_chunk_completed
+
+        # With accumulated repeats, the values pushed to numeric result channels are
+        # also aggregated on the core device.
+        accumulated_channels = []
+        if self._options.accumulate_repeats:
+            accumulated_channels = self._kscan_setup_repeat_accumulators()
+        else:
+            self._kscan_run_point = self._kscan_run_fragment_once
+
+        # _kscan_param_values_chunk returns a tuple of arrays of values, one for each
         # scan axis. Synthesize a return type annotation (`def foo(self): -> …`) with
         # the concrete type for this scan so the compiler can infer the types in
         # _kscan_impl() correctly.
         self._kscan_param_values_chunk.__func__.__annotations__ = {
             "return":
-            TTuple([
-                TList(type_string_to_param(a.param_schema["type"]).CompilerType)
-                for a in axes
-            ])
+            TTuple([(TList if as_list else TArray)(t.CompilerType)
+                    for t, as_list in zip(param_types, self._kscan_axis_as_list)])
         }
 
-        # TODO: Implement pausing logic.
-        # FIXME: Replace this with generated code once eval_kernel() is implemented.
-        num_dims = len(axes)
-        scan_impl = getattr(self, "_kscan_impl_{}".format(num_dims), None)
-        if scan_impl is None:
-            raise NotImplementedError(
-                "{}-dimensional scans not supported yet".format(num_dims))
+        scan_impl = types.MethodType(_make_kscan_impl(len(axes)), self)
 
-        with suppress(ScanFinished):
-            while True:
-                scan_impl()
-                self.core.comm.close()
-                self.scheduler.pause()
+        # If requested, avoid recompiling the kernel every time the scan is resumed.
+        # The key captures everything the generated code and the attributes used from
+        # it depend on.
+        kernel_cache = self.kernel_cache
+        cache_key = (type(self._fragment), len(axes),
+                     tuple(a.param_schema["type"] for a in axes),
+                     self._options.batch_results, self._kscan_pause_check_interval,
+                     self._options.skip_unchanged_setup,
+                     self._options.get_repeats_per_point(), self, self._fragment,
+                     tuple(a.param_store for a in axes))
 
-    @kernel
-    def _kscan_impl_1(self):
-        while True:
-            (param_values_0, ) = self._kscan_param_values_chunk()
-            for i in range(len(param_values_0)):
-                self._kscan_param_setter_0(param_values_0[i])
-                self._kscan_run_fragment_once()
-                self._kscan_point_completed()
-            if self.scheduler.check_pause():
-                return
+        try:
+            with suppress(ScanFinished):
+                while True:
+                    # Do not count kernel compilation/startup time against the points.
+                    self._kscan_chunk_sent_time = None
+                    if self._options.skip_unchanged_setup:
+                        # Fully reinitialise after pauses, as other experiments might
+                        # have changed the hardware state. (A cached kernel is always
+                        # compiled right after this, so also starts with all flags
+                        # set when reloaded.)
+                        self._fragment._mark_setup_changed()
+                    if kernel_cache is None:
+                        scan_impl()
+                    else:
+                        kernel_cache.run(cache_key, scan_impl)
+                    start_time = time.monotonic()
+                    self.core.comm.close()
+                    self._flush_before_pause()
+                    self.scheduler.pause()
+                    self._telemetry.record("scheduler", time.monotonic() - start_time)
+        finally:
+            for channel in buffered_channels + accumulated_channels:
+                del channel.push
+            self._kscan_prefetcher.close()
+            self._push_checkpoint(plan, self._kscan_next_index, force=True)
+            if kernel_cache is not None:
+                logger.debug("Kernel cache: %s hits, %s misses", kernel_cache.num_hits,
+                             kernel_cache.num_misses)
 
-    @kernel
-    def _kscan_impl_2(self):
-        while True:
-            param_values_0, param_values_1 = self._kscan_param_values_chunk()
-            for i in range(len(param_values_0)):
-                self._kscan_param_setter_0(param_values_0[i])
-                self._kscan_param_setter_1(param_values_1[i])
-                self._kscan_run_fragment_once()
-                self._kscan_point_completed()
-            if self.scheduler.check_pause():
-                return
+    def _kscan_setup_result_buffers(self) -> List[ResultChannel]:
+        """Redirect pushes to all numeric result channels of the fragment to buffers on
+        the core device, and set up the point/chunk completion hooks for batched mode.
 
-    @kernel
-    def _kscan_impl_3(self):
-        while True:
-            param_values_0, param_values_1, param_values_2 =\
-                self._kscan_param_values_chunk()
-            for i in range(len(param_values_0)):
-                self._kscan_param_setter_0(param_values_0[i])
-                self._kscan_param_setter_1(param_values_1[i])
-                self._kscan_param_setter_2(param_values_2[i])
-                self._kscan_run_fragment_once()
-                self._kscan_point_completed()
-            if self.scheduler.check_pause():
-                return
+        :return: The list of channels redirected.
+        """
+        channels = {}
+        self._fragment._collect_result_channels(channels)
+        buffer_types = {FloatChannel: _FloatResultBuffer, IntChannel: _IntResultBuffer}
+        buffered_channels = []
+        for channel in channels.values():
+            buffer_type = buffer_types.get(type(channel), None)
+            if buffer_type is None:
+                # Other channels (e.g. opaque ones) still use one RPC per push.
+                continue
+            buffer = buffer_type(self.core, channel, self.RESULT_BUFFER_SIZE)
+            setattr(self, "_kscan_result_buffer_{}".format(len(buffered_channels)),
+                    buffer)
+            self._kscan_result_buffers.append(buffer)
+            channel.push = buffer.push
+            buffered_channels.append(channel)
+
+        # The number of buffers varies, so generate the code to flush all of them.
+        chunk_completed = _make_kscan_chunk_completed(len(buffered_channels))
+
+        self._kscan_on_point_completed = self._kscan_ignore_point_completed
+        self._kscan_on_chunk_completed = types.MethodType(chunk_completed, self)
+        return buffered_channels
+
+    def _kscan_setup_repeat_accumulators(self) -> List[ResultChannel]:
+        """Redirect pushes to all numeric result channels of the fragment to
+        accumulators on the core device, and set up the code to run all the repeats of
+        a point (see ``accumulate_repeats`` in :class:`.ScanOptions`).
+
+        :return: The list of channels redirected.
+        """
+        channels = {}
+        self._fragment._collect_result_channels(channels)
+        accumulator_types = {
+            FloatChannel: _FloatDeviceRepeatAccumulator,
+            IntChannel: _IntDeviceRepeatAccumulator
+        }
+        accumulated_channels = []
+        for channel in channels.values():
+            if not isinstance(channel.sink, _RepeatAccumulator):
+                # Other channels (e.g. opaque ones) are handled on the host.
+                continue
+            accumulator = accumulator_types[type(channel)](self.core, channel.sink)
+            setattr(self,
+                    "_kscan_repeat_accumulator_{}".format(len(accumulated_channels)),
+                    accumulator)
+            channel.push = accumulator.push
+            accumulated_channels.append(channel)
+        self._kscan_num_repeats = self._options.num_repeats
+
+        # The number of accumulators varies, so generate the code to complete all of
+        # them.
+        run_point = _make_kscan_run_point(len(accumulated_channels))
+        self._kscan_run_point = types.MethodType(run_point, self)
+        return accumulated_channels
 
     @kernel
     def _kscan_run_fragment_once(self):
         self._fragment.device_setup()
         self._fragment.run_once()
 
+    @kernel
+    def _kscan_ignore_point_completed(self):
+        pass
+
+    @kernel
+    def _kscan_ignore_chunk_completed(self, num_points):
+        pass
+
     def _kscan_param_values_chunk(self):
-        # Chunk size could be chosen adaptively in the future based on wall clock time
-        # per point to provide good responsitivity to pause/terminate requests while
-        # keeping RPC latency overhead low.
-        CHUNK_SIZE = 10
-
-        self._kscan_current_chunk.extend(
-            islice(self._kscan_points, CHUNK_SIZE - len(self._kscan_current_chunk)))
-
-        values = tuple([] for _ in self._kscan_axis_coerce_fns)
-        for p in self._kscan_current_chunk:
-            for i, (value, coerce) in enumerate(zip(p, self._kscan_axis_coerce_fns)):
-                # KLUDGE: Explicitly coerce value to the target type here so we can use
-                # the regular (float) scans for integers until proper support for int
-                # scans is implemented.
-                values[i].append(coerce(value))
-        if not values[0]:
+        start_time = time.monotonic()
+        chunk_size = self._kscan_update_chunk_size()
+
+        # Any results for the previous chunk have been pushed by now (async RPCs are
+        # processed in order), so adaptive generators can take them into account. (No
+        # chunk is being prefetched in this case.)
+        self._deliver_feedback()
+
+        # Restart from the first point not completed yet; if the previous kernel
+        # invocation was interrupted, this is somewhere within the last chunk. Chunks
+        # do not extend across levels (see _run_scan_on_host()).
+        start = self._kscan_next_index
+        self._kscan_prefetcher.wait()
+        self._push_checkpoint(self._kscan_plan, start)
+        if self._kscan_upload_whole:
+            # All the remaining points, across levels (see _run_scan_on_core_device()).
+            coords = self._kscan_plan.points(start,
+                                             start + self._options.max_upload_points)
+        else:
+            coords = self._kscan_prefetcher.get(start, chunk_size)
+        if len(coords[0]) == 0:
             raise ScanFinished
-        return values
+        self._kscan_chunk_start = start
+        self._kscan_chunk_coords = coords
+        self._kscan_chunk_sent_time = time.monotonic()
+        self._telemetry.record("chunk_rpc", self._kscan_chunk_sent_time - start_time)
+
+        # The coordinates are already of the right type (see run()), so can be passed
+        # on as they are.
+        return tuple(c.tolist() if as_list else c
+                     for c, as_list in zip(coords, self._kscan_axis_as_list))
+
+    def _kscan_update_chunk_size(self) -> int:
+        """Update the estimate of the time per point from the previous chunk (if any),
+        and return the number of points to use for the next one.
+        """
+        options = self._options
+        num_completed = self._kscan_next_index - self._kscan_chunk_start
+        if self._kscan_chunk_sent_time is not None and num_completed > 0:
+            time_per_point = (time.monotonic() -
+                              self._kscan_chunk_sent_time) / num_completed
+            self._telemetry.record("point", time_per_point)
+            if self._kscan_time_per_point is None:
+                self._kscan_time_per_point = time_per_point
+            else:
+                # Exponential moving average to smooth over fluctuations (e.g. from
+                # occasional slow points).
+                self._kscan_time_per_point += 0.5 * (time_per_point -
+                                                     self._kscan_time_per_point)
+
+        if self._kscan_time_per_point is None:
+            # No estimate yet; start small so even slow fragments respond to pause
+            # requests, with the chunk size ramping up quickly from there.
+            return options.min_chunk_size
+        if self._kscan_time_per_point <= 0.0:
+            return options.max_chunk_size
+        chunk_size = int(options.chunk_target_duration / self._kscan_time_per_point)
+        return min(max(chunk_size, options.min_chunk_size), options.max_chunk_size)
 
     @rpc(flags={"async"})
     def _kscan_point_completed(self):
-        values = self._kscan_current_chunk.pop(0)
-        for value, sink in zip(values, self._kscan_axis_sinks):
-            sink.push(value)
+        start_time = time.monotonic()
+        self._complete_repeats()
+        i = self._kscan_next_index - self._kscan_chunk_start
+        for coords, sink in zip(self._kscan_chunk_coords, self._kscan_axis_sinks):
+            sink.push(coords[i])
+        self._kscan_next_index += 1
+        self._telemetry.record("sink_push", time.monotonic() - start_time)
+        self._points_completed()
+
+    @rpc(flags={"async"})
+    def _kscan_points_completed(self, num_points):
+        start_time = time.monotonic()
+        for buffer in self._kscan_result_buffers:
+            buffer.commit()
+        i = self._kscan_next_index - self._kscan_chunk_start
+        for coords, sink in zip(self._kscan_chunk_coords, self._kscan_axis_sinks):
+            sink.push_many(coords[i:i + num_points])
+        self._kscan_next_index += num_points
+        self._telemetry.record("sink_push", time.monotonic() - start_time)
+        self._points_completed(num_points)
+
+
+# The code generators below are memoised, such that scanning repeatedly does not keep
+# compiling (and registering the source of) new copies of the same functions.
+
+
+@functools.lru_cache(maxsize=None)
+def _make_kscan_chunk_completed(num_buffers: int):
+    """Generate the kernel function flushing the given number of result buffers at the
+    end of a chunk in batched mode (see :meth:`ScanRunner._kscan_setup_result_buffers`).
+    """
+    source = "@kernel\ndef _kscan_chunk_completed(self, num_points):\n"
+    for i in range(num_buffers):
+        source += "    self._kscan_result_buffer_{}.flush()\n".format(i)
+    source += "    self._kscan_points_completed(num_points)\n"
+    return compile_function(source, "_kscan_chunk_completed", {"kernel": kernel})
+
+
+@functools.lru_cache(maxsize=None)
+def _make_kscan_run_point(num_accumulators: int):
+    """Generate the kernel function running all the repeats of a point and completing
+    the given number of repeat accumulators (see
+    :meth:`ScanRunner._kscan_setup_repeat_accumulators`).
+    """
+    source = "\n".join([
+        "@kernel",
+        "def _kscan_run_point(self):",
+        "    self._fragment.device_setup()",
+        "    for _ in range(self._kscan_num_repeats):",
+        "        self._fragment.run_once()",
+    ] + [
+        "    self._kscan_repeat_accumulator_{}.complete_point()".format(i)
+        for i in range(num_accumulators)
+    ]) + "\n"
+    return compile_function(source, "_kscan_run_point", {"kernel": kernel})
+
+
+@functools.lru_cache(maxsize=None)
+def _make_kscan_impl(num_axes: int):
+    """Generate the kernel function implementing the scan loop on the core device for
+    the given number of axes (to be bound to a :class:`ScanRunner` instance).
+
+    The ARTIQ compiler does not support variadic tuple unpacking or lists of
+    heterogeneously typed functions, so the code is generated with a separate variable
+    and parameter setter for each axis.
+
+    Each chunk is executed in batches of ``_kscan_pause_check_interval`` points, after
+    each of which completion is signalled to the host and pause requests are checked
+    for.
+    """
+    values = ["param_values_{}".format(i) for i in range(num_axes)]
+    lines = [
+        "@kernel",
+        "def _kscan_impl(self):",
+        "    while True:",
+        "        ({}, ) = self._kscan_param_values_chunk()".format(", ".join(values)),
+        "        num_points = len(param_values_0)",
+        "        start = 0",
+        "        while start < num_points:",
+        "            end = min(start + self._kscan_pause_check_interval, num_points)",
+        "            for i in range(start, end):",
+    ]
+    for i, v in enumerate(values):
+        lines.append("                self._kscan_param_setter_{}({}[i])".format(i, v))
+    lines += [
+        "                self._kscan_run_point()",
+        "                self._kscan_on_point_completed()",
+        "            self._kscan_on_chunk_completed(end - start)",
+        "            if self.scheduler.check_pause():",
+        "                return",
+        "            start = end",
+    ]
+    return compile_function("\n".join(lines) + "\n", "_kscan_impl", {"kernel": kernel})
 
 
 def filter_default_analyses(fragment: ExpFragment,
@@ -238,10 +1195,14 @@ def describe_scan(spec: ScanSpec, fragment: ExpFragment,
 
     desc["axes"] = axis_specs
     desc["seed"] = spec.options.seed
-    desc["channels"] = {
-        name: channel.describe()
-        for (channel, name) in short_result_names.items()
-    }
+    desc["channels"] = {}
+    for channel, name in short_result_names.items():
+        channel_desc = channel.describe()
+        if spec.options.accumulate_repeats and type(channel) is IntChannel:
+            # The mean across the repeats is stored instead, which is generally not
+            # an integer.
+            channel_desc["type"] = "float"
+        desc["channels"][name] = channel_desc
 
     axis_identities = [(s.param_schema["fqn"], s.path) for s in spec.axes]
     context = AnnotationContext(
@@ -4,11 +4,13 @@ another child fragment as part of its execution.
 """
 
 from collections import OrderedDict
-from typing import Callable, Dict, List, Tuple
+from typing import Callable, Dict, List, Tuple, Union
 from .default_analysis import AnnotationContext
 from .fragment import ExpFragment, Fragment
 from .parameters import ParamHandle
-from .result_channels import ArraySink, OpaqueChannel, ResultChannel, SubscanChannel
+from .result_channels import (ArrayChannel, ArraySink, IntChannel, NumericChannel,
+                              NumpyArraySink, OpaqueChannel, ResultChannel,
+                              SubscanChannel, make_array_sink)
 from .scan_generator import ScanGenerator, ScanOptions
 from .scan_runner import (ScanAxis, ScanRunner, ScanSpec, describe_scan,
                           filter_default_analyses)
@@ -39,7 +41,8 @@ class Subscan:
     def run(self,
             axis_generators: List[Tuple[ParamHandle, ScanGenerator]],
             options=ScanOptions(),
-            execute_default_analyses=True
+            execute_default_analyses=True,
+            copy_results=True
             ) -> Tuple[Dict[ParamHandle, list], Dict[ResultChannel, list]]:
         """Run the subscan with the given axis iteration specifications, and return the
         data point coordinates/result channel values.
@@ -49,13 +52,29 @@ class Subscan:
             :func:`setattr_subscan` to set up), and the :class:`ScanGenerator` to use
             to generate the points.
         :param options: Scan options to pass to :class:`ScanSpec`.
+        :param copy_results: If ``False``, the values of numeric result channels are
+            returned as views into the buffers of the subscan rather than as copies.
+            This avoids allocating memory for every run, but the returned arrays are
+            then only valid until the next call to :meth:`run` (as the buffers are
+            reused), and need to be copied if they are to be retained.
 
         :return: A tuple ``(coordinates, values)``, each a dictionary mapping parameter
-            handles resp. result channels to lists of their values.
+            handles resp. result channels to lists of their values. The values of
+            numeric result channels are returned as NumPy arrays.
         """
 
+        if options.accumulate_repeats and any(
+                type(c) is IntChannel for c in self._child_result_sinks):
+            # The mean across the repeats could not be represented in the integer
+            # arrays announced for these channels in setattr_subscan().
+            raise ValueError("Cannot accumulate repeats in subscans of fragments "
+                             "with integer result channels")
+
+        num_points = _get_num_points([g for _, g in axis_generators], options)
         for sink in self._child_result_sinks.values():
             sink.clear()
+            if num_points is not None and isinstance(sink, NumpyArraySink):
+                sink.reserve(num_points)
 
         axes = []
         generators = []
@@ -113,13 +132,43 @@ class Subscan:
         values = {}
         for chan, sink in self._child_result_sinks.items():
             v = sink.get_all()
+            if isinstance(sink, NumpyArraySink):
+                # Sinks of the aggregate channel might hold on to the value, so pass a
+                # copy rather than a view into the buffer that is reused.
+                self._aggregate_result_channels[chan].push(v.copy())
+                if copy_results:
+                    v = v.copy()
+            else:
+                self._aggregate_result_channels[chan].push(v)
             values[chan] = v
-            self._aggregate_result_channels[chan].push(v)
 
         coordinates = OrderedDict((p, s.get_all()) for p, s in coordinate_sinks.items())
         return coordinates, values
 
 
+def _get_num_points(generators: List[ScanGenerator],
+                    options: ScanOptions) -> Union[int, None]:
+    """Return the total number of points a subscan with the given generators will
+    produce (see :meth:`.ScanPointPlan.get_num_points`), or ``None`` if unbounded.
+
+    This avoids constructing a :class:`.ScanPointPlan`, which would needlessly seed a
+    new random number generator on every run.
+    """
+    total = options.get_repeats_per_level()
+    joint_types = set()
+    for gen in generators:
+        if gen.samples_jointly:
+            # Generators of the same type sampling jointly share a dimension.
+            if type(gen) in joint_types:
+                continue
+            joint_types.add(type(gen))
+        num = gen.get_num_points()
+        if num is None:
+            return None
+        total *= num
+    return total
+
+
 def setattr_subscan(owner: Fragment,
                     scan_name: str,
                     fragment: ExpFragment,
@@ -165,21 +214,28 @@ def setattr_subscan(owner: Fragment,
         #  - Require the actually used axes to be given in axis_params (which will be
         #    the most common use case anyway).
         #  - Serialise the scan point coordinates into the scan spec.
-        coordinate_channels.append(
-            owner.setattr_result(
-                scan_name + "_axis_{}".format(i),
-                OpaqueChannel,
-                save_by_default=save_results_by_default))
+        channel_name = scan_name + "_axis_{}".format(i)
+        if param.NumpyDType is None:
+            channel = owner.setattr_result(channel_name,
+                                           OpaqueChannel,
+                                           save_by_default=save_results_by_default)
+        else:
+            channel = owner.setattr_result(channel_name,
+                                           ArrayChannel,
+                                           param.description,
+                                           save_by_default=save_results_by_default,
+                                           dtype=param.NumpyDType)
+        coordinate_channels.append(channel)
 
     # Instead of letting our parent directly manage the subfragment result channels,
-    # we redirect the results to ArraySinks…
+    # we redirect the results to array sinks…
     original_channels = {}
     fragment._collect_result_channels(original_channels)
     owner._absorbed_results_subfragments.add(fragment)
 
     child_result_sinks = {}
     for channel in original_channels.values():
-        sink = ArraySink()
+        sink = make_array_sink(channel)
         channel.set_sink(sink)
         child_result_sinks[channel] = sink
 
@@ -192,12 +248,9 @@ def setattr_subscan(owner: Fragment,
         channel = original_channels[full_name]
         short_child_channel_names[channel] = short_name
 
-        # TODO: Implement ArrayChannel to represent a variable number of dimensions
-        # around a scalar channel so we can keep the schema information here.
-        aggregate_result_channels[channel] = owner.setattr_result(
-            scan_name + "_channel_" + short_name,
-            OpaqueChannel,
-            save_by_default=save_results_by_default and channel.save_by_default)
+        aggregate_result_channels[channel] = _setattr_aggregate_result(
+            owner, scan_name + "_channel_" + short_name, channel,
+            save_results_by_default and channel.save_by_default)
 
     spec_channel = owner.setattr_result(scan_name + "_spec", SubscanChannel)
 
@@ -206,3 +259,46 @@ def setattr_subscan(owner: Fragment,
         child_result_sinks, aggregate_result_channels, short_child_channel_names)
     setattr(owner, scan_name, subscan)
     return subscan
+
+
+#: Display hints that refer to other result channels by name. These names are only
+#: meaningful among the channels of the subscan, so the hints are not carried over
+#: to the aggregate channels.
+_CHANNEL_REFERENCE_HINTS = {"error_bar_for"}
+
+
+def _setattr_aggregate_result(owner: Fragment, name: str, channel: ResultChannel,
+                              save_by_default: bool) -> ResultChannel:
+    """Create the result channel in the owning fragment that the values pushed to the
+    given subscan channel are collected in (one array per subscan).
+
+    Numeric channels (including arrays of a fixed shape) are represented as an
+    :class:`.ArrayChannel` with an extra dimension of variable length, preserving the
+    schema information (units, …), except for display hints referring to other
+    channels (see :data:`_CHANNEL_REFERENCE_HINTS`).
+    """
+    if isinstance(channel, ArrayChannel) and None not in channel.shape:
+        dtype = channel.dtype
+        shape = channel.shape
+    elif isinstance(channel, NumericChannel) and channel.NumpyDType is not None:
+        dtype = channel.NumpyDType
+        shape = ()
+    else:
+        return owner.setattr_result(name,
+                                    OpaqueChannel,
+                                    save_by_default=save_by_default)
+    display_hints = {
+        k: v
+        for k, v in channel.display_hints.items() if k not in _CHANNEL_REFERENCE_HINTS
+    }
+    return owner.setattr_result(name,
+                                ArrayChannel,
+                                channel.description,
+                                display_hints,
+                                channel.min,
+                                channel.max,
+                                channel.unit,
+                                channel.scale,
+                                save_by_default,
+                                dtype=dtype,
+                                shape=(None, ) + shape)
@@ -0,0 +1,188 @@
+"""
+Collection of timing statistics for running scans, to be able to tell where the time
+goes (e.g. in the fragment code/hardware, ndscan itself, or the ARTIQ master), and how
+long a scan is going to take.
+"""
+
+from collections import deque
+import numpy as np
+import time
+from typing import Callable, Dict, Union
+
+
+class ScanTelemetry:
+    """Collects the durations of the various steps of executing scan points, and
+    publishes rolling statistics over the most recent samples from time to time.
+
+    Recording samples only amounts to appending them to a (bounded) buffer, so is cheap
+    enough to be done for every point; the statistics are computed when they are
+    published.
+
+    :param publish: Called with the name and value of each statistic to publish, e.g.
+        ``points_per_second``, or ``<category>_p50``/``<category>_p99`` for the median
+        and 99th percentile of the durations recorded for each category (in seconds).
+        Statistics that were published before but are no longer available after
+        :meth:`start` are published as ``None``. If ``None``, statistics are only
+        collected (see :meth:`get_statistics`).
+    """
+
+    #: The number of most recent samples to compute the statistics from, per category.
+    WINDOW_SIZE = 1000
+
+    #: The minimum interval between publishing updated statistics, in seconds.
+    PUBLISH_INTERVAL = 2.0
+
+    def __init__(self, publish: Callable[[str, float], None] = None):
+        self._publish = publish
+        self._durations = {}
+        self._completions = deque(maxlen=self.WINDOW_SIZE)
+        self._last_publish_time = None
+        self._published_names = set()
+
+    def start(self) -> None:
+        """Begin collecting statistics for a new scan, discarding all previously
+        recorded samples."""
+        self._durations = {}
+        self._completions.clear()
+        self._last_publish_time = None
+
+    def record(self, category: str, duration: float) -> None:
+        """Record the duration of a step of the given category (e.g. ``run_once``), in
+        seconds."""
+        samples = self._durations.get(category, None)
+        if samples is None:
+            samples = deque(maxlen=self.WINDOW_SIZE)
+            self._durations[category] = samples
+        samples.append(duration)
+
+    def points_completed(self, num_points: int = 1) -> None:
+        """Record the completion of the given number of points, and publish the
+        statistics if they have not been published recently."""
+        now = time.monotonic()
+        self._completions.append((now, num_points))
+        self.publish(now=now)
+
+    def get_statistics(self) -> Dict[str, float]:
+        """Compute the current statistics, as a dictionary of names to values (see the
+        ``publish`` constructor argument)."""
+        stats = {}
+        if len(self._completions) >= 2:
+            start_time = self._completions[0][0]
+            duration = self._completions[-1][0] - start_time
+            if duration > 0:
+                num_points = sum(n for _, n in self._completions) - \
+                    self._completions[0][1]
+                stats["points_per_second"] = num_points / duration
+        for category, samples in self._durations.items():
+            if samples:
+                p50, p99 = np.percentile(samples, [50, 99])
+                stats[category + "_p50"] = float(p50)
+                stats[category + "_p99"] = float(p99)
+        return stats
+
+    def publish(self, force: bool = False, now: float = None) -> None:
+        """Publish the current statistics, unless they were already published less
+        than :attr:`PUBLISH_INTERVAL` ago and ``force`` is not set."""
+        if self._publish is None:
+            return
+        if now is None:
+            now = time.monotonic()
+        if not force and self._last_publish_time is not None and \
+                now - self._last_publish_time < self.PUBLISH_INTERVAL:
+            return
+        self._last_publish_time = now
+        stats = self.get_statistics()
+        for name in self._published_names - stats.keys():
+            self._publish(name, None)
+        for name, value in stats.items():
+            self._publish(name, value)
+        self._published_names = set(stats.keys())
+
+
+class ScanProgress:
+    """Keeps track of the number of completed points of a scan, and estimates the
+    remaining time from the rate at which points are completed.
+
+    The rate is smoothed exponentially (with a time constant of
+    :attr:`SMOOTHING_TIME`), so the estimate follows changes in the speed of the scan
+    (e.g. from other experiments competing for the hardware) without jumping around
+    for every point.
+
+    :param publish: Called with the name and value of each progress indicator to
+        publish: ``completed`` (the number of points completed, including those from a
+        resumed previous run), ``total`` (the total number of points), ``rate`` (in
+        points per second), and ``eta`` (the estimated remaining time, in seconds).
+        All of them are always published, with ``total``, ``rate`` and ``eta`` being
+        ``None`` while unknown, so no stale values from a previous scan remain. If
+        ``None``, the progress is only tracked.
+    """
+
+    #: The time constant of the exponential smoothing of the point rate, in seconds.
+    SMOOTHING_TIME = 10.0
+
+    #: The minimum interval between publishing updated values, in seconds.
+    PUBLISH_INTERVAL = 1.0
+
+    def __init__(self, publish: Callable[[str, float], None] = None):
+        self._publish = publish
+        self.num_completed = 0
+        self.num_total = None
+        self.rate = None
+        self._last_completion_time = None
+        self._last_publish_time = None
+
+    def start(self, num_total: Union[int, None], num_completed: int = 0) -> None:
+        """Begin tracking a scan with the given total number of points (``None`` if
+        unbounded), of which ``num_completed`` have already been acquired before, and
+        publish the initial state."""
+        self.num_total = num_total
+        self.num_completed = num_completed
+        self.rate = None
+        self._last_completion_time = time.monotonic()
+        self.publish(force=True, now=self._last_completion_time)
+
+    def points_completed(self, num_points: int = 1) -> None:
+        """Record the completion of the given number of points, and publish the
+        progress if it has not been published recently."""
+        now = time.monotonic()
+        self.num_completed += num_points
+        if self._last_completion_time is not None:
+            duration = now - self._last_completion_time
+            if duration > 0:
+                rate = num_points / duration
+                if self.rate is None:
+                    self.rate = rate
+                else:
+                    weight = 1 - np.exp(-duration / self.SMOOTHING_TIME)
+                    self.rate += weight * (rate - self.rate)
+        self._last_completion_time = now
+        self.publish(now=now)
+
+    def get_eta(self) -> Union[float, None]:
+        """Return the estimated remaining time of the scan in seconds, or ``None`` if
+        the total number of points or the rate is not known."""
+        if self.num_total is None:
+            return None
+        num_remaining = max(self.num_total - self.num_completed, 0)
+        if num_remaining == 0:
+            return 0.0
+        if not self.rate:
+            return None
+        return num_remaining / self.rate
+
+    def publish(self, force: bool = False, now: float = None) -> None:
+        """Publish the current progress, unless it was already published less than
+        :attr:`PUBLISH_INTERVAL` ago and ``force`` is not set."""
+        if self._publish is None:
+            return
+        if now is None:
+            now = time.monotonic()
+        if not force and self._last_publish_time is not None and \
+                now - self._last_publish_time < self.PUBLISH_INTERVAL:
+            return
+        self._last_publish_time = now
+        self._publish("completed", self.num_completed)
+        self._publish("total", self.num_total)
+        self._publish("rate", None if self.rate is None else float(self.rate))
+        eta = self.get_eta()
+        self._publish("eta", None if eta is None else float(eta))
@@ -0,0 +1,193 @@
+"""
+Recording of host-side execution traces of fragment trees, to be inspected in the
+Chrome trace viewer (``chrome://tracing``) or `Perfetto <https://ui.perfetto.dev>`_.
+
+Tracing is opt-in (by setting the ``trace`` key of the scan specification to ``True``),
+as every traced call incurs some overhead. The trace is then written next to the HDF5
+results file, as ``<rid>-<experiment>.trace.json``.
+"""
+
+import asyncio
+from contextlib import contextmanager
+import itertools
+import json
+import os
+import threading
+import time
+import types
+from typing import Any, Dict, List
+from .fragment import Fragment
+from .result_channels import ResultSink
+from .utils import is_kernel
+
+#: The fragment methods traced if they are executed on the host.
+DEVICE_METHOD_NAMES = ["device_setup", "device_reset", "run_once"]
+
+
+class Tracer:
+    """Records the start and end times of function calls as events in the Trace Event
+    Format understood by the Chrome trace viewer and Perfetto.
+
+    Calls are recorded as complete (``X``) events on the thread they were made from;
+    coroutines (e.g. of :class:`.AsyncExpFragment`\\ s), which can overlap with each
+    other on the same thread, are recorded as pairs of async (``b``/``e``) events.
+
+    Methods are traced by replacing them with wrappers on the respective instances
+    (see :meth:`instrument_method`), which :meth:`restore` removes again.
+    """
+
+    def __init__(self):
+        self._events = []
+        self._start_time = time.perf_counter()
+        self._pid = os.getpid()
+        self._next_async_id = itertools.count()
+        self._instrumented = []
+
+    def _timestamp(self) -> float:
+        # Trace timestamps are given in microseconds.
+        return (time.perf_counter() - self._start_time) * 1e6
+
+    @contextmanager
+    def span(self, name: str, category: str, args: Dict[str, Any] = {}):
+        """Context manager recording the duration of the enclosed block."""
+        start = self._timestamp()
+        try:
+            yield
+        finally:
+            self._events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start,
+                "dur": self._timestamp() - start,
+                "pid": self._pid,
+                "tid": threading.get_ident(),
+                "args": args
+            })
+
+    def _async_event(self, phase: str, name: str, category: str, event_id: int,
+                     args: Dict[str, Any]) -> None:
+        self._events.append({
+            "name": name,
+            "cat": category,
+            "ph": phase,
+            "id": event_id,
+            "ts": self._timestamp(),
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            "args": args
+        })
+
+    def instrument_method(self,
+                          obj: Any,
+                          method_name: str,
+                          event_name: str,
+                          category: str,
+                          args: Dict[str, Any] = {}) -> None:
+        """Trace all subsequent calls to the given method of ``obj``.
+
+        The wrapper is bound to ``obj`` like a regular method, so copies of ``obj``
+        (e.g. made using :func:`copy.deepcopy`) are traced as well. Methods that are not
+        bound to ``obj`` itself (e.g. because they were already replaced by another
+        object's method) are left alone.
+        """
+        method = getattr(obj, method_name)
+        if not isinstance(method, types.MethodType) or method.__self__ is not obj:
+            return
+        func = method.__func__
+        tracer = self
+
+        if asyncio.iscoroutinefunction(func):
+
+            async def traced(self, *args_, **kwargs):
+                event_id = next(tracer._next_async_id)
+                tracer._async_event("b", event_name, category, event_id, args)
+                try:
+                    return await func(self, *args_, **kwargs)
+                finally:
+                    tracer._async_event("e", event_name, category, event_id, args)
+        else:
+
+            def traced(self, *args_, **kwargs):
+                with tracer.span(event_name, category, args):
+                    return func(self, *args_, **kwargs)
+
+        previous = obj.__dict__.get(method_name, None)
+        self._instrumented.append((obj, method_name, previous))
+        setattr(obj, method_name, types.MethodType(traced, obj))
+
+    def instrument_fragment(self, fragment: Fragment, host_only: bool = False) -> None:
+        """Trace the :meth:`.Fragment.host_setup` calls and result channel pushes of
+        the given fragment and all its subfragments.
+
+        Unless ``host_only`` is given, :meth:`.Fragment.device_setup`,
+        :meth:`.Fragment.device_reset` and :meth:`.ExpFragment.run_once` are traced as
+        well. As the wrappers are host-side functions, this is skipped for fragments
+        that define any of these as kernels (and all their subfragments), whose code is
+        executed on the core device.
+
+        Events are named after the fragment path and method (e.g.
+        ``readout/detect.run_once``).
+        """
+        path = fragment._stringize_path()
+        args = {"path": path, "fqn": fragment.fqn}
+
+        def event_name(method_name):
+            return path + "." + method_name if path else method_name
+
+        self.instrument_method(fragment, "host_setup", event_name("host_setup"),
+                               "host_setup", args)
+
+        if not host_only:
+            names = [n for n in DEVICE_METHOD_NAMES if hasattr(fragment, n)]
+            host_only = any(is_kernel(getattr(fragment, n)) for n in names)
+        if not host_only:
+            for name in names:
+                self.instrument_method(fragment, name, event_name(name), name, args)
+            for channel in fragment._result_channels.values():
+                for method_name in ["push", "push_many"]:
+                    self.instrument_method(channel, method_name,
+                                           channel.path + "." + method_name,
+                                           "result_push", {"path": channel.path})
+
+        for s in fragment._subfragments:
+            self.instrument_fragment(s, host_only)
+
+    def instrument_sink(self, sink: ResultSink, name: str) -> None:
+        """Trace all values pushed to the given sink."""
+        args = {"sink": name}
+        for method_name in ["push", "push_many"]:
+            self.instrument_method(sink, method_name, name + "." + method_name,
+                                   "sink_push", args)
+
+    def restore(self) -> None:
+        """Remove all the wrappers installed by the ``instrument_*()`` methods."""
+        for obj, method_name, previous in reversed(self._instrumented):
+            if previous is None:
+                # The wrapper might already have been removed by other code that
+                # temporarily replaced the method (e.g. setup change tracking).
+                obj.__dict__.pop(method_name, None)
+            else:
+                setattr(obj, method_name, previous)
+        self._instrumented.clear()
+
+    def get_events(self) -> List[Dict[str, Any]]:
+        """Return the events recorded so far, as a list of Trace Event Format
+        dictionaries."""
+        return list(self._events)
+
+    def write(self, path: str, process_name: str = "ndscan") -> None:
+        """Write the trace recorded so far to a JSON file at the given path."""
+        metadata = {
+            "name": "process_name",
+            "ph": "M",
+            "pid": self._pid,
+            "args": {
+                "name": process_name
+            }
+        }
+        with open(path, "w") as f:
+            json.dump({
+                "traceEvents": [metadata] + self.get_events(),
+                "displayTimeUnit": "ms"
+            }, f)
@@ -1,6 +1,12 @@
 from artiq.language import units
+import asyncio
+from itertools import count
+import linecache
 from typing import Any, Callable, Dict, Iterable, List
 
+#: Counter to give each generated function a unique (pseudo-)file name.
+_generated_function_ids = count()
+
 
 def path_matches_spec(path: List[str], spec: str) -> bool:
     # TODO: Think about how we want to match.
@@ -67,3 +73,86 @@ def eval_param_default(value: str, get_dataset: Callable) -> Any:
     env = {name: getattr(units, name) for name in units.__all__}
     env.update({"dataset": get_dataset})
     return eval(value, env)
+
+
+def run_in_new_event_loop(coro) -> Any:
+    """Run the given coroutine to completion in a new :mod:`asyncio` event loop
+    (closed afterwards), and return its result."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def compile_function(source: str, name: str, scope: Dict[str, Any]) -> Callable:
+    """Compile the given source code defining a function of the given name, and return
+    the resulting function object.
+
+    The source code is registered with :mod:`linecache` under a unique pseudo-file
+    name, such that :func:`inspect.getsource` works on the result. This is required
+    for generated ``@kernel`` functions, as the ARTIQ compiler gets the source of
+    kernel functions that way.
+
+    :param source: The source code, containing the (possibly decorated) function
+        definition at the top level.
+    :param name: The name of the function defined in ``source``.
+    :param scope: The global variables the function is to have access to (e.g. the
+        ``kernel`` decorator).
+    """
+    filename = "<ndscan-generated-{}-{}>".format(name, next(_generated_function_ids))
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    namespace = dict(scope)
+    exec(compile(source, filename, "exec"), namespace)
+    return namespace[name]
+
+
+#: Suffix of the dataset holding the offsets for results stored in the ragged layout
+#: (see :class:`RaggedArray`), appended to the key of the dataset holding the values.
+RAGGED_OFFSETS_SUFFIX = ".offsets"
+
+
+class RaggedArray:
+    """Read-only sequence of arrays of varying length, stored as the concatenation of
+    all the elements (``values``) and the index at which each of them starts
+    (``offsets``, with an extra entry for the end of the last one).
+
+    Elements are returned as slices of ``values``, i.e. without copying the data if
+    ``values`` is a NumPy array.
+    """
+
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return max(len(self.offsets) - 1, 0)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Index out of range: {}".format(index))
+        return self.values[self.offsets[index]:self.offsets[index + 1]]
+
+
+def load_point_values(get_dataset: Callable[[str], Any], key: str) -> Any:
+    """Read the values for all the points of a scan from the dataset with the given
+    key, which are stored either as a sequence with one entry per point, or in the
+    ragged layout (for arrays of varying length; see :class:`RaggedArray`).
+
+    :param get_dataset: Returns the value of the dataset with the given key, or
+        ``None`` if it does not exist.
+    :param key: The dataset key.
+    :return: A sequence of the values for each point, or ``None`` if the dataset does
+        not exist.
+    """
+    values = get_dataset(key)
+    if values is None:
+        return None
+    offsets = get_dataset(key + RAGGED_OFFSETS_SUFFIX)
+    if offsets is None:
+        return values
+    return RaggedArray(values, offsets)
@@ -2,10 +2,13 @@
 Common fragments/… for unit tests.
 """
 
+import asyncio
 import numpy
 from artiq.experiment import *
 from ndscan.fragment import *
 from ndscan.default_analysis import Annotation, CustomAnalysis, OnlineFit
+from ndscan.scan_generator import LinearGenerator
+from ndscan.subscan import setattr_subscan
 
 
 class AddOneFragment(ExpFragment):
@@ -30,6 +33,67 @@ class AddOneFragment(ExpFragment):
         return [OnlineFit("lorentzian", {"x": self.value, "y": self.result})]
 
 
+class ShotsFragment(ExpFragment):
+    def build_fragment(self):
+        self.setattr_param("value", FloatParam, "Value to return", 0.0)
+        self.setattr_result("shots", ArrayChannel, dtype=numpy.int64, shape=(3, ))
+
+    def run_once(self):
+        self.shots.push([self.value.get() + i for i in range(3)])
+
+
+class RepeatCountFragment(ExpFragment):
+    def build_fragment(self):
+        self.setattr_param("value", FloatParam, "Value to return", 0.0)
+        self.setattr_result("result", FloatChannel)
+        self.setattr_result("count", IntChannel)
+        self.setattr_result("label", OpaqueChannel)
+
+        self.num_device_setup_calls = 0
+        self.num_runs_since_setup = 0
+
+    def device_setup(self):
+        self.num_device_setup_calls += 1
+        self.num_runs_since_setup = 0
+
+    def run_once(self):
+        self.result.push(self.value.get() + self.num_runs_since_setup)
+        self.count.push(self.num_runs_since_setup)
+        self.label.push("run {}".format(self.num_runs_since_setup))
+        self.num_runs_since_setup += 1
+
+
+class SubscanAddOneFragment(ExpFragment):
+    def build_fragment(self):
+        self.setattr_param("num_points", IntParam, "Number of subscan points", 3)
+        self.setattr_fragment("child", AddOneFragment)
+        setattr_subscan(self, "scan", self.child, [(self.child, "value")])
+
+    def run_once(self):
+        generator = LinearGenerator(0, 1, self.num_points.get(), False)
+        self.scan.run([(self.child.value, generator)], execute_default_analyses=False)
+
+
+class ReentrantAddOneFragment(AddOneFragment):
+    is_reentrant = True
+
+    def build_fragment(self):
+        super().build_fragment()
+        self.setattr_device("core")
+
+
+class AsyncAddOneFragment(AsyncExpFragment):
+    def build_fragment(self):
+        self.setattr_param("value", FloatParam, "Value to return", 0.0)
+        self.setattr_result("result", FloatChannel)
+
+    async def run_once(self):
+        value = self.value.get()
+        # Finish later points first to exercise result reordering.
+        await asyncio.sleep(0.01 * (2 - value))
+        self.result.push(value + 1)
+
+
 class ReboundAddOneFragment(ExpFragment):
     def build_fragment(self):
         self.setattr_fragment("add_one", AddOneFragment)
@@ -45,6 +109,20 @@ class ReboundAddOneFragment(ExpFragment):
         self.add_one.run_once()
 
 
+class TwoAddOnesFragment(ExpFragment):
+    def build_fragment(self):
+        self.setattr_fragment("first", AddOneFragment)
+        self.setattr_fragment("second", AddOneFragment)
+
+    def device_setup(self):
+        self.first.device_setup()
+        self.second.device_setup()
+
+    def run_once(self):
+        self.first.run_once()
+        self.second.run_once()
+
+
 class AddOneCustomAnalysisFragment(AddOneFragment):
     def get_default_analyses(self):
         return [CustomAnalysis({self.value}, self._analyze)]
@@ -57,6 +135,56 @@ class AddOneCustomAnalysisFragment(AddOneFragment):
         ]
 
 
+class KernelAddOneFragment(ExpFragment):
+    def build_fragment(self):
+        self.setattr_device("core")
+        self.setattr_param("value", FloatParam, "Value to return", 0.0)
+        self.setattr_result("result", FloatChannel)
+
+    @kernel
+    def device_setup(self):
+        self.core.break_realtime()
+
+    @kernel
+    def run_once(self):
+        delay(1 * us)
+        self.result.push(self.value.get() + 1)
+
+
+class KernelFailingFragment(ExpFragment):
+    def build_fragment(self):
+        self.setattr_device("core")
+        self.setattr_param("value", FloatParam, "Value to return", 0.0)
+        self.setattr_param("fail_at", FloatParam, "Value to raise an exception at", 5.0)
+        self.setattr_result("result", FloatChannel)
+
+    @kernel
+    def run_once(self):
+        if self.value.get() == self.fail_at.get():
+            raise ValueError("Failing as requested")
+        self.result.push(self.value.get() + 1)
+
+
+class KernelMultiAxisFragment(ExpFragment):
+    def build_fragment(self):
+        self.setattr_device("core")
+        self.setattr_param("a", FloatParam, "Units", 0.0)
+        self.setattr_param("b", IntParam, "Tens", 0)
+        self.setattr_param("c", FloatParam, "Hundreds", 0.0)
+        self.setattr_param("d", FloatParam, "Thousands", 0.0)
+        self.setattr_param("e", FloatParam, "Ten thousands", 0.0)
+        self.setattr_result("result", FloatChannel)
+
+    @kernel
+    def device_setup(self):
+        self.core.break_realtime()
+
+    @kernel
+    def run_once(self):
+        self.result.push(self.a.get() + 10 * self.b.get() + 100 * self.c.get() +
+                         1000 * self.d.get() + 10000 * self.e.get())
+
+
 class TrivialKernelFragment(ExpFragment):
     def build_fragment(self):
         pass
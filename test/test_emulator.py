@@ -0,0 +1,260 @@
+"""
+Tests for the core device emulator, and the kernel scan code paths exercised using it.
+"""
+
+from itertools import product
+import linecache
+import threading
+import time
+from unittest import mock
+from artiq.language import HasEnvironment, kernel, portable, rpc
+from ndscan.emulator import EmulatedCore, EmulatedScheduler
+from ndscan.experiment import make_fragment_scan_exp, run_fragment_once
+from ndscan.kernel_cache import KernelCache
+from ndscan.result_channels import ArraySink
+from ndscan.scan_generator import LinearGenerator, ScanOptions
+from ndscan.scan_runner import ScanAxis, ScanRunner, ScanSpec
+from fixtures import (KernelAddOneFragment, KernelFailingFragment,
+                      KernelMultiAxisFragment)
+from mock_environment import HasEnvironmentCase
+
+ScanKernelAddOneExp = make_fragment_scan_exp(KernelAddOneFragment)
+ScanKernelMultiAxisExp = make_fragment_scan_exp(KernelMultiAxisFragment)
+
+
+class RpcTester(HasEnvironment):
+    def build(self):
+        self.setattr_device("core")
+        self.values = []
+
+    @kernel
+    def run(self):
+        for i in range(3):
+            self.record(self.double(i))
+            self.record_async(self.get_offset())
+
+    @portable
+    def double(self, value):
+        return 2 * value
+
+    def get_offset(self):
+        return 10
+
+    def record(self, value):
+        self.values.append(value)
+
+    @rpc(flags={"async"})
+    def record_async(self, value):
+        self.values.append(value)
+
+
+class EmulatedCoreCase(HasEnvironmentCase):
+    def setUp(self):
+        super().setUp()
+        self.core = EmulatedCore()
+        self.scheduler = EmulatedScheduler()
+        self.device_mgr.virtual_devices["core"] = self.core
+        self.device_mgr.virtual_devices["scheduler"] = self.scheduler
+
+    def test_rpcs(self):
+        tester = self.create(RpcTester)
+        tester.run()
+        self.assertEqual(tester.values, [0, 10, 2, 10, 4, 10])
+        self.assertEqual(self.core.num_kernel_runs, 1)
+        self.assertEqual(self.core.num_rpcs, 6)
+        self.assertEqual(self.core.num_async_rpcs, 3)
+
+    def test_run_once(self):
+        fragment = self.create(KernelAddOneFragment, [])
+        fragment.init_params()
+        self.assertEqual(run_fragment_once(fragment), {fragment.result: 1.0})
+
+    def test_scan_whole(self):
+        self._test_scan({"max_upload_points": 4096})
+
+    def test_scan_chunked(self):
+        self._test_scan({"max_chunk_size": 3})
+
+    def test_scan_batched(self):
+        self._test_scan({"max_upload_points": 4096, "batch_results": True})
+        # The results and point completions of the whole scan are returned in one RPC
+        # each.
+        self.assertEqual(self.core.num_async_rpcs, 2)
+
+    def test_scan_batched_error(self):
+        fragment = self.create(KernelFailingFragment, [])
+        fragment.init_params()
+        param, store = fragment.override_param("value")
+        axis_sink = ArraySink()
+        result_sink = ArraySink()
+        fragment.result.set_sink(result_sink)
+        spec = ScanSpec([ScanAxis(param.describe(), "*", store)],
+                        [LinearGenerator(0, 9, 10, False)],
+                        ScanOptions(max_upload_points=4096, batch_results=True))
+
+        # With a tiny buffer, results are transferred before the exception, but must
+        # not reach the sinks, as the points are never reported as completed.
+        runner = self.create(ScanRunner)
+        with mock.patch.object(ScanRunner, "RESULT_BUFFER_SIZE", 2):
+            with self.assertRaises(ValueError):
+                runner.run(fragment, spec, [axis_sink])
+        self.assertGreater(self.core.num_async_rpcs, 0)
+        self.assertEqual(axis_sink.get_all(), [])
+        self.assertEqual(result_sink.get_all(), [])
+
+    def test_scan_chunked_batched(self):
+        self._test_scan({"max_chunk_size": 3, "batch_results": True})
+
+    def test_scan_accumulated(self):
+        self._test_scan({"num_repeats": 3, "accumulate_repeats": True})
+        self.assertEqual(self.dataset_db.get("ndscan.points.channel_result_err"),
+                         [0.0] * 5)
+        # Only the aggregates and the point completion are sent to the host for each
+        # point, independently of the number of repeats.
+        self.assertEqual(self.core.num_async_rpcs, 2 * 5)
+
+    def test_generated_code_reused(self):
+        fragment = self.create(KernelAddOneFragment, [])
+        fragment.init_params()
+        param, store = fragment.override_param("value")
+        fragment.result.set_sink(ArraySink())
+        runner = self.create(ScanRunner)
+
+        def run_scan():
+            spec = ScanSpec([ScanAxis(param.describe(), "*", store)],
+                            [LinearGenerator(0, 4, 5, False)],
+                            ScanOptions(num_repeats=2, accumulate_repeats=True))
+            runner.run(fragment, spec, [ArraySink()])
+
+        def num_generated_sources():
+            return sum(1 for name in linecache.cache if name.startswith("<ndscan-"))
+
+        run_scan()
+        num_sources = num_generated_sources()
+        run_scan()
+        self.assertEqual(num_generated_sources(), num_sources)
+        self.assertEqual(self.core.num_kernel_runs, 2)
+
+    def test_scan_pause(self):
+        self.scheduler.pause_after = 2
+        self._test_scan({"max_upload_points": 4096, "pause_check_interval": 2},
+                        num_points=10)
+        self.assertEqual(self.core.num_kernel_runs, 3)
+        # Without a kernel cache, the kernel is compiled again after every pause.
+        self.assertEqual(self.core.num_compilations, 3)
+        self.assertEqual(self.scheduler.num_pauses, 2)
+
+    def test_scan_pause_kernel_cache(self):
+        self.scheduler.pause_after = 2
+        fragment = self.create(KernelAddOneFragment, [])
+        fragment.init_params()
+        param, store = fragment.override_param("value")
+        axis_sink = ArraySink()
+        result_sink = ArraySink()
+        fragment.result.set_sink(result_sink)
+        spec = ScanSpec([ScanAxis(param.describe(), "*", store)],
+                        [LinearGenerator(0, 9, 10, False)],
+                        ScanOptions(max_upload_points=4096, pause_check_interval=2))
+
+        cache = KernelCache()
+        runner = self.create(ScanRunner, kernel_cache=cache)
+        runner.run(fragment, spec, [axis_sink])
+        self.assertEqual(axis_sink.get_all(), list(range(10)))
+        self.assertEqual(result_sink.get_all(), list(range(1, 11)))
+        self.assertEqual(self.core.num_kernel_runs, 3)
+        self.assertEqual(self.core.num_compilations, 1)
+        self.assertEqual((cache.num_misses, cache.num_hits), (1, 2))
+
+    def test_pause_latency(self):
+        # Each point takes at least 2 ms due to the async RPCs for the result and the
+        # point completion, so the scan runs for at least a second.
+        self.core.async_rpc_latency = 1e-3
+        target_duration = 0.05
+
+        request_time = None
+
+        def request_pause():
+            nonlocal request_time
+            request_time = time.monotonic()
+            self.scheduler.request_pause()
+
+        pause_times = []
+        original_pause = self.scheduler.pause
+
+        def pause():
+            pause_times.append(time.monotonic())
+            original_pause()
+
+        self.scheduler.pause = pause
+        timer = threading.Timer(0.2, request_pause)
+        timer.start()
+        try:
+            self._test_scan({"chunk_target_duration": target_duration},
+                            num_points=500)
+        finally:
+            timer.cancel()
+
+        # With the default options, the pause request is honoured after about one
+        # chunk (allowing for some scheduling jitter).
+        self.assertEqual(len(pause_times), 1)
+        self.assertLess(pause_times[0] - request_time, 3 * target_duration)
+
+    def _test_scan(self, scan_options, num_points=5):
+        exp = self.create(ScanKernelAddOneExp)
+        exp._params["scan"].update(scan_options)
+        exp._params["scan"]["axes"].append({
+            "type": "linear",
+            "range": {
+                "start": 0,
+                "stop": num_points - 1,
+                "num_points": num_points,
+                "randomise_order": False
+            },
+            "fqn": "fixtures.KernelAddOneFragment.value",
+            "path": "*"
+        })
+        exp.prepare()
+        exp.run()
+
+        def d(key):
+            return self.dataset_db.get("ndscan." + key)
+
+        self.assertEqual(d("completed"), True)
+        self.assertEqual(d("points.axis_0"), list(range(num_points)))
+        self.assertEqual(d("points.channel_result"), list(range(1, num_points + 1)))
+
+    def test_scan_3_axes(self):
+        self._test_multi_axis_scan(3, {"max_upload_points": 4096})
+
+    def test_scan_4_axes(self):
+        self._test_multi_axis_scan(4, {"max_upload_points": 4096})
+
+    def test_scan_5_axes(self):
+        self._test_multi_axis_scan(5, {"max_chunk_size": 7})
+
+    def _test_multi_axis_scan(self, num_axes, scan_options={}):
+        exp = self.create(ScanKernelMultiAxisExp)
+        exp._params["scan"].update(scan_options)
+        for name in "abcde"[:num_axes]:
+            exp._params["scan"]["axes"].append({
+                "type": "list",
+                "range": {
+                    "values": [1, 2],
+                    "randomise_order": False
+                },
+                "fqn": "fixtures.KernelMultiAxisFragment." + name,
+                "path": "*"
+            })
+        exp.prepare()
+        exp.run()
+
+        def d(key):
+            return self.dataset_db.get("ndscan." + key)
+
+        self.assertEqual(d("completed"), True)
+        axes = [d("points.axis_{}".format(i)) for i in range(num_axes)]
+        # All combinations of coordinates, with the first axis varying fastest.
+        expected = list(product(*([[1, 2]] * num_axes)))
+        self.assertEqual(list(zip(*axes)), [c[::-1] for c in expected])
+        self.assertEqual(d("points.channel_result"),
+                         [sum(x * 10**i for i, x in enumerate(c)) for c in zip(*axes)])
@@ -2,15 +2,31 @@
 Tests for ndscan.experiment top-level runners.
 """
 
+import h5py
 import json
-from artiq.language import HasEnvironment
+import numpy as np
+import os
+import tempfile
+from unittest import mock
+from artiq.language import HasEnvironment, TerminationRequested
 from ndscan.experiment import (make_fragment_scan_exp, run_fragment_once,
-                               create_and_run_fragment_once)
-from fixtures import AddOneFragment, ReboundAddOneFragment, TrivialKernelFragment
+                               create_and_run_fragment_once, ScanSpecError)
+from ndscan.result_channels import ScalarDatasetSink
+from ndscan.scan_runner import ScanRunner, _HostWorker
+from fixtures import (AddOneFragment, AsyncAddOneFragment, ReboundAddOneFragment,
+                      ReentrantAddOneFragment, RepeatCountFragment, ShotsFragment,
+                      SubscanAddOneFragment, TrivialKernelFragment,
+                      TwoAddOnesFragment)
 from mock_environment import HasEnvironmentCase
 
 ScanAddOneExp = make_fragment_scan_exp(AddOneFragment)
 ScanReboundAddOneExp = make_fragment_scan_exp(ReboundAddOneFragment)
+ScanTwoAddOnesExp = make_fragment_scan_exp(TwoAddOnesFragment)
+ScanReentrantAddOneExp = make_fragment_scan_exp(ReentrantAddOneFragment)
+ScanAsyncAddOneExp = make_fragment_scan_exp(AsyncAddOneFragment)
+ScanShotsExp = make_fragment_scan_exp(ShotsFragment)
+ScanSubscanAddOneExp = make_fragment_scan_exp(SubscanAddOneFragment)
+ScanRepeatCountExp = make_fragment_scan_exp(RepeatCountFragment)
 
 
 class FragmentScanExpCase(HasEnvironmentCase):
@@ -98,6 +114,230 @@ class FragmentScanExpCase(HasEnvironmentCase):
     def test_run_rebound_1d_scan(self):
         self._test_run_1d(ScanReboundAddOneExp, "fixtures.ReboundAddOneFragment")
 
+    def test_run_async_1d_scan(self):
+        exp = self.create(ScanAsyncAddOneExp)
+        exp._params["scan"]["axes"].append({
+            "type": "linear",
+            "range": {
+                "start": 0,
+                "stop": 2,
+                "num_points": 3,
+                "randomise_order": False
+            },
+            "fqn": "fixtures.AsyncAddOneFragment.value",
+            "path": "*"
+        })
+        exp.prepare()
+        exp.run()
+
+        def d(key):
+            return self.dataset_db.get("ndscan." + key)
+
+        self.assertEqual(d("completed"), True)
+        self.assertEqual(d("points.axis_0"), [0, 1, 2])
+        self.assertEqual(d("points.channel_result"), [1, 2, 3])
+
+    def test_run_array_scan(self):
+        exp = self.create(ScanShotsExp)
+        exp._params["scan"]["axes"].append({
+            "type": "linear",
+            "range": {
+                "start": 0,
+                "stop": 20,
+                "num_points": 3,
+                "randomise_order": False
+            },
+            "fqn": "fixtures.ShotsFragment.value",
+            "path": "*"
+        })
+        exp.prepare()
+        exp.run()
+
+        channels = json.loads(self.dataset_db.get("ndscan.channels"))
+        self.assertEqual(channels["shots"]["type"], "array")
+        self.assertEqual(channels["shots"]["dtype"], "int64")
+        self.assertEqual(channels["shots"]["shape"], [3])
+
+        shots = np.array(self.dataset_db.get("ndscan.points.channel_shots"))
+        self.assertEqual(shots.dtype, np.int64)
+        self.assertEqual(shots.tolist(), [[0, 1, 2], [10, 11, 12], [20, 21, 22]])
+
+    def test_run_subscan_dense(self):
+        self._run_subscan(3, 3)
+
+        def d(key):
+            return self.dataset_db.get("ndscan.points." + key)
+
+        self.assertNotIn("ndscan.points.channel_scan_axis_0.offsets",
+                         self.dataset_db.data)
+        self.assertNotIn("ndscan.points.channel_scan_channel_result.offsets",
+                         self.dataset_db.data)
+        axis = np.array(d("channel_scan_axis_0"))
+        self.assertEqual(axis.shape, (2, 3))
+        result = np.array(d("channel_scan_channel_result"))
+        self.assertEqual(result.dtype, np.float64)
+        self.assertEqual(result.tolist(), [[1.0, 1.5, 2.0], [1.0, 1.5, 2.0]])
+
+    def test_run_subscan_ragged(self):
+        self._run_subscan(2, 3)
+
+        def d(key):
+            return self.dataset_db.get("ndscan.points." + key)
+
+        self.assertEqual(d("channel_scan_axis_0"), [0.0, 1.0, 0.0, 0.5, 1.0])
+        self.assertEqual(d("channel_scan_axis_0.offsets"), [0, 2, 5])
+        self.assertEqual(d("channel_scan_channel_result"), [1.0, 2.0, 1.0, 1.5, 2.0])
+        self.assertEqual(d("channel_scan_channel_result.offsets"), [0, 2, 5])
+
+    def _run_subscan(self, first_num_points, last_num_points):
+        exp = self.create(ScanSubscanAddOneExp)
+        exp._params["scan"]["axes"].append({
+            "type": "linear",
+            "range": {
+                "start": first_num_points,
+                "stop": last_num_points,
+                "num_points": 2,
+                "randomise_order": False
+            },
+            "fqn": "fixtures.SubscanAddOneFragment.num_points",
+            "path": "*"
+        })
+        exp.prepare()
+        exp.run()
+
+    def test_run_parallel_scan(self):
+        exp = self.create(ScanReentrantAddOneExp)
+        exp._params["scan"]["num_workers"] = 3
+        exp._params["scan"]["axes"].append({
+            "type": "linear",
+            "range": {
+                "start": 0,
+                "stop": 99,
+                "num_points": 100,
+                "randomise_order": False
+            },
+            "fqn": "fixtures.ReentrantAddOneFragment.value",
+            "path": "*"
+        })
+        exp.prepare()
+        exp.run()
+
+        def d(key):
+            return self.dataset_db.get("ndscan." + key)
+
+        self.assertEqual(d("completed"), True)
+        self.assertEqual(d("points.axis_0"), list(range(100)))
+        self.assertEqual(d("points.channel_result"), list(range(1, 101)))
+
+        # Points were run on copies of the fragment.
+        self.assertEqual(exp.fragment.num_device_setup_calls, 0)
+
+    def test_parallel_scan_pause(self):
+        exp = self.create(ScanReentrantAddOneExp)
+        exp._params["scan"]["num_workers"] = 3
+        exp._params["scan"]["axes"].append({
+            "type": "linear",
+            "range": {
+                "start": 0,
+                "stop": 99,
+                "num_points": 100,
+                "randomise_order": False
+            },
+            "fqn": "fixtures.ReentrantAddOneFragment.value",
+            "path": "*"
+        })
+        exp.prepare()
+
+        num_checks = 0
+
+        def check_pause():
+            nonlocal num_checks
+            num_checks += 1
+            return num_checks == 5
+
+        num_points_at_pause = []
+        self.scheduler.check_pause = check_pause
+        self.scheduler.pause = lambda: num_points_at_pause.append(
+            len(self.dataset_db.get("ndscan.points.axis_0")))
+        exp.run()
+
+        # Pause requests are checked for after every point, and only the points
+        # already running (at most one per worker) are completed before pausing.
+        self.assertEqual(num_checks, 100)
+        self.assertEqual(num_points_at_pause, [7])
+        self.assertEqual(self.dataset_db.get("ndscan.points.axis_0"), list(range(100)))
+
+    def test_parallel_workers_share_devices(self):
+        fragment = self.create(ReentrantAddOneFragment, [])
+        fragment.init_params()
+        worker = _HostWorker(fragment, [])
+        self.assertIsNot(worker.fragment, fragment)
+        self.assertIs(worker.fragment.core, fragment.core)
+
+    def test_skip_unchanged_setup(self):
+        exp = self.create(ScanTwoAddOnesExp)
+        exp._params["scan"]["skip_unchanged_setup"] = True
+        exp._params["scan"]["axes"].append({
+            "type": "linear",
+            "range": {
+                "start": 0,
+                "stop": 2,
+                "num_points": 3,
+                "randomise_order": False
+            },
+            "fqn": "fixtures.AddOneFragment.value",
+            "path": "first"
+        })
+        exp.prepare()
+        exp.run()
+
+        self.assertEqual(exp.fragment.first.num_device_setup_calls, 3)
+        self.assertEqual(exp.fragment.second.num_device_setup_calls, 1)
+        self.assertEqual(self.dataset_db.get("ndscan.points.channel_first_result"),
+                         [1, 2, 3])
+
+        # Setup methods are restored after the scan.
+        self.assertNotIn("device_setup", exp.fragment.second.__dict__)
+
+    def test_accumulate_repeats(self):
+        exp = self.create(ScanRepeatCountExp)
+        exp._params["scan"]["num_repeats"] = 4
+        exp._params["scan"]["accumulate_repeats"] = True
+        exp._params["scan"]["axes"].append({
+            "type": "linear",
+            "range": {
+                "start": 0,
+                "stop": 2,
+                "num_points": 3,
+                "randomise_order": False
+            },
+            "fqn": "fixtures.RepeatCountFragment.value",
+            "path": "*"
+        })
+        exp.prepare()
+        exp.run()
+
+        def d(key):
+            return self.dataset_db.get("ndscan." + key)
+
+        # Each point is set up once, and run four times in a row.
+        self.assertEqual(exp.fragment.num_device_setup_calls, 3)
+        self.assertEqual(d("points.axis_0"), [0, 1, 2])
+        self.assertEqual(d("points.channel_result"), [1.5, 2.5, 3.5])
+        sem = np.sqrt(np.var([0, 1, 2, 3], ddof=1) / 4)
+        np.testing.assert_allclose(d("points.channel_result_err"), [sem] * 3)
+        self.assertEqual(d("points.channel_label"), ["run 3"] * 3)
+        self.assertNotIn("ndscan.points.channel_label_err", self.dataset_db.data)
+
+        # The mean of integer channels is not an integer in general.
+        self.assertEqual(d("points.channel_count"), [1.5] * 3)
+
+        channels = json.loads(d("channels"))
+        self.assertEqual(channels["result_err"]["display_hints"],
+                         {"error_bar_for": "result"})
+        self.assertEqual(channels["count"]["type"], "float")
+        self.assertEqual(channels["result"]["type"], "float")
+
     def _test_run_1d(self, klass, fragment_fqn):
         exp = self.create(klass)
         fqn = fragment_fqn + ".value"
@@ -136,17 +376,251 @@ class FragmentScanExpCase(HasEnvironmentCase):
                 "path": "*"
             }])
         self.assertEqual(d("completed"), True)
+        self.assertEqual(d("progress.completed"), 3)
+        self.assertEqual(d("progress.total"), 3)
+        self.assertEqual(d("progress.eta"), 0.0)
         self.assertEqual(d("points.axis_0"), [0, 1, 2])
         self.assertEqual(d("points.channel_result"), [1, 2, 3])
         self.assertEqual(d("fragment_fqn"), fragment_fqn)
         self.assertEqual(d("rid"), 0)
 
+    def test_coalesced_results(self):
+        # The DatasetManager publishes broadcast modifications through the notifier
+        # (bound to the dataset DB's update() when it was constructed).
+        mods = []
+        publish = self.dataset_mgr.broadcast.publish
+
+        def record_publish(mod):
+            mods.append(mod)
+            publish(mod)
+
+        self.dataset_mgr.broadcast.publish = record_publish
+
+        exp = self.create(ScanAddOneExp)
+        exp._params["scan"]["result_flush_interval"] = 60.0
+        exp._params["scan"]["axes"].append({
+            "type": "linear",
+            "range": {
+                "start": 0,
+                "stop": 99,
+                "num_points": 100,
+                "randomise_order": False
+            },
+            "fqn": "fixtures.AddOneFragment.value",
+            "path": "*"
+        })
+        exp.prepare()
+        exp.run()
+
+        def d(key):
+            return self.dataset_db.get("ndscan." + key)
+
+        self.assertEqual(d("completed"), True)
+        self.assertEqual(d("points.axis_0"), list(range(100)))
+        self.assertEqual(d("points.channel_result"), list(range(1, 101)))
+
+        # All points were written in one go at the end of the scan.
+        keys = [m["path"][0] if m["path"] else m["key"] for m in mods]
+        self.assertEqual(
+            sorted(k for k in keys if k.startswith("ndscan.points.")),
+            ["ndscan.points.axis_0", "ndscan.points.channel_result"])
+
+    def test_run_adaptive_scan(self):
+        exp = self.create(ScanAddOneExp)
+        exp._params["scan"]["axes"].append({
+            "type": "adaptive",
+            "range": {
+                "lower": 0,
+                "upper": 1,
+                "num_points": 12,
+                "channel": "result"
+            },
+            "fqn": "fixtures.AddOneFragment.value",
+            "path": "*"
+        })
+        exp.prepare()
+        exp.run()
+
+        axis = self.dataset_db.get("ndscan.points.axis_0")
+        self.assertEqual(len(axis), 12)
+        self.assertEqual(len(set(axis)), 12)
+        self.assertEqual(self.dataset_db.get("ndscan.points.channel_result"),
+                         [x + 1 for x in axis])
+
+    def test_adaptive_scan_unknown_channel(self):
+        exp = self.create(ScanAddOneExp)
+        exp._params["scan"]["axes"].append({
+            "type": "adaptive",
+            "range": {
+                "lower": 0,
+                "upper": 1,
+                "num_points": 12,
+                "channel": "nonexistent"
+            },
+            "fqn": "fixtures.AddOneFragment.value",
+            "path": "*"
+        })
+        with self.assertRaises(ScanSpecError):
+            exp.prepare()
+
+    def test_resume_scan(self):
+        def make_exp():
+            exp = self.create(ScanAddOneExp)
+            exp._params["scan"]["axes"].append({
+                "type": "linear",
+                "range": {
+                    "start": 0,
+                    "stop": 4,
+                    "num_points": 5,
+                    "randomise_order": True
+                },
+                "fqn": "fixtures.AddOneFragment.value",
+                "path": "*"
+            })
+            return exp
+
+        def d(key):
+            return self.dataset_db.get("ndscan." + key)
+
+        num_pauses = 0
+
+        def interrupting_pause():
+            nonlocal num_pauses
+            num_pauses += 1
+            if num_pauses == 2:
+                raise TerminationRequested
+
+        exp = make_exp()
+        exp.prepare()
+        self.scheduler.pause = interrupting_pause
+        exp.run()
+        checkpoint = json.loads(d("checkpoint"))
+        self.assertEqual(checkpoint["num_completed"], 2)
+        first_points = d("points.axis_0")[:2]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "000000000-AddOneFragment.h5")
+            with h5py.File(path, "w") as f:
+                self.dataset_mgr.write_hdf5(f)
+
+            self.scheduler.pause = lambda: None
+            exp = make_exp()
+            exp._params["scan"]["resume_from"] = path
+            exp.prepare()
+            exp.run()
+
+        axis = d("points.axis_0")
+        self.assertEqual(axis[:2], first_points)
+        self.assertEqual(sorted(axis), [0, 1, 2, 3, 4])
+        self.assertEqual(d("points.channel_result"), [x + 1 for x in axis])
+        self.assertEqual(d("seed"), checkpoint["seed"])
+        self.assertEqual(json.loads(d("checkpoint"))["num_completed"], 5)
+
+    def test_checkpoint_every_point(self):
+        exp = self.create(ScanAddOneExp)
+        exp._params["scan"]["axes"].append({
+            "type": "linear",
+            "range": {
+                "start": 0,
+                "stop": 4,
+                "num_points": 5,
+                "randomise_order": False
+            },
+            "fqn": "fixtures.AddOneFragment.value",
+            "path": "*"
+        })
+        exp.prepare()
+
+        # Record the last checkpoint as each point is finished.
+        num_completed = []
+        self.scheduler.pause = lambda: num_completed.append(
+            json.loads(self.dataset_db.get("ndscan.checkpoint"))["num_completed"])
+        with mock.patch.object(ScanRunner, "CHECKPOINT_INTERVAL", 0.0):
+            exp.run()
+        self.assertEqual(num_completed, [0, 1, 2, 3, 4])
+
+    def test_checkpoint_every_point_async(self):
+        exp = self.create(ScanAsyncAddOneExp)
+        exp._params["scan"]["axes"].append({
+            "type": "linear",
+            "range": {
+                "start": 0,
+                "stop": 4,
+                "num_points": 5,
+                "randomise_order": False
+            },
+            "fqn": "fixtures.AsyncAddOneFragment.value",
+            "path": "*"
+        })
+        exp.prepare()
+
+        # Record the checkpoints pushed while the scan is running; with several points
+        # in flight, they should still advance after every point.
+        num_completed = []
+        push = ScalarDatasetSink.push
+
+        def record_push(sink, value):
+            if sink.key == "ndscan.checkpoint":
+                num_completed.append(json.loads(value)["num_completed"])
+            push(sink, value)
+
+        with mock.patch.object(ScanRunner, "CHECKPOINT_INTERVAL", 0.0):
+            with mock.patch.object(ScalarDatasetSink, "push", record_push):
+                exp.run()
+        self.assertEqual(num_completed, [1, 2, 3, 4, 5, 5])
+        self.assertEqual(self.dataset_db.get("ndscan.points.channel_result"),
+                         [1.0, 2.0, 3.0, 4.0, 5.0])
+
+    def test_trace_scan(self):
+        exp = self.create(ScanTwoAddOnesExp)
+        exp._params["scan"]["trace"] = True
+        exp._params["scan"]["axes"].append({
+            "type": "linear",
+            "range": {
+                "start": 0,
+                "stop": 2,
+                "num_points": 3,
+                "randomise_order": False
+            },
+            "fqn": "fixtures.AddOneFragment.value",
+            "path": "first"
+        })
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.chdir(tmp_dir)
+            try:
+                exp.prepare()
+                exp.run()
+                exp.analyze()
+                with open("000000000-TwoAddOnesFragment.trace.json") as f:
+                    trace = json.load(f)
+            finally:
+                os.chdir(cwd)
+
+        names = [e["name"] for e in trace["traceEvents"] if e["ph"] == "X"]
+        for name in [
+                "run_once", "first.run_once", "second.device_setup",
+                "first/result.push", "ndscan.points.channel_first_result.push",
+                "ndscan.points.axis_0.push"
+        ]:
+            self.assertEqual(names.count(name), 3)
+        self.assertEqual(names.count("host_setup"), 1)
+
+        # Tracing wrappers are removed again after the run.
+        self.assertNotIn("run_once", vars(exp.fragment))
+        self.assertNotIn("push", vars(exp.fragment.first.result))
+
 
 class RunOnceCase(HasEnvironmentCase):
     def test_run_once_host(self):
         fragment = self.create(AddOneFragment, [])
         self.assertEqual(run_fragment_once(fragment), {fragment.result: 1.0})
 
+    def test_run_once_async(self):
+        fragment = self.create(AsyncAddOneFragment, [])
+        self.assertEqual(run_fragment_once(fragment), {fragment.result: 1.0})
+
     def test_run_once_kernel(self):
         fragment = self.create(TrivialKernelFragment, [])
         run_fragment_once(fragment)
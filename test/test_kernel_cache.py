@@ -0,0 +1,63 @@
+"""
+Tests for compiled kernel caching.
+"""
+
+from types import SimpleNamespace
+import unittest
+from ndscan.kernel_cache import KernelCache
+
+
+class _FakeComm:
+    def __init__(self):
+        self.loaded = []
+
+    def check_system_info(self):
+        pass
+
+    def load(self, library):
+        self.loaded.append(library)
+
+    def run(self):
+        pass
+
+    def serve(self, embedding_map, symbolizer, demangler):
+        pass
+
+
+class _FakeCore:
+    def __init__(self):
+        self.comm = _FakeComm()
+        self.first_run = True
+        self.num_compiles = 0
+
+    def compile(self, function, args, kwargs):
+        self.num_compiles += 1
+        return None, "library_{}".format(self.num_compiles), None, None
+
+
+class _Runner:
+    def __init__(self, core):
+        self.core = core
+
+    def run(self):
+        pass
+
+    run.artiq_embedded = SimpleNamespace(core_name="core")
+
+
+class KernelCacheCase(unittest.TestCase):
+    def test_reuse(self):
+        core = _FakeCore()
+        runner = _Runner(core)
+        cache = KernelCache()
+        cache.run("a", runner.run)
+        cache.run("a", runner.run)
+        cache.run("b", runner.run)
+        self.assertEqual(core.num_compiles, 2)
+        self.assertEqual(core.comm.loaded, ["library_1", "library_1", "library_2"])
+        self.assertEqual((cache.num_hits, cache.num_misses), (1, 2))
+
+        cache.clear()
+        cache.run("a", runner.run)
+        self.assertEqual(core.num_compiles, 3)
+        self.assertEqual((cache.num_hits, cache.num_misses), (1, 3))
@@ -0,0 +1,187 @@
+"""
+Tests for result channels and sinks.
+"""
+
+import numpy as np
+import unittest
+from ndscan.result_channels import (AppendingDatasetSink, ArrayChannel,
+                                    ArrayDatasetSink, ArraySink, DatasetFlushGroup,
+                                    FloatChannel, IntChannel, NumpyArraySink,
+                                    OpaqueChannel, make_array_sink)
+from mock_environment import HasEnvironmentCase
+
+
+class NumpyArraySinkCase(unittest.TestCase):
+    def test_push(self):
+        sink = NumpyArraySink(np.float64, capacity=2)
+        for i in range(5):
+            sink.push(i)
+        sink.push_many([5, 6])
+        sink.push_many([])
+        self.assertEqual(sink.get_all().dtype, np.float64)
+        self.assertEqual(sink.get_all().tolist(), [0, 1, 2, 3, 4, 5, 6])
+
+    def test_clear_keeps_buffer(self):
+        sink = NumpyArraySink(np.int64)
+        sink.reserve(100)
+        sink.push_many(range(50))
+        first = sink.get_all()
+
+        sink.clear()
+        self.assertEqual(len(sink.get_all()), 0)
+        sink.push_many(range(100))
+        self.assertEqual(sink.get_all().tolist(), list(range(100)))
+        self.assertTrue(np.shares_memory(sink.get_all(), first))
+
+    def test_push_arrays(self):
+        sink = NumpyArraySink(np.int64, shape=(2, ), capacity=1)
+        sink.push([1, 2])
+        sink.push_many([[3, 4], [5, 6]])
+        self.assertEqual(sink.get_all().shape, (3, 2))
+        self.assertEqual(sink.get_all().tolist(), [[1, 2], [3, 4], [5, 6]])
+
+    def test_make_array_sink(self):
+        float_sink = make_array_sink(FloatChannel("a"))
+        self.assertIsInstance(float_sink, NumpyArraySink)
+        self.assertEqual(float_sink.dtype, np.float64)
+
+        int_sink = make_array_sink(IntChannel("b"))
+        self.assertIsInstance(int_sink, NumpyArraySink)
+        self.assertEqual(int_sink.dtype, np.int64)
+
+        opaque_sink = make_array_sink(OpaqueChannel("c"))
+        self.assertIs(type(opaque_sink), ArraySink)
+
+        array_sink = make_array_sink(ArrayChannel("d", dtype=np.int32, shape=(2, 3)))
+        self.assertIsInstance(array_sink, NumpyArraySink)
+        self.assertEqual(array_sink.dtype, np.int32)
+        self.assertEqual(array_sink.shape, (2, 3))
+
+        ragged_sink = make_array_sink(ArrayChannel("e"))
+        self.assertIs(type(ragged_sink), ArraySink)
+
+
+class ArrayDatasetSinkCase(HasEnvironmentCase):
+    def test_dense(self):
+        sink = self.create(ArrayDatasetSink, "foo")
+        sink.push(np.array([1.0, 2.0]))
+        sink.push_many([np.array([3.0, 4.0]), np.array([5.0, 6.0])])
+        self.assertNotIn("foo.offsets", self.dataset_db.data)
+        self.assertEqual(
+            np.array(self.dataset_db.get("foo")).tolist(),
+            [[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]])
+
+    def test_ragged(self):
+        group = DatasetFlushGroup()
+        sink = self.create(ArrayDatasetSink, "foo", flush_group=group)
+        sink.push([1, 2])
+        sink.push([3, 4])
+        group.flush()
+        sink.push([5])
+        self.assertEqual([list(v) for v in sink.get_all()], [[1, 2], [3, 4], [5]])
+        group.flush()
+        sink.push_many([[], [6, 7, 8]])
+        group.flush()
+
+        self.assertEqual(self.dataset_db.get("foo"), [1, 2, 3, 4, 5, 6, 7, 8])
+        self.assertEqual(self.dataset_db.get("foo.offsets"), [0, 2, 4, 5, 5, 8])
+        self.assertEqual([list(v) for v in sink.get_all()],
+                         [[1, 2], [3, 4], [5], [], [6, 7, 8]])
+
+    def test_ragged_switch_order(self):
+        sink = self.create(ArrayDatasetSink, "foo")
+        sink.push([1, 2])
+
+        # Record the dataset contents after every modification (published through
+        # the notifier the DatasetManager bound to the dataset DB on construction).
+        snapshots = []
+        publish = self.dataset_mgr.broadcast.publish
+
+        def record_publish(mod):
+            publish(mod)
+            snapshots.append({k: v[1] for k, v in self.dataset_db.data.items()})
+
+        self.dataset_mgr.broadcast.publish = record_publish
+        sink.push([3])
+        sink.push([4, 5])
+        self.assertGreater(len(snapshots), 0)
+
+        # Once the values are stored in the ragged layout, the offsets must already
+        # be there, and never refer to values not written yet.
+        for snapshot in snapshots:
+            if snapshot["foo"] != [[1, 2]]:
+                self.assertLessEqual(snapshot["foo.offsets"][-1], len(snapshot["foo"]))
+        self.assertEqual(self.dataset_db.get("foo"), [1, 2, 3, 4, 5])
+        self.assertEqual(self.dataset_db.get("foo.offsets"), [0, 2, 3, 5])
+
+
+class ResultChannelCase(unittest.TestCase):
+    def test_push_many(self):
+        channel = IntChannel("a")
+        sink = ArraySink()
+        channel.set_sink(sink)
+        channel.push_many([1.0, 2.0])
+        self.assertEqual(sink.get_all(), [1, 2])
+        self.assertIsInstance(sink.get_all()[0], int)
+
+    def test_array_channel(self):
+        channel = ArrayChannel("a", unit="ms", dtype=np.int32, shape=(None, 2))
+        self.assertEqual(channel.describe(), {
+            "path": "a",
+            "description": "",
+            "type": "array",
+            "dtype": "int32",
+            "shape": [None, 2],
+            "scale": 1e-3,
+            "unit": "ms"
+        })
+
+        sink = ArraySink()
+        channel.set_sink(sink)
+        values = [[1, 2], [3, 4], [5, 6]]
+        channel.push(values)
+        values[0][0] = 0
+        self.assertEqual(sink.get_all()[0].tolist(), [[1, 2], [3, 4], [5, 6]])
+        self.assertEqual(sink.get_all()[0].dtype, np.int32)
+
+        with self.assertRaises(ValueError):
+            channel.push([1, 2])
+        with self.assertRaises(ValueError):
+            channel.push([[1, 2, 3]])
+
+
+class AppendingDatasetSinkCase(HasEnvironmentCase):
+    def test_push(self):
+        sink = self.create(AppendingDatasetSink, "foo")
+        self.assertEqual(sink.get_all(), [])
+        sink.push(1)
+        sink.push(2)
+        sink.push_many([3, 4])
+        self.assertEqual(self.dataset_db.get("foo"), [1, 2, 3, 4])
+        self.assertEqual(sink.get_all(), [1, 2, 3, 4])
+
+    def test_flush_group(self):
+        group = DatasetFlushGroup(max_interval=60.0, max_pending=3)
+        a = self.create(AppendingDatasetSink, "a", flush_group=group)
+        b = self.create(AppendingDatasetSink, "b", flush_group=group)
+
+        a.push(1)
+        b.push_many([1, 2])
+        group.maybe_flush()
+        self.assertNotIn("a", self.dataset_db.data)
+        self.assertTrue(group.has_pending())
+        self.assertEqual(b.get_all(), [1, 2])
+
+        # Reaching max_pending for one sink flushes all of them.
+        b.push(3)
+        group.maybe_flush()
+        self.assertFalse(group.has_pending())
+        self.assertEqual(self.dataset_db.get("a"), [1])
+        self.assertEqual(self.dataset_db.get("b"), [1, 2, 3])
+
+        a.push_many([2, 3])
+        b.push(4)
+        group.flush()
+        self.assertEqual(self.dataset_db.get("a"), [1, 2, 3])
+        self.assertEqual(self.dataset_db.get("b"), [1, 2, 3, 4])
+        self.assertEqual(a.get_all(), [1, 2, 3])
@@ -0,0 +1,349 @@
+"""
+Tests for scan point generation.
+"""
+
+from itertools import islice, product
+import json
+import numpy as np
+import unittest
+from ndscan.scan_generator import *
+
+
+class ScanPointPlanCase(unittest.TestCase):
+    def test_linear_1d(self):
+        plan = ScanPointPlan([LinearGenerator(0, 3, 4, False)], ScanOptions())
+        self.assertEqual(list(plan), [(0.0, ), (1.0, ), (2.0, ), (3.0, )])
+        self.assertEqual(plan.point(2), (2.0, ))
+        self.assertFalse(plan.has_point(4))
+        with self.assertRaises(IndexError):
+            plan.point(4)
+
+    def test_product_order(self):
+        plan = ScanPointPlan(
+            [LinearGenerator(0, 1, 2, False),
+             ListGenerator([3, 4, 5], False)], ScanOptions())
+        expected = [(x, y) for (y, x) in product([3, 4, 5], [0.0, 1.0])]
+        self.assertEqual(list(plan), expected)
+
+        xs, ys = plan.points(1, 4)
+        self.assertEqual(list(xs), [1.0, 0.0, 1.0])
+        self.assertEqual(list(ys), [3, 4, 4])
+
+    def test_repeats(self):
+        plan = ScanPointPlan([ListGenerator([1, 2], False)], ScanOptions(num_repeats=3))
+        self.assertEqual([p[0] for p in plan], [1, 2, 1, 2, 1, 2])
+
+    def test_accumulated_repeats(self):
+        options = ScanOptions(num_repeats=3, accumulate_repeats=True)
+        plan = ScanPointPlan([ListGenerator([1, 2], False)], options)
+        self.assertEqual([p[0] for p in plan], [1, 2])
+        self.assertEqual(plan.get_num_points(), 2)
+        self.assertEqual(options.get_repeats_per_point(), 3)
+        with self.assertRaises(ValueError):
+            ScanOptions(accumulate_repeats=True, batch_results=True)
+
+    def test_refining_levels(self):
+        plan = ScanPointPlan(
+            [RefiningGenerator(0, 1, False),
+             ListGenerator([0, 1], False)], ScanOptions())
+        points = list(islice(plan, 12))
+        # Level 0: corners, level 1: midpoint of first axis (for both values of the
+        # list axis), level 2: quarter points.
+        self.assertEqual(points[:4], [(0.0, 0), (1.0, 0), (0.0, 1), (1.0, 1)])
+        self.assertEqual(points[4:6], [(0.5, 0), (0.5, 1)])
+        self.assertEqual(points[6:10], [(0.25, 0), (0.75, 0), (0.25, 1), (0.75, 1)])
+
+        # Random access should match iteration order, also for far-out indices.
+        for i in [0, 5, 11, 1000]:
+            self.assertEqual(plan.point(i), list(islice(plan, i + 1))[-1])
+
+    def test_random_access_matches_iteration(self):
+        options = ScanOptions(num_repeats=2, randomise_order_globally=True, seed=123)
+        gens = [RefiningGenerator(0, 1, True), LinearGenerator(0, 1, 5, True)]
+        sequential = list(islice(ScanPointPlan(gens, options), 200))
+        plan = ScanPointPlan(gens, ScanOptions(2, False, True, seed=123))
+        xs, ys = plan.points(0, 200)
+        self.assertEqual(list(zip(xs, ys)), sequential)
+
+    def test_global_randomisation(self):
+        gens = [LinearGenerator(0, 6, 7, False), ListGenerator([0, 1, 2], False)]
+        ordered = list(ScanPointPlan(gens, ScanOptions(num_repeats=2)))
+        shuffled = list(
+            ScanPointPlan(gens, ScanOptions(num_repeats=2,
+                                            randomise_order_globally=True)))
+        self.assertEqual(sorted(ordered), sorted(shuffled))
+        self.assertNotEqual(ordered, shuffled)
+
+        # Each repeat should visit every point once.
+        self.assertEqual(sorted(shuffled[:21]), sorted(ordered[:21]))
+
+    def test_seed_reproducible(self):
+        def get(seed):
+            gens = [RefiningGenerator(0, 1, True), LinearGenerator(0, 1, 5, True)]
+            return list(islice(ScanPointPlan(gens, ScanOptions(seed=seed)), 100))
+
+        self.assertEqual(get(1), get(1))
+        self.assertNotEqual(get(1), get(2))
+
+    def test_typed_coordinates(self):
+        plan = ScanPointPlan(
+            [LinearGenerator(0, 1, 3, False),
+             ListGenerator([1, 2], False)], ScanOptions())
+        xs, ys = plan.points(0, 6)
+        self.assertEqual(xs.dtype, np.float64)
+        self.assertTrue(np.issubdtype(ys.dtype, np.integer))
+
+    def test_axis_dtypes(self):
+        plan = ScanPointPlan([
+            LinearGenerator(0, 3, 7, False),
+            LinearGenerator(0, 1, 2, False),
+            ListGenerator(["a", "b"], False)
+        ], ScanOptions(), [np.int32, np.float64, None])
+        ints, floats, strings = plan.points(0, 28)
+        self.assertEqual(ints.dtype, np.int32)
+        self.assertEqual(list(ints[:7]), [0, 0, 1, 2, 2, 2, 3])
+        self.assertEqual(floats.dtype, np.float64)
+        self.assertEqual(list(strings[:1]), ["a"])
+
+    def test_describe_position(self):
+        plan = ScanPointPlan(
+            [RefiningGenerator(0, 1, False),
+             ListGenerator([0, 1], False)], ScanOptions(num_repeats=2))
+        self.assertEqual(plan.describe_position(0), {
+            "level": 0,
+            "repeat": 0,
+            "index": 0
+        })
+        self.assertEqual(plan.describe_position(5), {
+            "level": 0,
+            "repeat": 1,
+            "index": 1
+        })
+        self.assertEqual(plan.describe_position(10), {
+            "level": 1,
+            "repeat": 1,
+            "index": 0
+        })
+
+    def test_num_points(self):
+        plan = ScanPointPlan([
+            LinearGenerator(0, 1, 3, False),
+            ListGenerator([1, 2], False),
+            RefiningGenerator(0, 1, False)
+        ], ScanOptions(num_repeats=2))
+        self.assertIsNone(plan.get_num_points())
+
+        gens = [LinearGenerator(0, 1, 3, False), ListGenerator([1, 2], False)]
+        for num_repeats in [1, 2]:
+            plan = ScanPointPlan(gens, ScanOptions(num_repeats=num_repeats))
+            self.assertEqual(plan.get_num_points(), len(list(plan)))
+            self.assertEqual(plan.get_num_points(), 6 * num_repeats)
+
+        plan = ScanPointPlan([
+            LowDiscrepancyGenerator(0, 1),
+            LowDiscrepancyGenerator(0, 1),
+        ], ScanOptions())
+        self.assertIsNone(plan.get_num_points())
+
+    def test_generate_points(self):
+        points = list(generate_points([ListGenerator([1, 2], False)], ScanOptions()))
+        self.assertEqual(points, [(1, ), (2, )])
+
+
+class ListGeneratorCase(unittest.TestCase):
+    def test_describe_limits(self):
+        limits = {}
+        ListGenerator([3, 1, 2], False).describe_limits(limits)
+        self.assertEqual(limits, {"min": 1, "max": 3})
+        # The limits end up in the scan metadata, so need to be serialisable.
+        self.assertIs(type(limits["min"]), int)
+        self.assertEqual(json.dumps(limits), '{"min": 1, "max": 3}')
+
+        limits = {}
+        ListGenerator(["a", "b"], False).describe_limits(limits)
+        self.assertEqual(limits, {})
+
+
+class ScanOptionsCase(unittest.TestCase):
+    def test_chunk_size_limits(self):
+        options = ScanOptions(min_chunk_size=2, max_chunk_size=2)
+        self.assertEqual(options.min_chunk_size, 2)
+        with self.assertRaises(ValueError):
+            ScanOptions(min_chunk_size=0)
+        with self.assertRaises(ValueError):
+            ScanOptions(min_chunk_size=10, max_chunk_size=5)
+
+    def test_upload_limits(self):
+        options = ScanOptions(max_upload_points=0)
+        self.assertEqual(options.max_upload_points, 0)
+        with self.assertRaises(ValueError):
+            ScanOptions(max_upload_points=-1)
+        with self.assertRaises(ValueError):
+            ScanOptions(pause_check_interval=0)
+
+
+class AdaptiveGeneratorCase(unittest.TestCase):
+    def _run(self, gen, fn, num_repeats=1):
+        plan = ScanPointPlan([gen], ScanOptions(num_repeats=num_repeats))
+        xs = []
+        index = 0
+        while True:
+            end = plan.level_end(index)
+            (coords, ) = plan.points(index, end)
+            if len(coords) == 0:
+                break
+            gen.feedback(coords, fn(coords))
+            xs.extend(coords)
+            index = end
+        return np.array(xs)
+
+    def test_num_points(self):
+        gen = AdaptiveGenerator(0, 1, 20, "foo")
+        self.assertEqual(gen.get_feedback_channel(), "foo")
+        xs = self._run(gen, lambda x: x**2)
+        self.assertEqual(len(xs), 20)
+        self.assertEqual(len(set(xs)), 20)
+        self.assertEqual(list(xs[:8]), list(np.linspace(0, 1, 8)))
+
+    def test_concentrates_on_features(self):
+        xs = self._run(AdaptiveGenerator(-1, 1, 60, None), lambda x: np.tanh(x / 0.02))
+        # Points should be denser around the step than a uniform distribution.
+        self.assertGreater(np.sum(np.abs(xs) < 0.1), 60 * 0.1 * 2)
+
+    def test_no_feedback(self):
+        gen = AdaptiveGenerator(0, 1, 12, None, num_initial=3)
+        plan = ScanPointPlan([gen], ScanOptions())
+        self.assertEqual(plan.level_end(0), 3)
+        self.assertEqual(list(plan.points(0, 3)[0]), [0.0, 0.5, 1.0])
+        # Without any results, the gaps are bisected.
+        self.assertEqual(sorted(plan.points(3, plan.level_end(3))[0]), [0.25, 0.75])
+        self.assertEqual(len(set(plan.points(0, 100)[0])), 12)
+
+    def test_reuse(self):
+        gen = AdaptiveGenerator(-1, 1, 30, None)
+        self._run(gen, lambda x: np.tanh(x / 0.02))
+        # Results from the first run must not influence the second one.
+        expected = self._run(AdaptiveGenerator(-1, 1, 30, None), lambda x: x**2)
+        self.assertEqual(list(self._run(gen, lambda x: x**2)), list(expected))
+
+    def test_feedback_length_mismatch(self):
+        gen = AdaptiveGenerator(0, 1, 10, None)
+        with self.assertRaises(AssertionError):
+            gen.feedback(np.array([0.0, 1.0]), np.array([0.0]))
+
+    def test_repeats(self):
+        xs = self._run(AdaptiveGenerator(0, 1, 10, None), lambda x: x, num_repeats=2)
+        self.assertEqual(len(xs), 20)
+        self.assertEqual(sorted(xs[:8]), sorted(xs[8:16]))
+
+
+class LowDiscrepancyGeneratorCase(unittest.TestCase):
+    def test_van_der_corput(self):
+        # Without scrambling, a single axis is sampled by the van der Corput sequence.
+        gen = LowDiscrepancyGenerator(0, 1)
+        points = gen.points_for_level(0)
+        self.assertEqual(list(points[:4]), [0.0, 0.5, 0.25, 0.75])
+        self.assertEqual(len(points), LowDiscrepancyGenerator.INITIAL_LEVEL_SIZE)
+        self.assertEqual(len(gen.points_for_level(2)), 2 * len(points))
+
+    def test_joint_axes(self):
+        plan = ScanPointPlan([
+            LowDiscrepancyGenerator(0, 1),
+            ListGenerator([0, 1], False),
+            LowDiscrepancyGenerator(-1, 1)
+        ], ScanOptions())
+        n = LowDiscrepancyGenerator.INITIAL_LEVEL_SIZE
+        xs, ys, zs = plan.points(0, 2 * n)
+
+        # The two low-discrepancy axes vary jointly, the list axis on its own.
+        self.assertEqual(list(ys), [0] * n + [1] * n)
+        self.assertEqual(list(xs[:n]), list(xs[n:]))
+        self.assertEqual(list(zs[:n]), list(zs[n:]))
+        self.assertEqual(len(set(zip(xs[:n], zs[:n]))), n)
+        self.assertTrue(np.all((xs >= 0) & (xs <= 1)))
+        self.assertTrue(np.all((zs >= -1) & (zs <= 1)))
+
+    def test_uniform_coverage(self):
+        gens = [LowDiscrepancyGenerator(0, 1), LowDiscrepancyGenerator(0, 1)]
+        for num_points in [64, 100, 256]:
+            xs, ys = ScanPointPlan(gens, ScanOptions(seed=1)).points(0, num_points)
+            counts, _, _ = np.histogram2d(xs, ys, bins=4, range=[[0, 1], [0, 1]])
+            expected = num_points / 16
+            self.assertTrue(np.all(np.abs(counts - expected) <= expected / 2 + 1))
+
+    def test_describe_limits(self):
+        limits = {}
+        LowDiscrepancyGenerator(1, 0).describe_limits(limits)
+        self.assertEqual(limits, {"min": 0.0, "max": 1.0, "scattered": True})
+
+
+class ChunkPrefetcherCase(unittest.TestCase):
+    def _make_plan(self):
+        return ScanPointPlan(
+            [RefiningGenerator(0, 1, True),
+             LinearGenerator(0, 1, 7, True)],
+            ScanOptions(num_repeats=2, randomise_order_globally=True, seed=3))
+
+    def test_matches_plan(self):
+        expected = self._make_plan().points(0, 500)
+        prefetcher = ChunkPrefetcher(self._make_plan())
+        chunks = []
+        start = 0
+        while start < 500:
+            coords = prefetcher.get(start, 50)
+            chunks.append(coords)
+            start += len(coords[0])
+        prefetcher.close()
+        for axis, expected_coords in enumerate(expected):
+            actual = np.concatenate([c[axis] for c in chunks])[:500]
+            self.assertEqual(list(actual), list(expected_coords))
+
+    def test_level_boundaries(self):
+        plan = self._make_plan()
+        prefetcher = ChunkPrefetcher(plan)
+        (xs, ys) = prefetcher.get(0, 1000)
+        self.assertEqual(len(xs), plan.level_end(0))
+        prefetcher.close()
+
+    def test_restart_and_size_change(self):
+        expected = self._make_plan().points(0, 100)
+        prefetcher = ChunkPrefetcher(self._make_plan())
+        prefetcher.get(0, 20)
+        # Restarting from an earlier point (e.g. after an interrupted chunk) or
+        # requesting smaller chunks should still give the correct points.
+        xs, _ = prefetcher.get(10, 10)
+        self.assertEqual(list(xs), list(expected[0][10:20]))
+        xs, _ = prefetcher.get(20, 5)
+        self.assertEqual(list(xs), list(expected[0][20:25]))
+        prefetcher.close()
+
+    def test_disabled(self):
+        prefetcher = ChunkPrefetcher(self._make_plan(), enabled=False)
+        prefetcher.get(0, 10)
+        prefetcher.wait()
+        self.assertIsNone(prefetcher._executor)
+
+
+class IndexPermutationCase(unittest.TestCase):
+    def test_bijection(self):
+        rng = np.random.RandomState(0)
+        for n in [1, 2, 3, 4, 5, 17, 100, 1023, 1025, 12345]:
+            perm = IndexPermutation(n, rng)
+            self.assertEqual(sorted(perm(np.arange(n))), list(range(n)))
+
+    def test_reproducible(self):
+        def get(seed):
+            return list(IndexPermutation(1000, np.random.RandomState(seed))(
+                np.arange(1000)))
+
+        self.assertEqual(get(42), get(42))
+        self.assertNotEqual(get(42), get(43))
+        self.assertNotEqual(get(42), list(range(1000)))
+
+    def test_random_access(self):
+        perm = IndexPermutation(10**9, np.random.RandomState(0))
+        indices = np.array([0, 12345, 10**9 - 1])
+        all_at_once = perm(indices)
+        for i, p in zip(indices, all_at_once):
+            self.assertEqual(perm(np.array([i]))[0], p)
+            self.assertTrue(0 <= p < 10**9)
@@ -3,12 +3,15 @@ Tests for subscan functionality.
 """
 
 import json
+import numpy as np
 from ndscan.experiment import run_fragment_once
 from ndscan.fragment import *
-from ndscan.scan_generator import LinearGenerator, ScanOptions
-from ndscan.subscan import setattr_subscan
+from ndscan.scan_generator import (LinearGenerator, ListGenerator, RefiningGenerator,
+                                   ScanOptions, ScanPointPlan)
+from ndscan.subscan import setattr_subscan, _get_num_points
 
-from fixtures import AddOneFragment, ReboundAddOneFragment, AddOneCustomAnalysisFragment
+from fixtures import (AddOneFragment, AddOneCustomAnalysisFragment,
+                      ReboundAddOneFragment, RepeatCountFragment)
 from mock_environment import ExpFragmentCase
 
 
@@ -18,12 +21,42 @@ class Scan1DFragment(ExpFragment):
         scan = setattr_subscan(self, "scan", self.child, [(self.child, "value")])
         assert self.scan == scan
 
-    def run_once(self):
+    def run_once(self, copy_results=True):
         return self.scan.run([(self.child.value, LinearGenerator(0, 3, 4, False))],
-                             ScanOptions(seed=1234))
+                             ScanOptions(seed=1234),
+                             copy_results=copy_results)
+
+
+class ErrorBarFragment(ExpFragment):
+    def build_fragment(self):
+        self.setattr_param("value", FloatParam, "Value to return", 0.0)
+        self.setattr_result("result", FloatChannel, display_hints={"priority": 1})
+        self.setattr_result("result_err",
+                            FloatChannel,
+                            display_hints={
+                                "error_bar_for": "result",
+                                "priority": -1
+                            })
+
+    def run_once(self):
+        self.result.push(self.value.get())
+        self.result_err.push(0.1)
 
 
 class SubscanCase(ExpFragmentCase):
+    def test_aggregate_display_hints(self):
+        parent = self.create(Scan1DFragment, ErrorBarFragment)
+        self.assertEqual(parent.scan_channel_result.describe()["display_hints"],
+                         {"priority": 1})
+        # The error bar reference only makes sense within the subscan.
+        self.assertEqual(parent.scan_channel_result_err.describe()["display_hints"],
+                         {"priority": -1})
+        spec = json.loads(run_fragment_once(parent)[parent.scan_spec])
+        self.assertEqual(spec["channels"]["result_err"]["display_hints"], {
+            "error_bar_for": "result",
+            "priority": -1
+        })
+
     def test_1d_subscan_return(self):
         parent = self.create(Scan1DFragment, AddOneFragment)
         self._test_1d(parent, parent.child.result)
@@ -38,7 +71,48 @@ class SubscanCase(ExpFragmentCase):
         expected_values = [float(n) for n in range(0, 4)]
         expected_results = [v + 1 for v in expected_values]
         self.assertEqual(coords, {parent.child.value: expected_values})
-        self.assertEqual(values, {result_channel: expected_results})
+        self.assertEqual(list(values.keys()), [result_channel])
+        self.assertEqual(values[result_channel].tolist(), expected_results)
+
+    def test_1d_subscan_copies_results(self):
+        parent = self.create(Scan1DFragment, AddOneFragment)
+        _, first_values = parent.run_once()
+        first_results = first_values[parent.child.result]
+        _, values = parent.run_once()
+        results = values[parent.child.result]
+
+        self.assertEqual(results.dtype, np.float64)
+        self.assertEqual(results.tolist(), [1.0, 2.0, 3.0, 4.0])
+        self.assertFalse(np.shares_memory(results, first_results))
+
+    def test_1d_subscan_reuses_buffers(self):
+        parent = self.create(Scan1DFragment, AddOneFragment)
+        _, first_values = parent.run_once(copy_results=False)
+        first_results = first_values[parent.child.result]
+        _, values = parent.run_once(copy_results=False)
+        results = values[parent.child.result]
+
+        self.assertEqual(results.tolist(), [1.0, 2.0, 3.0, 4.0])
+        self.assertTrue(np.shares_memory(results, first_results))
+
+    def test_accumulate_int_channel(self):
+        parent = self.create(Scan1DFragment, RepeatCountFragment)
+        with self.assertRaises(ValueError):
+            parent.scan.run([(parent.child.value, LinearGenerator(0, 3, 4, False))],
+                            ScanOptions(num_repeats=2, accumulate_repeats=True))
+
+    def test_num_points(self):
+        for generators, options in [
+            ([LinearGenerator(0, 3, 4, False)], ScanOptions()),
+            ([LinearGenerator(0, 3, 4, False),
+              ListGenerator([1, 2], False)], ScanOptions(num_repeats=3)),
+            ([ListGenerator([1, 2, 3], False)],
+             ScanOptions(num_repeats=2, accumulate_repeats=True)),
+            ([LinearGenerator(0, 3, 4, False),
+              RefiningGenerator(0, 1, False)], ScanOptions()),
+        ]:
+            self.assertEqual(_get_num_points(generators, options),
+                             ScanPointPlan(generators, options).get_num_points())
 
     def test_1d_result_channels(self):
         parent = self.create(Scan1DFragment, AddOneFragment)
@@ -46,8 +120,20 @@ class SubscanCase(ExpFragmentCase):
 
         expected_values = [float(n) for n in range(0, 4)]
         expected_results = [v + 1 for v in expected_values]
-        self.assertEqual(results[parent.scan_axis_0], expected_values)
-        self.assertEqual(results[parent.scan_channel_result], expected_results)
+        self.assertEqual(list(results[parent.scan_axis_0]), expected_values)
+        self.assertEqual(list(results[parent.scan_channel_result]), expected_results)
+
+        # Scalar child channels are collected in arrays, keeping the schema.
+        self.assertEqual(
+            parent.scan_channel_result.describe(), {
+                "path": "scan_channel_result",
+                "description": "",
+                "type": "array",
+                "dtype": "float64",
+                "shape": [None],
+                "scale": 1.0,
+                "unit": ""
+            })
 
         spec = json.loads(results[parent.scan_spec])
         self.assertEqual(spec["fragment_fqn"], "fixtures.AddOneFragment")
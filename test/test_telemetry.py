@@ -0,0 +1,106 @@
+"""
+Tests for scan performance telemetry.
+"""
+
+import time
+import unittest
+from ndscan.telemetry import ScanProgress, ScanTelemetry
+
+
+class ScanTelemetryCase(unittest.TestCase):
+    def test_statistics(self):
+        telemetry = ScanTelemetry()
+        for i in range(100):
+            telemetry.record("run_once", i * 1e-3)
+        stats = telemetry.get_statistics()
+        self.assertAlmostEqual(stats["run_once_p50"], 49.5e-3)
+        self.assertGreater(stats["run_once_p99"], 98e-3)
+        self.assertNotIn("points_per_second", stats)
+
+        telemetry.points_completed(1)
+        time.sleep(0.02)
+        telemetry.points_completed(10)
+        self.assertGreater(telemetry.get_statistics()["points_per_second"], 0)
+
+    def test_publish_rate(self):
+        published = []
+        telemetry = ScanTelemetry(lambda name, value: published.append(name))
+        telemetry.record("point", 1.0)
+        telemetry.points_completed()
+        self.assertEqual(published, ["point_p50", "point_p99"])
+        time.sleep(0.02)
+        telemetry.points_completed()
+        self.assertEqual(len(published), 2)
+        telemetry.publish(force=True)
+        self.assertEqual(len(published), 5)
+        self.assertIn("points_per_second", published)
+
+    def test_restart(self):
+        published = {}
+        telemetry = ScanTelemetry(published.__setitem__)
+        telemetry.record("run_once", 1.0)
+        telemetry.points_completed()
+        self.assertEqual(published["run_once_p50"], 1.0)
+
+        telemetry.start()
+        telemetry.record("point", 2.0)
+        telemetry.publish(force=True)
+        self.assertIsNone(published["run_once_p50"])
+        self.assertIsNone(published["run_once_p99"])
+        self.assertEqual(published["point_p50"], 2.0)
+
+
+class ScanProgressCase(unittest.TestCase):
+    def test_eta(self):
+        published = {}
+        progress = ScanProgress(published.__setitem__)
+        progress.start(20, num_completed=10)
+        self.assertEqual(published, {
+            "completed": 10,
+            "total": 20,
+            "rate": None,
+            "eta": None
+        })
+        self.assertIsNone(progress.get_eta())
+
+        time.sleep(0.02)
+        progress.points_completed(2)
+        self.assertGreater(progress.rate, 0)
+        self.assertAlmostEqual(progress.get_eta(), 8 / progress.rate)
+        self.assertEqual(published["completed"], 10)
+
+        progress.publish(force=True)
+        self.assertEqual(published["completed"], 12)
+        self.assertEqual(published["eta"], progress.get_eta())
+
+        progress.points_completed(8)
+        self.assertEqual(progress.get_eta(), 0.0)
+
+    def test_unbounded(self):
+        published = {}
+        progress = ScanProgress(published.__setitem__)
+        progress.start(None)
+        time.sleep(0.02)
+        progress.points_completed()
+        progress.publish(force=True)
+        self.assertEqual(published["completed"], 1)
+        self.assertIsNone(published["total"])
+        self.assertGreater(published["rate"], 0)
+        self.assertIsNone(published["eta"])
+
+    def test_restart(self):
+        published = {}
+        progress = ScanProgress(published.__setitem__)
+        progress.start(2)
+        time.sleep(0.02)
+        progress.points_completed(2)
+        progress.publish(force=True)
+        self.assertEqual(published["eta"], 0.0)
+
+        progress.start(None)
+        self.assertEqual(published, {
+            "completed": 0,
+            "total": None,
+            "rate": None,
+            "eta": None
+        })
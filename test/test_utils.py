@@ -1,3 +1,4 @@
+import inspect
 import unittest
 from artiq.language import kernel
 from ndscan.utils import *
@@ -50,3 +51,33 @@ class IsKernelTest(unittest.TestCase):
     def test_method(self):
         self.assertFalse(is_kernel(self._regular_method))
         self.assertTrue(is_kernel(self._kernel_method))
+
+
+class CompileFunctionTest(unittest.TestCase):
+    SOURCE = "@kernel\ndef generated(a):\n    return a + offset\n"
+
+    def test_compile(self):
+        func = compile_function(self.SOURCE, "generated", {
+            "kernel": kernel,
+            "offset": 1
+        })
+        self.assertTrue(is_kernel(func))
+        self.assertEqual(inspect.getsource(func), self.SOURCE)
+
+
+class RaggedArrayTest(unittest.TestCase):
+    def test_indexing(self):
+        values = RaggedArray([1, 2, 3, 4, 5, 6], [0, 1, 1, 3, 6])
+        self.assertEqual(len(values), 4)
+        self.assertEqual(list(values), [[1], [], [2, 3], [4, 5, 6]])
+        self.assertEqual(values[-1], [4, 5, 6])
+        self.assertEqual(values[1:3], [[], [2, 3]])
+        with self.assertRaises(IndexError):
+            values[4]
+        self.assertEqual(len(RaggedArray([], [])), 0)
+
+    def test_load_point_values(self):
+        datasets = {"a": [[1, 2], [3, 4]], "b": [1, 2, 3], "b.offsets": [0, 2, 3]}
+        self.assertEqual(load_point_values(datasets.get, "a"), [[1, 2], [3, 4]])
+        self.assertEqual(list(load_point_values(datasets.get, "b")), [[1, 2], [3]])
+        self.assertIsNone(load_point_values(datasets.get, "c"))